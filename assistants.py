@@ -0,0 +1,144 @@
+import os
+import logging
+from typing import Callable, Dict, List, Optional, Set
+from pyrogram import Client
+from pytgcalls import PyTgCalls, filters as fl
+from ratelimit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+def session_strings() -> List[str]:
+    """SESSION_STRING, lalu SESSION_STRING_2, SESSION_STRING_3, ... sampai ada yang kosong."""
+    sessions = [os.getenv("SESSION_STRING")]
+    index = 2
+    while os.getenv(f"SESSION_STRING_{index}"):
+        sessions.append(os.getenv(f"SESSION_STRING_{index}"))
+        index += 1
+    return [s for s in sessions if s]
+
+
+class Assistant:
+    """Satu akun userbot beserta PyTgCalls-nya."""
+
+    __slots__ = ("index", "client", "call", "active", "limiter")
+
+    def __init__(self, index: int, client: Client):
+        self.index = index
+        self.client = client
+        self.call = PyTgCalls(client)
+        # Limiter sendiri: FloodWait akun ini tidak ikut memblokir bot atau akun lain
+        self.limiter = RateLimiter()
+        # Chat yang sedang ada panggilan aktif di akun ini
+        self.active: Set[int] = set()
+
+    @property
+    def load(self) -> int:
+        return len(self.active)
+
+    @property
+    def username(self) -> Optional[str]:
+        me = getattr(self.client, "me", None)
+        return me.username if me else None
+
+
+class AssistantPool:
+    """Kumpulan userbot. Chat ditempatkan ke akun dengan panggilan aktif paling sedikit,
+    lalu tetap di akun itu (akun tersebut sudah jadi member grup/channel-nya).
+    """
+
+    def __init__(self, api_id: int, api_hash: str, sessions: List[str]):
+        self.assistants: List[Assistant] = []
+        for index, session in enumerate(sessions):
+            client = Client(
+                name="user_bot" if index == 0 else f"user_bot_{index + 1}",
+                api_id=api_id,
+                api_hash=api_hash,
+                session_string=session,
+                in_memory=True,
+                workers=4,
+                device_model="Huawei P60 Pro",
+                system_version="Android 12",
+                app_version="10.5.0"
+            )
+            client.is_bot = False
+            self.assistants.append(Assistant(index, client))
+        self._assigned: Dict[int, Assistant] = {}
+        self._started: List[Assistant] = []
+        self._on_assign: Optional[Callable[[int, int], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._started or self.assistants)
+
+    def on_stream_end(self, handler):
+        """Daftarkan handler stream end yang sama di semua PyTgCalls."""
+        for assistant in self.assistants:
+            assistant.call.on_update(fl.stream_end())(handler)
+        return handler
+
+    def on_assign(self, callback: Callable[[int, int], None]):
+        """callback(chat_id, index) dipanggil tiap kali chat ditempatkan ke akun baru."""
+        self._on_assign = callback
+
+    async def start(self):
+        for assistant in self.assistants:
+            try:
+                await assistant.client.start()
+                await assistant.call.start()
+                self._started.append(assistant)
+                logger.info(f"Assistant {assistant.index + 1} aktif: @{assistant.username}")
+            except Exception as e:
+                logger.error(f"Assistant {assistant.index + 1} gagal start: {e}")
+        if not self._started:
+            raise RuntimeError("Tidak ada userbot yang berhasil start")
+
+    async def stop(self):
+        for assistant in self.assistants:
+            assistant.limiter.stop()
+            if assistant.client.is_connected:
+                try:
+                    await assistant.client.stop()
+                except Exception as e:
+                    logger.error(f"Error stop assistant {assistant.index + 1}: {e}")
+
+    def restore(self, chat_id: int, index: int):
+        """Pasang kembali penempatan yang tersimpan (kalau akunnya masih ada)."""
+        if 0 <= index < len(self.assistants):
+            self._assigned[chat_id] = self.assistants[index]
+
+    def get(self, chat_id: int) -> Assistant:
+        assistant = self._assigned.get(chat_id)
+        if assistant is not None and (not self._started or assistant in self._started):
+            return assistant
+        candidates = self._started or self.assistants
+        assistant = min(candidates, key=lambda a: (a.load, a.index))
+        self._assigned[chat_id] = assistant
+        if self._on_assign:
+            self._on_assign(chat_id, assistant.index)
+        return assistant
+
+    def call(self, chat_id: int) -> PyTgCalls:
+        return self.get(chat_id).call
+
+    def mark_active(self, chat_id: int):
+        self.get(chat_id).active.add(chat_id)
+
+    def mark_idle(self, chat_id: int):
+        assistant = self._assigned.get(chat_id)
+        if assistant is not None:
+            assistant.active.discard(chat_id)
+
+    def stats(self) -> List[Dict]:
+        assigned: Dict[int, int] = {}
+        for assistant in self._assigned.values():
+            assigned[assistant.index] = assigned.get(assistant.index, 0) + 1
+        return [
+            {
+                "index": a.index + 1,
+                "username": a.username,
+                "online": a in self._started,
+                "active_calls": a.load,
+                "chats": assigned.get(a.index, 0),
+            }
+            for a in self.assistants
+        ]
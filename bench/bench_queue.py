@@ -0,0 +1,145 @@
+"""Benchmark antrean: TrackQueue (deque) vs list of dict lama.
+
+Jalankan dari root repo:
+    python bench/bench_queue.py [--chats 1000] [--tracks 10000] [--baseline-chats 20]
+
+Baseline list.pop(0) bersifat O(n), jadi hanya dijalankan untuk sebagian chat
+lalu diekstrapolasi ke jumlah chat penuh.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playqueue import Track, TrackQueue
+
+
+def make_track(i: int) -> Track:
+    return Track(
+        title=f"Lagu {i}",
+        url=f"https://www.youtube.com/watch?v={i:011d}",
+        stream_type="audio",
+        requester="user",
+        duration="3:30",
+        thumbnail=f"https://i.ytimg.com/vi/{i:011d}/hqdefault.jpg",
+        reply_to_message_id=i,
+        group_id=-100123,
+    )
+
+
+def make_dict(i: int) -> dict:
+    return {
+        "title": f"Lagu {i}",
+        "url": f"https://www.youtube.com/watch?v={i:011d}",
+        "thumbnail": f"https://i.ytimg.com/vi/{i:011d}/hqdefault.jpg",
+        "stream_type": "audio",
+        "requester": "user",
+        "duration": "3:30",
+        "reply_to_message_id": i,
+        "group_id": -100123,
+    }
+
+
+def record_size(factory, count: int = 10000) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [factory(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del items
+    return (after - before) / count
+
+
+class Timer:
+    def __init__(self, label: str, chats: int, scale: float = 1.0):
+        self.label = label
+        self.chats = chats
+        self.scale = scale
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = (time.perf_counter() - self.t0) * self.scale
+        note = f" (ekstrapolasi x{self.scale:.0f})" if self.scale != 1 else ""
+        print(f"  {self.label:<24} {elapsed:9.3f} s{note}")
+
+
+def run_trackqueue(chats: int, tracks: list, ops: int):
+    print(f"TrackQueue: {chats} chat x {len(tracks)} lagu")
+    queues = {}
+    with Timer("enqueue", chats):
+        for chat in range(chats):
+            q = queues[chat] = TrackQueue(maxlen=0)
+            for t in tracks:
+                q.append(t)
+    rng = random.Random(1)
+    with Timer(f"remove_at x{ops}/chat", chats):
+        for q in queues.values():
+            for _ in range(ops):
+                q.insert(rng.randrange(len(q)), q.remove_at(rng.randrange(len(q))))
+    with Timer(f"move x{ops}/chat", chats):
+        for q in queues.values():
+            for _ in range(ops):
+                q.move(rng.randrange(len(q)), rng.randrange(len(q)))
+    with Timer("shuffle", chats):
+        for q in queues.values():
+            q.shuffle()
+    with Timer("dequeue semua", chats):
+        for q in queues.values():
+            while q:
+                q.popleft()
+
+
+def run_list(chats: int, total_chats: int, tracks: list, ops: int):
+    scale = total_chats / chats
+    print(f"list (lama): {chats} chat x {len(tracks)} lagu")
+    queues = {}
+    with Timer("enqueue", chats, scale):
+        for chat in range(chats):
+            q = queues[chat] = []
+            for t in tracks:
+                q.append(t)
+    rng = random.Random(1)
+    with Timer(f"remove_at x{ops}/chat", chats, scale):
+        for q in queues.values():
+            for _ in range(ops):
+                q.insert(rng.randrange(len(q)), q.pop(rng.randrange(len(q))))
+    with Timer(f"move x{ops}/chat", chats, scale):
+        for q in queues.values():
+            for _ in range(ops):
+                q.insert(rng.randrange(len(q)), q.pop(rng.randrange(len(q))))
+    with Timer("shuffle", chats, scale):
+        for q in queues.values():
+            random.shuffle(q)
+    with Timer("dequeue semua (pop(0))", chats, scale):
+        for q in queues.values():
+            while q:
+                q.pop(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=1000)
+    parser.add_argument("--tracks", type=int, default=10000)
+    parser.add_argument("--ops", type=int, default=100, help="remove_at/move per chat")
+    parser.add_argument("--baseline-chats", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"ukuran record: Track {record_size(make_track):.0f} B, dict {record_size(make_dict):.0f} B\n")
+
+    # Record dipakai bersama oleh semua chat: yang diukur operasi antreannya
+    tracks = [make_track(i) for i in range(args.tracks)]
+    run_trackqueue(args.chats, tracks, args.ops)
+    print()
+    if args.baseline_chats:
+        run_list(min(args.baseline_chats, args.chats), args.chats, [make_dict(i) for i in range(args.tracks)], args.ops)
+
+
+if __name__ == "__main__":
+    main()
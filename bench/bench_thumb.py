@@ -0,0 +1,143 @@
+"""Micro-benchmark render thumbnail: pipeline lama vs template.
+
+Jalankan dari root repo:
+    python bench/bench_thumb.py [--image path.jpg] [-n 20]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import textwrap
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps
+from unidecode import unidecode
+
+import thumb
+
+
+def legacy_render(title: str, duration: str, requester: str, image_data: bytes) -> bytes:
+    """Salinan gen_thumb sebelum template: font dimuat ulang dan semua layer digambar tiap render."""
+    requester = unidecode(requester)
+    width, height = 1280, 720
+
+    background_raw = Image.open(BytesIO(image_data)) if image_data else None
+    if not background_raw:
+        background_raw = Image.new('RGB', (width, height), color=(30, 30, 30))
+
+    bg = background_raw.resize((width, height), Image.LANCZOS)
+    bg = bg.filter(ImageFilter.GaussianBlur(radius=10))
+
+    overlay = Image.new('RGBA', (width, height), (0, 0, 0, 160))
+    bg = bg.convert('RGBA')
+    bg = Image.alpha_composite(bg, overlay)
+    draw = ImageDraw.Draw(bg)
+
+    def load_font(size):
+        try:
+            return ImageFont.truetype("Title.ttf", size)
+        except Exception:
+            return ImageFont.load_default()
+
+    font_title = load_font(75)
+    font_sub = load_font(35)
+    font_time = load_font(30)
+
+    art_size = 400
+    album_art = ImageOps.fit(background_raw, (art_size, art_size), centering=(0.5, 0.5))
+
+    mask = Image.new('L', (art_size, art_size), 0)
+    mask_draw = ImageDraw.Draw(mask)
+    mask_draw.ellipse((0, 0, art_size, art_size), fill=255)
+
+    art_x, art_y = 100, (height - art_size) // 2
+
+    bg.paste(album_art, (art_x, art_y), mask)
+    draw.ellipse((art_x, art_y, art_x + art_size, art_y + art_size), outline="white", width=10)
+
+    text_x = art_x + art_size + 70
+    current_y = 180
+
+    lines = textwrap.wrap(title, width=18)
+    for line in lines[:2]:
+        draw.text((text_x, current_y), line, fill="white", font=font_title)
+        current_y += 85
+
+    draw.text((text_x, current_y + 10), f"Requested by {requester}", fill=(200, 200, 200), font=font_sub)
+
+    bar_y = 470
+    bar_width = 500
+    draw.line((text_x, bar_y, text_x + bar_width, bar_y), fill=(255, 255, 255, 60), width=8)
+    draw.line((text_x, bar_y, text_x + 300, bar_y), fill="#FF0000", width=8)
+    draw.ellipse((text_x + 300 - 10, bar_y - 10, text_x + 300 + 10, bar_y + 10), fill="#FF0000")
+
+    draw.text((text_x, bar_y + 25), "00:00", fill="white", font=font_time)
+    draw.text((text_x + bar_width - 70, bar_y + 25), duration, fill="white", font=font_time)
+
+    ctrl_y = 560
+    draw.polygon([(text_x + 110, ctrl_y + 20), (text_x + 140, ctrl_y + 5), (text_x + 140, ctrl_y + 35)], fill="white")
+    draw.rectangle([text_x + 100, ctrl_y + 5, text_x + 106, ctrl_y + 35], fill="white")
+
+    draw.ellipse((text_x + 190, ctrl_y - 10, text_x + 250, ctrl_y + 50), fill="white")
+    draw.polygon([(text_x + 215, ctrl_y + 5), (text_x + 215, ctrl_y + 35), (text_x + 235, ctrl_y + 20)], fill="black")
+
+    draw.polygon([(text_x + 300, ctrl_y + 5), (text_x + 300, ctrl_y + 35), (text_x + 330, ctrl_y + 20)], fill="white")
+    draw.rectangle([text_x + 333, ctrl_y + 5, text_x + 339, ctrl_y + 35], fill="white")
+
+    img_byte_arr = BytesIO()
+    bg.convert('RGB').save(img_byte_arr, format='JPEG', quality=95)
+    return img_byte_arr.getvalue()
+
+
+def sample_image() -> bytes:
+    """Gambar 480x360 bergradasi, kira-kira seukuran hqdefault YouTube."""
+    img = Image.linear_gradient('L').resize((480, 360)).convert('RGB')
+    buf = BytesIO()
+    img.save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+
+def bench(label: str, func, n: int):
+    times = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        func(i)
+        times.append((time.perf_counter() - t0) * 1000)
+    print(
+        f"{label:<28} median {statistics.median(times):7.2f} ms   "
+        f"min {min(times):7.2f} ms   max {max(times):7.2f} ms"
+    )
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="gambar thumbnail sumber (default: gradasi sintetis)")
+    parser.add_argument("-n", type=int, default=20, help="jumlah render per skenario")
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            image_data = f.read()
+    else:
+        image_data = sample_image()
+
+    title = "Never Gonna Give You Up (Official Music Video)"
+    duration = "3:33"
+
+    thumb.load_assets()
+    base = thumb.render_base(image_data)
+
+    print(f"{args.n} render per skenario\n")
+    before = bench("legacy (sebelum)", lambda i: legacy_render(title, duration, f"user{i}", image_data), args.n)
+    full = bench("template, background baru", lambda i: thumb.render_thumb(title, duration, f"user{i}", image_data), args.n)
+    text = bench("template, background cache", lambda i: thumb.render_text(base, title, duration, f"user{i}"), args.n)
+
+    print(f"\nspeedup: {before / full:.2f}x (tanpa cache), {before / text:.2f}x (background cache)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,555 @@
+"""Pengganti lokal untuk layanan luar: Pyrogram (Bot API), PyTgCalls, yt-dlp dan
+youtube-search-python. Dipakai bench/loadsim.py supaya handler asli di main.py bisa
+dijalankan tanpa akun Telegram maupun jaringan.
+
+install() harus dipanggil sebelum main.py diimpor.
+"""
+import re
+import sys
+import time
+import types
+import asyncio
+import itertools
+from enum import Enum
+from collections import Counter, OrderedDict
+
+
+class Latency:
+    """Latensi simulasi (detik), bisa diubah dari loadsim."""
+    api = 0.03
+    call = 0.05
+    ytdl = 0.3
+    search = 0.2
+
+
+# ---------- pyrogram ----------
+
+class FloodWait(Exception):
+    def __init__(self, value: int = 0):
+        super().__init__(f"FloodWait {value}")
+        self.value = value
+
+
+class MessageNotModified(Exception):
+    pass
+
+
+class UserNotParticipant(Exception):
+    pass
+
+
+class ChatAdminRequired(Exception):
+    pass
+
+
+class StopPropagation(Exception):
+    pass
+
+
+class ContinuePropagation(Exception):
+    pass
+
+
+class ParseMode(Enum):
+    HTML = "html"
+    MARKDOWN = "markdown"
+
+
+class ChatType(Enum):
+    PRIVATE = "private"
+    GROUP = "group"
+    SUPERGROUP = "supergroup"
+    CHANNEL = "channel"
+
+
+class ChatMemberStatus(Enum):
+    OWNER = "owner"
+    ADMINISTRATOR = "administrator"
+    MEMBER = "member"
+
+
+class ChatMembersFilter(Enum):
+    ADMINISTRATORS = "administrators"
+
+
+class Filter:
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, client, update) -> bool:
+        return self.func(client, update)
+
+    def __and__(self, other: "Filter") -> "Filter":
+        return Filter(lambda c, u: self(c, u) and other(c, u))
+
+    def __or__(self, other: "Filter") -> "Filter":
+        return Filter(lambda c, u: self(c, u) or other(c, u))
+
+    def __invert__(self) -> "Filter":
+        return Filter(lambda c, u: not self(c, u))
+
+
+def _command(commands, prefixes="/"):
+    commands = {c.lower() for c in ([commands] if isinstance(commands, str) else commands)}
+
+    def check(client, message) -> bool:
+        text = getattr(message, "text", None) or ""
+        if not text.startswith(prefixes):
+            return False
+        parts = text[len(prefixes):].split()
+        if not parts:
+            return False
+        name = parts[0].split("@")[0].lower()
+        if name not in commands:
+            return False
+        message.command = [name] + parts[1:]
+        return True
+    return Filter(check)
+
+
+def _chat_type(*kinds):
+    return Filter(lambda c, u: getattr(getattr(u, "chat", None), "type", None) in kinds)
+
+
+filters = types.SimpleNamespace(
+    command=_command,
+    group=_chat_type(ChatType.GROUP, ChatType.SUPERGROUP),
+    private=_chat_type(ChatType.PRIVATE),
+    regex=lambda pattern: Filter(lambda c, u: bool(re.search(pattern, getattr(u, "text", None) or ""))),
+    create=lambda func: Filter(lambda c, u: func(None, c, u)),
+)
+
+
+class User:
+    def __init__(self, id: int, first_name: str = "User", username: str = None, client=None, **kwargs):
+        self.id = id
+        self.first_name = first_name
+        self.username = username
+
+
+class Chat:
+    def __init__(self, id: int, type: ChatType = ChatType.SUPERGROUP):
+        self.id = id
+        self.type = type
+
+
+class ChatMember:
+    def __init__(self, user: User, status: ChatMemberStatus):
+        self.user = user
+        self.status = status
+
+
+class ChatMemberUpdated:
+    def __init__(self, chat: Chat, old_chat_member=None, new_chat_member=None):
+        self.chat = chat
+        self.old_chat_member = old_chat_member
+        self.new_chat_member = new_chat_member
+
+
+class InlineKeyboardButton:
+    def __init__(self, text: str, callback_data: str = None, url: str = None):
+        self.text = text
+        self.callback_data = callback_data
+        self.url = url
+
+
+class InlineKeyboardMarkup:
+    def __init__(self, inline_keyboard):
+        self.inline_keyboard = inline_keyboard
+
+
+class Message:
+    def __init__(self, client, id: int, chat: Chat, text: str = None, from_user: User = None,
+                 reply_to_message=None, reply_markup=None, **kwargs):
+        self._client = client
+        self.id = id
+        self.chat = chat
+        self.text = text
+        self.caption = kwargs.get("caption")
+        self.from_user = from_user
+        self.reply_to_message = reply_to_message
+        self.reply_markup = reply_markup
+        self.command = None
+        self.empty = False
+        self.audio = self.voice = self.video = self.photo = None
+
+    async def reply_text(self, text: str, **kwargs) -> "Message":
+        kwargs.setdefault("reply_to_message_id", self.id)
+        return await self._client.send_message(self.chat.id, text, **kwargs)
+
+    reply = reply_text
+
+    async def edit_text(self, text: str, **kwargs) -> "Message":
+        return await self._client.edit_message_text(self.chat.id, self.id, text, **kwargs)
+
+    async def delete(self):
+        return await self._client.delete_messages(self.chat.id, self.id)
+
+
+class CallbackQuery:
+    def __init__(self, client, id: str, from_user: User, message: Message, data: str, chat_instance: str = "0", **kwargs):
+        self._client = client
+        self.id = id
+        self.from_user = from_user
+        self.message = message
+        self.data = data
+        self.chat_instance = chat_instance
+
+    async def answer(self, text: str = None, show_alert: bool = False, **kwargs):
+        await self._client._api("answer_callback_query")
+        return True
+
+
+class _Handler:
+    def __init__(self, callback, filters=None):
+        self.callback = callback
+        self.filters = filters
+
+    async def check(self, client, update) -> bool:
+        return bool(self.filters(client, update)) if self.filters else True
+
+
+class MessageHandler(_Handler):
+    pass
+
+
+class CallbackQueryHandler(_Handler):
+    pass
+
+
+class ChatMemberUpdatedHandler(_Handler):
+    pass
+
+
+class Client:
+    """Bot/userbot palsu: semua method API hanya menunggu Latency.api dan dihitung."""
+
+    _ids = itertools.count(1000)
+
+    def __init__(self, name: str, **kwargs):
+        self.name = name
+        self.me = None
+        self.is_connected = False
+        self.calls = Counter()
+        self.dispatcher = types.SimpleNamespace(groups=OrderedDict())
+        self._message_ids = itertools.count(1)
+        # Id admin per chat (default: user 1)
+        self.admins = {}
+
+    def add_handler(self, handler, group: int = 0):
+        self.dispatcher.groups.setdefault(group, []).append(handler)
+        self.dispatcher.groups = OrderedDict(sorted(self.dispatcher.groups.items()))
+
+    def _decorator(self, handler_cls, filters, group):
+        def decorator(func):
+            self.add_handler(handler_cls(func, filters), group)
+            return func
+        return decorator
+
+    def on_message(self, filters=None, group: int = 0):
+        return self._decorator(MessageHandler, filters, group)
+
+    def on_callback_query(self, filters=None, group: int = 0):
+        return self._decorator(CallbackQueryHandler, filters, group)
+
+    def on_chat_member_updated(self, filters=None, group: int = 0):
+        return self._decorator(ChatMemberUpdatedHandler, filters, group)
+
+    async def start(self):
+        self.me = User(next(self._ids), first_name=self.name, username=self.name)
+        self.is_connected = True
+
+    async def stop(self):
+        self.is_connected = False
+
+    async def _api(self, method: str):
+        self.calls[method] += 1
+        if Latency.api:
+            await asyncio.sleep(Latency.api)
+
+    def _message(self, chat_id: int, text: str = None, **kwargs) -> Message:
+        return Message(self, next(self._message_ids), Chat(chat_id), text=text, from_user=self.me, **kwargs)
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> Message:
+        await self._api("send_message")
+        return self._message(chat_id, text, reply_markup=kwargs.get("reply_markup"))
+
+    async def send_photo(self, chat_id: int, photo=None, caption: str = None, **kwargs) -> Message:
+        await self._api("send_photo")
+        message = self._message(chat_id, caption=caption, reply_markup=kwargs.get("reply_markup"))
+        message.photo = types.SimpleNamespace(file_id=photo if isinstance(photo, str) else f"photo-{message.id}")
+        return message
+
+    async def edit_message_text(self, chat_id: int, message_id: int, text: str, **kwargs) -> Message:
+        await self._api("edit_message_text")
+        return Message(self, message_id, Chat(chat_id), text=text, reply_markup=kwargs.get("reply_markup"))
+
+    async def edit_message_reply_markup(self, chat_id: int, message_id: int, reply_markup=None) -> Message:
+        await self._api("edit_message_reply_markup")
+        return Message(self, message_id, Chat(chat_id), reply_markup=reply_markup)
+
+    async def delete_messages(self, chat_id: int, message_ids) -> int:
+        await self._api("delete_messages")
+        return 1
+
+    async def get_chat(self, chat_id: int) -> Chat:
+        await self._api("get_chat")
+        return Chat(chat_id)
+
+    async def get_chat_member(self, chat_id: int, user_id: int) -> ChatMember:
+        await self._api("get_chat_member")
+        admins = self.admins.get(chat_id, {1})
+        status = ChatMemberStatus.ADMINISTRATOR if user_id in admins else ChatMemberStatus.MEMBER
+        return ChatMember(User(user_id), status)
+
+    async def get_chat_members(self, chat_id: int, filter=None):
+        await self._api("get_chat_members")
+        for user_id in self.admins.get(chat_id, {1}):
+            yield ChatMember(User(user_id), ChatMemberStatus.ADMINISTRATOR)
+
+    async def get_messages(self, chat_id: int, message_ids):
+        await self._api("get_messages")
+        return Message(self, message_ids, Chat(chat_id))
+
+    async def export_chat_invite_link(self, chat_id: int) -> str:
+        await self._api("export_chat_invite_link")
+        return f"https://t.me/+fake{abs(chat_id)}"
+
+    async def join_chat(self, link: str):
+        await self._api("join_chat")
+
+    async def download_media(self, message, file_name: str = None) -> str:
+        await self._api("download_media")
+        with open(file_name, "wb") as f:
+            f.write(b"\0" * 1024)
+        return file_name
+
+
+async def idle():
+    await asyncio.Event().wait()
+
+
+# ---------- pytgcalls ----------
+
+class MediaStream:
+    class Flags(Enum):
+        IGNORE = "ignore"
+        REQUIRED = "required"
+
+    def __init__(self, media_path: str, audio_path: str = None, video_flags=None, ffmpeg_parameters: str = None, **kwargs):
+        self.media_path = media_path
+        self.audio_path = audio_path
+        self.video_flags = video_flags
+        self.ffmpeg_parameters = ffmpeg_parameters
+
+
+class AudioQuality(Enum):
+    STUDIO = (96000, 2)
+    HIGH = (48000, 2)
+    MEDIUM = (36000, 1)
+    LOW = (24000, 1)
+
+
+class VideoQuality(Enum):
+    HD_720p = (1280, 720, 30)
+    SD_480p = (854, 480, 30)
+    SD_360p = (640, 360, 30)
+
+
+class StreamEnded:
+    class Type(Enum):
+        AUDIO = "audio"
+        VIDEO = "video"
+
+    def __init__(self, chat_id: int, stream_type: "StreamEnded.Type" = None):
+        self.chat_id = chat_id
+        self.stream_type = stream_type or StreamEnded.Type.AUDIO
+
+
+class PyTgCalls:
+    def __init__(self, client):
+        self.client = client
+        self.handlers = []
+        self.active = {}
+        self.calls = Counter()
+
+    def on_update(self, update_filter=None):
+        def decorator(func):
+            self.handlers.append(func)
+            return func
+        return decorator
+
+    async def start(self):
+        pass
+
+    async def _op(self, name: str):
+        self.calls[name] += 1
+        if Latency.call:
+            await asyncio.sleep(Latency.call)
+
+    async def play(self, chat_id: int, stream: MediaStream = None):
+        await self._op("play")
+        self.active[chat_id] = stream
+
+    async def leave_call(self, chat_id: int):
+        await self._op("leave_call")
+        self.active.pop(chat_id, None)
+
+    async def pause(self, chat_id: int):
+        await self._op("pause")
+
+    async def resume(self, chat_id: int):
+        await self._op("resume")
+
+    async def mute(self, chat_id: int):
+        await self._op("mute")
+
+    async def unmute(self, chat_id: int):
+        await self._op("unmute")
+
+    async def change_volume_call(self, chat_id: int, volume: int):
+        await self._op("change_volume_call")
+
+    async def end_stream(self, chat_id: int):
+        """Simulasikan lagu selesai: panggil semua handler stream_end. Seperti
+        py-tgcalls, stream video berakhir dua kali (audio lalu video)."""
+        stream = self.active.get(chat_id)
+        kinds = [StreamEnded.Type.AUDIO]
+        if stream is not None and stream.video_flags is not MediaStream.Flags.IGNORE:
+            kinds.append(StreamEnded.Type.VIDEO)
+        for kind in kinds:
+            for handler in self.handlers:
+                await handler(self, StreamEnded(chat_id, kind))
+
+
+# ---------- yt-dlp / youtube-search-python ----------
+
+def _video_info(url: str) -> dict:
+    vid = re.search(r"(?:v=|youtu\.be/)([\w-]{11})", url)
+    vid = vid.group(1) if vid else "x" * 11
+    expire = int(time.time()) + 6 * 3600
+    return {
+        "id": vid,
+        "title": f"Lagu {vid}",
+        "duration": 215,
+        "duration_string": "3:35",
+        "webpage_url": f"https://www.youtube.com/watch?v={vid}",
+        "thumbnail": f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg",
+        "formats": [
+            {"url": f"https://rr.googlevideo.com/a/{vid}?expire={expire}", "vcodec": "none", "acodec": "opus", "abr": 160},
+            {"url": f"https://rr.googlevideo.com/m/{vid}?expire={expire}", "vcodec": "avc1", "acodec": "mp4a", "height": 360, "tbr": 600},
+            {"url": f"https://rr.googlevideo.com/v/{vid}?expire={expire}", "vcodec": "avc1", "acodec": "none", "height": 720, "tbr": 1500},
+        ],
+        "ext": "webm",
+    }
+
+
+def playlist_entry_id(list_id: str, i: int) -> str:
+    return f"{list_id[-5:]:0>5}{i:06d}"
+
+
+def _playlist_info(url: str, start: int, end: int) -> dict:
+    list_id = url.split("list=")[1].split("&")[0]
+    entries = []
+    for i in range(start - 1, end):
+        entry = {"id": playlist_entry_id(list_id, i), "title": f"Lagu {i}", "duration": 180 + i % 120}
+        if i % 50 == 7:
+            # Placeholder yt-dlp untuk video privat: tanpa durasi
+            entry.update(title="[Private video]", duration=None)
+        elif i % 10 == 3:
+            # Judul asli yang diawali kurung siku tetap harus masuk antrean
+            entry["title"] = f"[MV] Lagu {i}"
+        entries.append(entry)
+    return {"id": list_id, "title": f"Playlist {list_id}", "entries": entries}
+
+
+class YoutubeDL:
+    def __init__(self, opts=None):
+        self.opts = opts or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url: str, download: bool = False) -> dict:
+        time.sleep(Latency.ytdl)
+        if self.opts.get("extract_flat") and "list=" in url:
+            start = self.opts.get("playliststart") or 1
+            return _playlist_info(url, start, self.opts.get("playlistend") or start + 99)
+        info = _video_info(url)
+        if download:
+            with open(self.prepare_filename(info), "wb") as f:
+                f.write(b"\0" * 4096)
+        return info
+
+    def prepare_filename(self, info: dict) -> str:
+        template = self.opts.get("outtmpl", "%(id)s.%(ext)s")
+        if isinstance(template, dict):
+            template = template.get("default", "%(id)s.%(ext)s")
+        return template % {"id": info["id"], "ext": info["ext"], "title": info["title"]}
+
+
+class VideosSearch:
+    _ids = itertools.count()
+
+    def __init__(self, query: str, limit: int = 10):
+        self.query = query
+        self.limit = limit
+
+    def result(self) -> dict:
+        time.sleep(Latency.search)
+        results = []
+        for _ in range(self.limit):
+            vid = f"{next(self._ids):011d}"
+            results.append({
+                "title": f"{self.query} #{vid}",
+                "duration": "3:35",
+                "thumbnails": [{"url": f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"}],
+                "link": f"https://www.youtube.com/watch?v={vid}",
+            })
+        return {"result": results}
+
+
+def _module(name: str, **attrs) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    """Daftarkan modul palsu di sys.modules (pyrogram, pytgcalls, yt_dlp, youtubesearchpython)."""
+    errors = _module(
+        "pyrogram.errors", FloodWait=FloodWait, MessageNotModified=MessageNotModified,
+        UserNotParticipant=UserNotParticipant, ChatAdminRequired=ChatAdminRequired,
+        StopPropagation=StopPropagation, ContinuePropagation=ContinuePropagation,
+    )
+    pyrogram_types = _module(
+        "pyrogram.types", InlineKeyboardMarkup=InlineKeyboardMarkup, InlineKeyboardButton=InlineKeyboardButton,
+        Message=Message, CallbackQuery=CallbackQuery, ChatMemberUpdated=ChatMemberUpdated, User=User,
+        Chat=Chat, ChatMember=ChatMember,
+    )
+    enums = _module(
+        "pyrogram.enums", ParseMode=ParseMode, ChatType=ChatType,
+        ChatMemberStatus=ChatMemberStatus, ChatMembersFilter=ChatMembersFilter,
+    )
+    handlers = _module(
+        "pyrogram.handlers", MessageHandler=MessageHandler, CallbackQueryHandler=CallbackQueryHandler,
+        ChatMemberUpdatedHandler=ChatMemberUpdatedHandler,
+    )
+    _module(
+        "pyrogram", Client=Client, filters=filters, idle=idle,
+        errors=errors, types=pyrogram_types, enums=enums, handlers=handlers,
+    )
+    calls_types = _module(
+        "pytgcalls.types", MediaStream=MediaStream, StreamEnded=StreamEnded,
+        AudioQuality=AudioQuality, VideoQuality=VideoQuality
+    )
+    _module(
+        "pytgcalls", PyTgCalls=PyTgCalls, types=calls_types,
+        filters=types.SimpleNamespace(stream_end=lambda: None),
+    )
+    _module("yt_dlp", YoutubeDL=YoutubeDL)
+    _module("youtubesearchpython", VideosSearch=VideosSearch)
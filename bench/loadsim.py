@@ -0,0 +1,303 @@
+"""Simulasi beban offline: handler asli main.py dengan Telegram/PyTgCalls/YouTube palsu.
+
+Jalankan dari root repo (butuh dependensi lokal: pillow, unidecode, httpx, python-dotenv):
+    python bench/loadsim.py [--chats 200] [--scenarios play,paginate,enqueue,skip,streamend]
+
+Skenario:
+    play       /play <judul> -> pilih hasil -> audio (lagu pertama tiap chat)
+    paginate   tombol halaman hasil pencarian maju-mundur
+    enqueue    tambah beberapa lagu ke antrean yang sedang diputar
+    skip       /skip serentak di semua chat
+    streamend  semua lagu selesai bersamaan (stream end beruntun)
+    loop       /loop queue lalu dua putaran stream end (tanpa yt-dlp/thumbnail baru)
+    playlist   /play link playlist (--playlist-size lagu, extract_flat sekali per chat)
+
+Latensi API/panggilan/yt-dlp disimulasikan (lihat --*-latency-ms). Batas rate
+Telegram dimatikan kecuali --telegram-limits, supaya yang diukur kode bot sendiri.
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import itertools
+import tracemalloc
+from io import BytesIO
+from typing import Awaitable, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes
+
+SCENARIOS = ("play", "paginate", "enqueue", "skip", "streamend", "loop", "playlist")
+ADMIN = fakes.User(1, first_name="Admin")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--enqueue", type=int, default=3, help="lagu tambahan per chat di skenario enqueue")
+    parser.add_argument("--playlist-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=0, help="batas event serentak (0 = semua)")
+    parser.add_argument("--api-latency-ms", type=float, default=30)
+    parser.add_argument("--call-latency-ms", type=float, default=50)
+    parser.add_argument("--ytdl-latency-ms", type=float, default=300)
+    parser.add_argument("--search-latency-ms", type=float, default=200)
+    parser.add_argument("--thumb-pool", default="thread", choices=("thread", "process"))
+    parser.add_argument("--telegram-limits", action="store_true", help="pakai batas rate Telegram asli")
+    parser.add_argument("--traces", action="store_true", help="log trace handler yang lambat")
+    parser.add_argument("--verbose", action="store_true", help="tampilkan log INFO bot")
+    parser.add_argument("--no-memory", action="store_true", help="tanpa tracemalloc (timing lebih akurat)")
+    return parser.parse_args()
+
+
+def configure_env(args, workdir: str):
+    os.environ.update({
+        "API_ID": "1", "API_HASH": "fake", "BOT_TOKEN": "1:fake", "SESSION_STRING": "fake",
+        "STATE_DB": "", "TRACE_FILE": "", "METRICS_PORT": "0",
+        # Log trace lambat dimatikan kecuali --traces (terlalu ramai saat beban penuh)
+        "TRACE_SLOW_MS": "2000" if args.traces else "1e12",
+        "MEDIA_DIR": os.path.join(workdir, "downloads"),
+        "CACHE_DIR": os.path.join(workdir, "cache"),
+        "THUMB_POOL": args.thumb_pool,
+    })
+    if not args.telegram_limits:
+        os.environ.update({"TG_GLOBAL_RATE": "1000000", "TG_CHAT_PER_MIN": "1000000", "TG_CHAT_BURST": "1000000"})
+    fakes.Latency.api = args.api_latency_ms / 1000
+    fakes.Latency.call = args.call_latency_ms / 1000
+    fakes.Latency.ytdl = args.ytdl_latency_ms / 1000
+    fakes.Latency.search = args.search_latency_ms / 1000
+
+
+class LagMonitor:
+    """Ukur keterlambatan event loop: selisih antara jadwal bangun dan kenyataan."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def take(self) -> List[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+    def stop(self):
+        self._task.cancel()
+
+
+def pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def report(name: str, latencies: List[float], elapsed: float, lag: List[float]):
+    print(
+        f"{name:<10} {len(latencies):>6} ev  {len(latencies) / elapsed:8.1f} ev/s  "
+        f"p50 {pct(latencies, 50) * 1000:7.1f} ms  p99 {pct(latencies, 99) * 1000:7.1f} ms  "
+        f"lag p99 {pct(lag, 99) * 1000:6.1f} ms  max {max(lag or [0]) * 1000:6.1f} ms"
+    )
+
+
+class Simulator:
+    def __init__(self, main, args):
+        self.main = main
+        self.args = args
+        self.chats = [-1001000000000 - i for i in range(args.chats)]
+        # chat -> pesan hasil pencarian terakhir (target tombol)
+        self.search_msgs: Dict[int, fakes.Message] = {}
+        self.msg_ids = itertools.count(1)
+        self.cb_ids = itertools.count(1)
+        self.lag = LagMonitor()
+        self.limit = asyncio.Semaphore(args.concurrency) if args.concurrency else None
+
+    def message(self, chat_id: int, text: str) -> fakes.Message:
+        return fakes.Message(self.main.bot, next(self.msg_ids), fakes.Chat(chat_id), text=text, from_user=ADMIN)
+
+    def callback(self, message: fakes.Message, data: str) -> fakes.CallbackQuery:
+        return fakes.CallbackQuery(self.main.bot, str(next(self.cb_ids)), ADMIN, message, data)
+
+    async def dispatch(self, update):
+        await self.main.dispatch_update(self.main.bot, update)
+
+    async def timed(self, make: Callable[[], Awaitable], out: List[float]):
+        if self.limit:
+            await self.limit.acquire()
+        try:
+            start = time.perf_counter()
+            await make()
+            out.append(time.perf_counter() - start)
+        finally:
+            if self.limit:
+                self.limit.release()
+
+    async def run(self, name: str, makers: List[Callable[[], Awaitable]]):
+        latencies: List[float] = []
+        self.lag.take()
+        start = time.perf_counter()
+        await asyncio.gather(*(self.timed(make, latencies) for make in makers))
+        report(name, latencies, time.perf_counter() - start, self.lag.take())
+
+    async def search_and_pick(self, chat_id: int, query: str, kind: str = "audio"):
+        """/play <query> lalu pilih hasil pertama sebagai audio/video (tiga event)."""
+        await self.dispatch(self.message(chat_id, f"/play {query}"))
+        # Tombol hasil pencarian menempel di pesan loading; cb_handler hanya butuh chat-nya
+        target = self.message(chat_id, "hasil")
+        self.search_msgs[chat_id] = target
+        await self.dispatch(self.callback(target, "sel_0"))
+        await self.dispatch(self.callback(target, f"type_{kind}"))
+
+    async def scenario_play(self):
+        await self.run("play", [lambda c=c: self.search_and_pick(c, f"lagu {c}") for c in self.chats])
+
+    async def scenario_paginate(self):
+        makers = []
+        for c in self.chats:
+            msg = self.search_msgs.get(c)
+            if msg is None or c not in self.main.search_cache:
+                continue
+            for data in ("spage_1", "spage_0"):
+                makers.append(lambda m=msg, d=data: self.dispatch(self.callback(m, d)))
+        await self.run("paginate", makers)
+
+    async def scenario_enqueue(self):
+        makers = [
+            # Selang-seling video supaya StreamEnded ganda (audio + video) ikut teruji
+            lambda c=c, n=n: self.search_and_pick(c, f"antre {c} {n}", "video" if n % 2 else "audio")
+            for n in range(self.args.enqueue) for c in self.chats
+        ]
+        await self.run("enqueue", makers)
+        # Beri waktu prefetch lagu berikutnya selesai
+        await asyncio.sleep(fakes.Latency.ytdl * 2 + 0.5)
+
+    async def scenario_skip(self):
+        await self.run("skip", [lambda c=c: self.dispatch(self.message(c, "/skip")) for c in self.chats])
+
+    async def scenario_streamend(self):
+        calls = self.main.assistants
+        await self.run("streamend", [lambda c=c: calls.call(c).end_stream(c) for c in self.chats])
+
+    async def scenario_playlist(self):
+        # Fake yt-dlp mengembalikan sebanyak playlistend; batasi lewat PLAYLIST_LIMIT
+        self.main.PLAYLIST_LIMIT = self.args.playlist_size
+
+        def link(c: int) -> str:
+            # Separuh chat memakai link share aplikasi (youtu.be/<id>?list=...&index=), mulai lagu ke-10
+            if c % 2:
+                return f"https://youtu.be/{fakes.playlist_entry_id(f'PL{abs(c)}', 10)}?list=PL{abs(c)}&index=11"
+            return f"https://www.youtube.com/playlist?list=PL{abs(c)}"
+
+        await self.run("playlist", [lambda c=c: self.dispatch(self.message(c, f"/play {link(c)}")) for c in self.chats])
+        tracks = [t for c in self.chats for t in self.main.queues.get(c, ())]
+        resolved = sum(1 for t in tracks if t.source)
+        bracket = sum(1 for t in tracks if t.title.startswith("[MV]"))
+        private = sum(1 for t in tracks if t.title == "[Private video]")
+        print(f"{'antrean':<10} {len(tracks)} lagu, {resolved} sudah di-resolve, "
+              f"{bracket} berjudul [MV], {private} video privat")
+
+    async def scenario_loop(self):
+        await asyncio.gather(*(self.dispatch(self.message(c, "/loop queue")) for c in self.chats))
+        calls = self.main.assistants
+        for _ in range(2):
+            # Lagu yang diputar lebih singkat dari ini tidak di-loop
+            await asyncio.sleep(self.main.LOOP_MIN_SECONDS)
+            await self.run("loop", [lambda c=c: calls.call(c).end_stream(c) for c in self.chats])
+
+
+async def amain(args):
+    import main
+    import thumb
+    import metrics
+    from PIL import Image
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    # Latar thumbnail sintetis, disajikan oleh "server" palsu
+    buf = BytesIO()
+    Image.new("RGB", (480, 360), (90, 40, 140)).save(buf, "JPEG")
+    image = buf.getvalue()
+
+    async def fake_fetch(url: str):
+        await asyncio.sleep(fakes.Latency.api)
+        return image
+    thumb.fetch_bytes = fake_fetch
+
+    main.media_cache.scan()
+    main.start_pool()
+    await main.bot.start()
+    await main.assistants.start()
+    main.limiter.start()
+    main.progress.start()
+    main.watchdog.start()
+
+    sim = Simulator(main, args)
+    sim.lag.start()
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+
+    print(f"{args.chats} chat, latensi api {args.api_latency_ms:.0f} ms, call {args.call_latency_ms:.0f} ms, "
+          f"yt-dlp {args.ytdl_latency_ms:.0f} ms, search {args.search_latency_ms:.0f} ms\n")
+    if not args.no_memory:
+        tracemalloc.start()
+    base_mem = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+    for name in SCENARIOS:
+        if name in selected:
+            await getattr(sim, f"scenario_{name}")()
+            if name == "enqueue" and tracemalloc.is_tracing():
+                used = tracemalloc.get_traced_memory()[0] - base_mem
+                active = sum(1 for c in sim.chats if c in main.current_playing)
+                queued = sum(len(q) for q in main.queues.values())
+                print(f"{'memori':<10} {used / 1048576:.1f} MB untuk {active} chat aktif "
+                      f"({used / max(active, 1) / 1024:.1f} KB/chat, {queued} lagu antre)")
+
+    sim.lag.stop()
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+    for label, hist in (("play->audio", metrics.play_latency), ("jeda lagu", metrics.track_gap)):
+        total = sum(totals[0] for _, totals in hist._data.values())
+        count = sum(totals[1] for _, totals in hist._data.values())
+        if count:
+            print(f"{label:<10} rata-rata {total / count * 1000:.0f} ms dari {count} sampel")
+
+    culprits = main.watchdog.stats()["culprits"]
+    if culprits:
+        print("Loop macet: " + ", ".join(f"{c} x{n}" for c, n in culprits))
+
+    api = main.bot.calls
+    print(f"\nBot API: {sum(api.values())} request " + ", ".join(f"{k}={v}" for k, v in api.most_common()))
+    print(f"Progress edit: {main.progress.edits} terkirim, {main.progress.skipped} dilewati")
+
+    main.watchdog.stop()
+    main.progress.stop()
+    main.limiter.stop()
+    main.shutdown_pool()
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="loadsim-") as workdir:
+        configure_env(args, workdir)
+        fakes.install()
+        asyncio.run(amain(args))
+
+
+if __name__ == "__main__":
+    main()
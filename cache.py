@@ -0,0 +1,216 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+
+def cache_key(*parts) -> str:
+    """Key content-addressed (sha1) dari gabungan beberapa nilai."""
+    raw = "\x1f".join("" if p is None else str(p) for p in parts)
+    return hashlib.sha1(raw.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class LRUCache(Generic[V]):
+    """LRU di memori, dibatasi jumlah item dan/atau total ukuran."""
+
+    def __init__(
+        self,
+        max_items: int = 0,
+        max_bytes: int = 0,
+        sizeof: Optional[Callable[[V], int]] = None
+    ):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda v: len(v))
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[V, int]]" = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+    def get(self, key: Hashable) -> Optional[V]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key: Hashable, value: V):
+        size = self.sizeof(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._data[key] = (value, size)
+        self._bytes += size
+        while self._data and (
+            (self.max_items and len(self._data) > self.max_items)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            _, (_, evicted) = self._data.popitem(last=False)
+            self._bytes -= evicted
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        item = self._data.pop(key, None)
+        if item is None:
+            return None
+        self._bytes -= item[1]
+        return item[0]
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+
+class DiskCache:
+    """Cache file di satu direktori dengan kuota ukuran dan eviksi LRU (mtime).
+
+    Method-nya sinkron dan melakukan I/O; panggil lewat asyncio.to_thread dari coroutine.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> (ukuran, last_used)
+        self._index: Dict[str, Tuple[int, float]] = {}
+        self._bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _scan(self):
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or not entry.name.endswith(self.suffix):
+                continue
+            key = entry.name[:len(entry.name) - len(self.suffix)] if self.suffix else entry.name
+            st = entry.stat()
+            self._index[key] = (st.st_size, st.st_mtime)
+            self._bytes += st.st_size
+        self._evict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self._drop(key)
+                self.misses += 1
+            return None
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            if key in self._index:
+                self._index[key] = (self._index[key][0], now)
+            self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"DiskCache write failed: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._drop(key)
+            self._index[key] = (len(data), time.time())
+            self._bytes += len(data)
+            self._evict()
+
+    def _drop(self, key: str):
+        item = self._index.pop(key, None)
+        if item:
+            self._bytes -= item[0]
+
+    def _evict(self):
+        if self._bytes <= self.max_bytes:
+            return
+        for key, _ in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._bytes <= self.max_bytes:
+                break
+            self._drop(key)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+
+class TTLCache(Generic[V]):
+    """Cache memori dengan masa berlaku per item dan batas jumlah item (LRU)."""
+
+    def __init__(self, ttl: float, max_items: int = 1024):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def put(self, key: Hashable, value: V, ttl: Optional[float] = None):
+        self._data.pop(key, None)
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        item = self._data.pop(key, None)
+        return item[1] if item else None
+
+    def clear(self):
+        self._data.clear()
@@ -0,0 +1,69 @@
+"""Pemilihan URL stream dari info yt-dlp.
+
+Hanya stdlib supaya bisa dites tanpa yt-dlp terpasang; diimpor ulang oleh youtube.py.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+_EXPIRE_RE = re.compile(r"[?&/]expire[=/](\d+)")
+
+
+def stream_expiry(info: Dict) -> Optional[float]:
+    """Timestamp paling awal kapan URL stream di info berhenti berlaku."""
+    urls = [info.get("url")]
+    urls += [f.get("url") for f in info.get("requested_formats") or []]
+    urls += [f.get("url") for f in info.get("formats") or []]
+    expires = [int(m.group(1)) for u in urls if u for m in [_EXPIRE_RE.search(u)] if m]
+    return min(expires) if expires else None
+
+
+def _has(codec: Optional[str]) -> bool:
+    return codec not in (None, "none")
+
+
+def _best_audio(formats: List[Dict], max_abr: Optional[float]) -> Optional[str]:
+    """Audio-only terbaik (<= max_abr kbps kalau ada; kalau semua di atasnya, yang paling kecil)."""
+    candidates = [f for f in formats if not _has(f.get("vcodec")) and _has(f.get("acodec"))]
+    if not candidates:
+        return None
+    key = lambda f: (f.get("abr") or 0, f.get("tbr") or 0)
+    if max_abr:
+        capped = [f for f in candidates if (f.get("abr") or 0) <= max_abr]
+        if not capped:
+            return min(candidates, key=key)["url"]
+        candidates = capped
+    return max(candidates, key=key)["url"]
+
+
+def select_stream(
+    info: Dict, stream_type: str, max_height: int = 720, max_abr: Optional[float] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """Pilih URL stream langsung: (media, audio terpisah atau None).
+
+    Audio: audio-only terbaik. Video: resolusi tertinggi <= max_height; di YouTube
+    di atas 360p hanya ada video-only (DASH), jadi dipasangkan dengan audio-only
+    terbaik. (None, None) kalau tidak ada yang cocok; pemanggil memakai link halaman.
+    """
+    formats = [f for f in info.get("formats") or [] if f.get("url")]
+    if stream_type == "audio":
+        return _best_audio(formats, max_abr), None
+
+    videos = [f for f in formats if _has(f.get("vcodec")) and (f.get("height") or 0) <= max_height]
+    if not videos:
+        return None, None
+    # Resolusi dulu; AV1 berat di-decode ffmpeg, lalu yang sudah berisi audio
+    video = max(videos, key=lambda f: (
+        f.get("height") or 0,
+        not (f.get("vcodec") or "").startswith("av01"),
+        _has(f.get("acodec")),
+        f.get("tbr") or 0,
+    ))
+    if _has(video.get("acodec")):
+        return video["url"], None
+    audio = _best_audio(formats, max_abr)
+    if audio is None:
+        muxed = [f for f in videos if _has(f.get("acodec"))]
+        if not muxed:
+            return None, None
+        return max(muxed, key=lambda f: (f.get("height") or 0, f.get("tbr") or 0))["url"], None
+    return video["url"], audio
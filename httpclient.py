@@ -0,0 +1,84 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "64"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "16"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+# httpx tidak punya limit per host, jadi dibatasi di sini dengan semaphore
+HTTP_PER_HOST = int(os.getenv("HTTP_PER_HOST", "8"))
+HTTP2 = os.getenv("HTTP2", "1") not in ("0", "false", "no")
+
+_client: Optional[httpx.AsyncClient] = None
+_host_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+async def start_http() -> httpx.AsyncClient:
+    """Buat HTTP client bersama untuk seluruh bot."""
+    global _client
+    if _client is None:
+        http2 = HTTP2 and _http2_available()
+        _client = httpx.AsyncClient(
+            http2=http2,
+            follow_redirects=True,
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+        logger.info(f"HTTP client aktif (http2={http2}, max={HTTP_MAX_CONNECTIONS}, per host={HTTP_PER_HOST})")
+    return _client
+
+
+async def close_http():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _host_slots.clear()
+
+
+async def fetch(url: str, method: str = "GET", **kwargs) -> httpx.Response:
+    """Request lewat client bersama dengan batas koneksi per host."""
+    client = _client or await start_http()
+    host = urlsplit(url).hostname or ""
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = asyncio.Semaphore(HTTP_PER_HOST)
+    async with slot:
+        return await client.request(method, url, **kwargs)
+
+
+async def fetch_bytes(url: str, **kwargs) -> Optional[bytes]:
+    """GET dan kembalikan body, atau None kalau gagal/bukan 200.
+
+    URL kosong atau rusak (mis. thumbnail kosong dari hasil pencarian) juga None,
+    supaya pemanggil cukup memakai gambar default.
+    """
+    if not url:
+        return None
+    try:
+        resp = await fetch(url, **kwargs)
+        if resp.status_code == 200:
+            return resp.content
+        logger.debug(f"GET {url} -> {resp.status_code}")
+    except (httpx.HTTPError, httpx.InvalidURL, ValueError, TypeError) as e:
+        logger.warning(f"GET {url} gagal: {e!r}")
+    return None
@@ -0,0 +1,148 @@
+"""Watchdog event loop: ukur lag terus-menerus dan tangkap stack kode yang memblokir.
+
+Task di event loop berdetak tiap LOOP_WATCHDOG_INTERVAL_MS; thread terpisah
+memeriksa detak itu. Kalau loop macet lebih dari LOOP_STALL_MS, thread mengambil
+stack thread loop saat itu juga (kode yang sedang memblokir), lalu setelah loop
+jalan lagi dicatat ke log bersama total durasinya.
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional
+
+from metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+# 0 = watchdog mati
+LOOP_WATCHDOG_INTERVAL_MS = float(os.getenv("LOOP_WATCHDOG_INTERVAL_MS", "100"))
+LOOP_STALL_MS = float(os.getenv("LOOP_STALL_MS", "250"))
+# Jumlah sampel lag terakhir untuk persentil (100 ms x 3000 = 5 menit)
+LOOP_LAG_WINDOW = int(os.getenv("LOOP_LAG_WINDOW", "3000"))
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_QUANTILES = (0.5, 0.9, 0.99)
+
+loop_lag = histogram(
+    "musicbot_loop_lag_seconds", "Keterlambatan event loop per detak watchdog",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+loop_stalls = counter("musicbot_loop_stalls_total", "Event loop macet melebihi LOOP_STALL_MS", ["culprit"])
+
+
+def _culprit(frames: List[traceback.FrameSummary]) -> str:
+    """Frame terdalam dari kode bot sendiri (bukan stdlib/site-packages)."""
+    for frame in reversed(frames):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(_ROOT) and "site-packages" not in path:
+            return f"{os.path.relpath(path, _ROOT)}:{frame.lineno} {frame.name}"
+    if frames:
+        frame = frames[-1]
+        return f"{os.path.basename(frame.filename)}:{frame.lineno} {frame.name}"
+    return "unknown"
+
+
+class LoopWatchdog:
+    def __init__(
+        self,
+        interval: float = LOOP_WATCHDOG_INTERVAL_MS / 1000,
+        stall: float = LOOP_STALL_MS / 1000,
+        window: int = LOOP_LAG_WINDOW
+    ):
+        self.interval = interval
+        self.stall = stall
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.stalls = 0
+        self.culprits: Counter = Counter()
+        self._beat = time.monotonic()
+        self._captured: Optional[List[traceback.FrameSummary]] = None
+        self._captured_beat = 0.0
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loopwatch", daemon=True)
+        self._thread.start()
+        logger.info(f"Loop watchdog aktif: detak {self.interval * 1000:.0f} ms, macet > {self.stall * 1000:.0f} ms")
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - expected)
+            self.samples.append(lag)
+            loop_lag.observe(lag)
+            if lag >= self.stall:
+                self._report(lag)
+
+    def _watch(self):
+        # Cek dua kali per interval supaya stack diambil selagi loop masih macet
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            if beat == self._captured_beat:
+                continue
+            if time.monotonic() - beat - self.interval < self.stall:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self._captured = traceback.extract_stack(frame)
+            self._captured_beat = beat
+
+    def _report(self, lag: float):
+        frames, self._captured = self._captured, None
+        self.stalls += 1
+        if not frames:
+            # Macet terlalu singkat untuk tertangkap thread (atau GC di antara detak)
+            culprit = "unknown"
+            logger.warning(f"Event loop macet {lag * 1000:.0f} ms (stack tidak tertangkap)")
+        else:
+            culprit = _culprit(frames)
+            stack = "".join(traceback.format_list(frames[-12:]))
+            logger.warning(f"Event loop macet {lag * 1000:.0f} ms di {culprit}\n{stack}")
+        self.culprits[culprit] += 1
+        loop_stalls.inc(culprit=culprit)
+
+    def percentiles(self) -> Dict[float, float]:
+        if not self.samples:
+            return {q: 0.0 for q in _QUANTILES}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {q: ordered[min(last, int(round(q * last)))] for q in _QUANTILES}
+
+    def stats(self) -> Dict:
+        return {
+            "lag": {f"p{int(q * 100)}": v for q, v in self.percentiles().items()},
+            "max": max(self.samples, default=0.0),
+            "stalls": self.stalls,
+            "culprits": self.culprits.most_common(10),
+        }
+
+
+watchdog = LoopWatchdog()
+
+gauge(
+    "musicbot_loop_lag_quantile_seconds", "Persentil lag event loop di jendela LOOP_LAG_WINDOW", ["quantile"],
+    lambda: {(str(q),): v for q, v in watchdog.percentiles().items()}
+)
@@ -1,22 +1,45 @@
+if __name__ == "__main__":
+    # python3 main.py diteruskan ke run.py supaya worker spawn tidak mengimpor ulang file ini
+    import os, runpy
+    runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "run.py"), run_name="__main__")
+    raise SystemExit
+
 import os
+import time
 import asyncio
+import itertools
 import logging
-from typing import Dict, List, Optional
-from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
 from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps
-from unidecode import unidecode
-import textwrap
-import aiohttp
 from pyrogram import Client, filters, idle
-from pyrogram.errors import FloodWait, MessageNotModified, UserNotParticipant, ChatAdminRequired
-from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message, CallbackQuery
-from pyrogram.enums import ParseMode, ChatType, ChatMemberStatus
-from pytgcalls import PyTgCalls, filters as fl
-from yt_dlp import YoutubeDL
+from pyrogram.errors import UserNotParticipant, ChatAdminRequired
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message, CallbackQuery, ChatMemberUpdated, User
+from pyrogram.enums import ParseMode, ChatType, ChatMemberStatus, ChatMembersFilter
+from pytgcalls import PyTgCalls
 from pytgcalls.types import MediaStream, StreamEnded
-from youtubesearchpython import VideosSearch
 from dotenv import load_dotenv
+from thumb import gen_thumb, start_pool, shutdown_pool, thumb_cache
+from httpclient import start_http, close_http
+from youtube import (
+    search_youtube, extract_info, extract_playlist, download as ytdl_download,
+    is_youtube_url, video_id, playlist_id, select_stream, stream_expiry, STREAM_EXPIRY_MARGIN,
+    info_cache, search_results
+)
+from cache import cache_key, TTLCache
+from mediacache import media_cache, MEDIA_DIR
+import tgstream
+from playqueue import Track, TrackQueue, QueueFull, QUEUE_LIMIT, format_duration
+from storage import create_store
+from progress import ProgressScheduler, PROGRESS_INTERVAL
+from ratelimit import limiter, HIGH, LOW
+from assistants import AssistantPool, session_strings
+import metrics
+from metrics import play_latency, track_gap, stream_failures, stream_fallbacks, start_metrics_server, hit_ratio
+from tracing import trace_request, traced, span, install_profiler_signal, profiler
+from loopwatch import watchdog
+from quality import PROFILES, Profile, load_monitor, resolve as resolve_quality
+from shard import SHARD_COUNT, SHARD_ID, owns, shard_sessions, dispatch_update, ShardServer, run_supervisor
 
 logging.basicConfig(
     level=logging.INFO,
@@ -30,6 +53,16 @@ API_ID = int(os.getenv("API_ID"))
 API_HASH = os.getenv("API_HASH")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 SESSION_STRING = os.getenv("SESSION_STRING")
+# Download lagu berikutnya ke disk saat prefetch (bukan hanya resolve URL stream)
+PREFETCH_DOWNLOAD = os.getenv("PREFETCH_DOWNLOAD", "0") == "1"
+# Lagu di depan antrean yang URL stream-nya sudah di-resolve (termasuk lagu berikutnya)
+PLAYLIST_LOOKAHEAD = int(os.getenv("PLAYLIST_LOOKAHEAD", "3"))
+# Maksimal lagu yang diambil dari satu playlist/mix
+PLAYLIST_LIMIT = int(os.getenv("PLAYLIST_LIMIT", "500"))
+# Lanjutkan lagu yang sedang diputar (dari posisi terakhir) setelah restart
+RESUME_ON_START = os.getenv("RESUME_ON_START", "1") == "1"
+# Daftar admin per grup di-cache selama ini (detik); update member membatalkan lebih cepat
+ADMIN_CACHE_TTL = int(os.getenv("ADMIN_CACHE_TTL", "600"))
 
 
 bot = Client(
@@ -37,138 +70,104 @@ bot = Client(
     bot_token=BOT_TOKEN,
     in_memory=True,
     workers=4,
-    parse_mode=ParseMode.HTML
-)
-
-ubot = Client(
-    name="user_bot",
-    api_id=API_ID,
-    api_hash=API_HASH,
-    session_string=SESSION_STRING,
-    in_memory=True,
-    workers=4,
-    device_model="Huawei P60 Pro",
-    system_version="Android 12",
-    app_version="10.5.0"
+    parse_mode=ParseMode.HTML,
+    # Worker shard tidak menerima update sendiri; semuanya diteruskan front-end
+    no_updates=SHARD_ID is not None
 )
 
 bot.is_bot = True
-ubot.is_bot = False
-call_py = PyTgCalls(ubot)
+# Userbot: SESSION_STRING, SESSION_STRING_2, ... masing-masing dengan PyTgCalls sendiri
+assistants = AssistantPool(API_ID, API_HASH, shard_sessions(session_strings()))
 
 
-queues: Dict[int, List[Dict]] = {}
-current_playing: Dict[int, Dict] = {}
+queues: Dict[int, TrackQueue] = {}
+current_playing: Dict[int, Track] = {}
 search_cache: Dict[int, Dict] = {}
 loop_mode: Dict[int, str] = {}
+# Profil kualitas per grup (low/medium/high); tidak ada = QUALITY_DEFAULT
+quality_mode: Dict[int, str] = {}
 now_playing_msgs: Dict[int, Dict] = {}
-progress_tasks: Dict[int, asyncio.Task] = {}
 start_times: Dict[int, datetime] = {}
 channel_connections: Dict[int, int] = {}
 active_cplay: Dict[int, int] = {}  
 muted_chats: Dict[int, bool] = {}  
+prefetch_tasks: Dict[int, Tuple[Track, asyncio.Task]] = {}
+lookahead_tasks: Dict[int, asyncio.Task] = {}
+# chat -> (waktu lagu sebelumnya berakhir, pemicu: "end" / "skip") untuk metrik jeda
+stream_ended_at: Dict[int, Tuple[float, str]] = {}
+# chat -> token stream yang sedang jalan; baru diisi setelah call.play berhasil
+stream_tokens: Dict[int, int] = {}
+_stream_seq = itertools.count(1)
+# chat -> (token, tipe, waktu) StreamEnded terakhir; stream video berakhir dua kali (audio + video)
+last_stream_end: Dict[int, Tuple[object, float]] = {}
+STREAM_END_DUP_WINDOW = 5
+# Satu pergantian lagu per chat pada satu waktu (stream end vs /skip)
+transition_locks: Dict[int, asyncio.Lock] = {}
+# Lagu yang berakhir lebih cepat dari ini dianggap gagal dan tidak di-loop
+LOOP_MIN_SECONDS = 3
+# Waktu /play (atau pilihan di tombol) untuk chat yang belum memutar apa pun
+play_requested: Dict[int, float] = {}
+# chat_id -> set user_id admin/owner
+admin_cache: TTLCache[set] = TTLCache(ADMIN_CACHE_TTL, 10000)
+admin_loads: Dict[int, asyncio.Future] = {}
+
+store = create_store()
+# Simpan akun yang dipakai tiap chat supaya setelah restart tidak perlu join ulang
+assistants.on_assign(lambda chat_id, index: store.set_setting(chat_id, 'assistant', index))
+
+
+ADMIN_STATUSES = (ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER)
+
+
+async def load_admins(chat_id: int) -> set:
+    """Ambil seluruh daftar admin grup sekali jalan lalu simpan di cache."""
+    await limiter.acquire(chat_id, HIGH, send=False)
+    admins = set()
+    async for member in bot.get_chat_members(chat_id, filter=ChatMembersFilter.ADMINISTRATORS):
+        if member.user and member.status in ADMIN_STATUSES:
+            admins.add(member.user.id)
+    admin_cache.put(chat_id, admins)
+    return admins
+
+
+async def get_admins(chat_id: int) -> set:
+    admins = admin_cache.get(chat_id)
+    if admins is not None:
+        return admins
+    # Banyak perintah admin sekaligus di chat yang sama cukup satu request
+    task = admin_loads.get(chat_id)
+    if task is None:
+        task = asyncio.ensure_future(load_admins(chat_id))
+        admin_loads[chat_id] = task
+        task.add_done_callback(lambda _: admin_loads.pop(chat_id, None))
+    return await asyncio.shield(task)
 
 
 async def is_admin(chat_id: int, user_id: int) -> bool:
     """Check if user is admin in group"""
     try:
-        member = await bot.get_chat_member(chat_id, user_id)
-        return member.status in [ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER]
+        return user_id in await get_admins(chat_id)
+    except Exception as e:
+        logger.warning(f"Admin list unavailable for {chat_id}: {e!r}")
+    try:
+        member = await limiter.call(chat_id, bot.get_chat_member, chat_id, user_id, priority=HIGH, send=False)
+        return member.status in ADMIN_STATUSES
     except Exception:
         return False
 
-async def gen_thumb(
-    title: str, 
-    duration: str, 
-    requester: str, 
-    thumbnail_url: str,
-    **kwargs
-) -> BytesIO:
-    requester = unidecode(requester)
-    width, height = 1280, 720
-    
-    background_raw = None
-    if thumbnail_url:
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(thumbnail_url, timeout=10) as resp:
-                    if resp.status == 200:
-                        background_raw = Image.open(BytesIO(await resp.read()))
-        except: pass
-
-    if not background_raw:
-        background_raw = Image.new('RGB', (width, height), color=(30, 30, 30))
-
-    bg = background_raw.resize((width, height), Image.LANCZOS)
-    bg = bg.filter(ImageFilter.GaussianBlur(radius=10))
-    
-    overlay = Image.new('RGBA', (width, height), (0, 0, 0, 160))
-    bg = bg.convert('RGBA')
-    bg = Image.alpha_composite(bg, overlay)
-    draw = ImageDraw.Draw(bg)
-
-    def load_font(size):
-        try:
-            return ImageFont.truetype("Title.ttf", size)
-        except Exception:
-            return ImageFont.load_default()
-
-    font_title = load_font(75)
-    font_sub = load_font(35)
-    font_time = load_font(30)
-
-    art_size = 400
-    album_art = ImageOps.fit(background_raw, (art_size, art_size), centering=(0.5, 0.5))
-    
-    mask = Image.new('L', (art_size, art_size), 0)
-    mask_draw = ImageDraw.Draw(mask)
-    mask_draw.ellipse((0, 0, art_size, art_size), fill=255)
-    
-    art_x, art_y = 100, (height - art_size) // 2
-    
-    bg.paste(album_art, (art_x, art_y), mask)
-    draw.ellipse((art_x, art_y, art_x + art_size, art_y + art_size), outline="white", width=10)
+async def reply(message: Message, text: str, **kwargs) -> Message:
+    """reply_text lewat rate limiter (prioritas tinggi)."""
+    return await limiter.call(message.chat.id, message.reply_text, text, priority=HIGH, **kwargs)
 
-    text_x = art_x + art_size + 70
-    current_y = 180 
-    
-    lines = textwrap.wrap(title, width=18)
-    for line in lines[:2]:
-        draw.text((text_x, current_y), line, fill="white", font=font_title)
-        current_y += 85
-    
-    draw.text((text_x, current_y + 10), f"Requested by {requester}", fill=(200, 200, 200), font=font_sub)
-
-    bar_y = 470
-    bar_width = 500
-    draw.line((text_x, bar_y, text_x + bar_width, bar_y), fill=(255, 255, 255, 60), width=8)
-    draw.line((text_x, bar_y, text_x + 300, bar_y), fill="#FF0000", width=8)
-    draw.ellipse((text_x + 300 - 10, bar_y - 10, text_x + 300 + 10, bar_y + 10), fill="#FF0000")
-    
-    draw.text((text_x, bar_y + 25), "00:00", fill="white", font=font_time)
-    draw.text((text_x + bar_width - 70, bar_y + 25), duration, fill="white", font=font_time)
-
-    ctrl_y = 560
-    draw.polygon([(text_x + 110, ctrl_y + 20), (text_x + 140, ctrl_y + 5), (text_x + 140, ctrl_y + 35)], fill="white")
-    draw.rectangle([text_x + 100, ctrl_y + 5, text_x + 106, ctrl_y + 35], fill="white")
-
-    draw.ellipse((text_x + 190, ctrl_y - 10, text_x + 250, ctrl_y + 50), fill="white")
-    draw.polygon([(text_x + 215, ctrl_y + 5), (text_x + 215, ctrl_y + 35), (text_x + 235, ctrl_y + 20)], fill="black")
-
-    draw.polygon([(text_x + 300, ctrl_y + 5), (text_x + 300, ctrl_y + 35), (text_x + 330, ctrl_y + 20)], fill="white")
-    draw.rectangle([text_x + 333, ctrl_y + 5, text_x + 339, ctrl_y + 35], fill="white")
-
-    img_byte_arr = BytesIO()
-    bg.convert('RGB').save(img_byte_arr, format='JPEG', quality=95)
-    img_byte_arr.seek(0)
-    return img_byte_arr
+async def edit_text(message: Message, text: str, **kwargs) -> Message:
+    return await limiter.call(message.chat.id, message.edit_text, text, priority=HIGH, **kwargs)
 
 async def create_invite_link(chat_id: int) -> Optional[str]:
     try:
-        chat = await bot.get_chat(chat_id)
+        chat = await limiter.call(chat_id, bot.get_chat, chat_id, priority=HIGH, send=False)
         if chat.type in [ChatType.GROUP, ChatType.SUPERGROUP]:
             try:
-                return await bot.export_chat_invite_link(chat_id)
+                return await limiter.call(chat_id, bot.export_chat_invite_link, chat_id, priority=HIGH, send=False)
             except ChatAdminRequired:
                 return None
         return None
@@ -177,18 +176,21 @@ async def create_invite_link(chat_id: int) -> Optional[str]:
         return None
 
 
+@traced("auto_join_chat")
 async def auto_join_chat(chat_id: int) -> bool:
+    assistant = assistants.get(chat_id)
+    ubot, ulimiter = assistant.client, assistant.limiter
     try:
-        chat = await ubot.get_chat(chat_id)
+        chat = await ulimiter.call(chat_id, ubot.get_chat, chat_id, priority=HIGH, send=False)
         if chat.type in [ChatType.GROUP, ChatType.SUPERGROUP]:
             try:
-                await ubot.get_chat_member(chat_id, ubot.me.id)
+                await ulimiter.call(chat_id, ubot.get_chat_member, chat_id, ubot.me.id, priority=HIGH, send=False)
                 return True
             except UserNotParticipant:
                 invite_link = await create_invite_link(chat_id)
                 if invite_link:
                     try:
-                        await ubot.join_chat(invite_link)
+                        await ulimiter.call(chat_id, ubot.join_chat, invite_link, priority=HIGH, send=False)
                         return True
                     except Exception:
                         return False
@@ -199,6 +201,107 @@ async def auto_join_chat(chat_id: int) -> bool:
         return False
 
 
+def get_queue(active_chat_id: int) -> TrackQueue:
+    queue = queues.get(active_chat_id)
+    if queue is None:
+        queue = queues[active_chat_id] = TrackQueue()
+    return queue
+
+
+def persist_chat(active_chat_id: int):
+    """Tandai antrean dan lagu yang diputar untuk disimpan pada flush berikutnya."""
+    store.save_queue(active_chat_id, queues.get(active_chat_id))
+    song_data = current_playing.get(active_chat_id)
+    started = start_times.get(active_chat_id)
+    position = (datetime.now() - started).total_seconds() if started else 0
+    store.save_playing(active_chat_id, song_data, max(0.0, position))
+
+
+def playing_positions() -> Dict[int, float]:
+    """Posisi putar tiap chat aktif, disimpan store pada setiap flush dan saat shutdown."""
+    now = datetime.now()
+    return {
+        chat_id: max(0.0, (now - started).total_seconds())
+        for chat_id, started in start_times.items()
+        if chat_id in current_playing
+    }
+
+
+def restore_track(data: Dict) -> Optional[Track]:
+    song_data = Track.from_dict(data)
+    # Pesan asal mungkin sudah hilang setelah restart
+    song_data.reply_to_message_id = None
+    song_data.start_offset = song_data.start_offset or 0
+    key, song_data.media_key = song_data.media_key, None
+    file_path = media_cache.lookup(key) if key else None
+    if file_path:
+        attach_media(song_data, key, file_path)
+    elif not song_data.url.startswith("http"):
+        return None
+    else:
+        song_data.source = song_data.audio_source = None
+    return song_data
+
+
+async def restore_state():
+    """Muat koneksi channel, setelan, antrean dan (opsional) lagu yang terakhir diputar."""
+    store.positions = playing_positions
+    saved = await store.load()
+    # Mode shard: hanya chat milik proses ini. Channel ikut shard grup yang terhubung.
+    linked: Dict[int, List[int]] = {}
+    for group_id, channel_id in saved.connections.items():
+        linked.setdefault(channel_id, []).append(group_id)
+
+    def mine(chat_id: int) -> bool:
+        groups = linked.get(chat_id)
+        return any(map(owns, groups)) if groups else owns(chat_id)
+
+    channel_connections.update({g: c for g, c in saved.connections.items() if owns(g)})
+    for chat_id, settings in saved.settings.items():
+        if not mine(chat_id):
+            continue
+        if settings.get('loop'):
+            loop_mode[chat_id] = settings['loop']
+        if settings.get('muted'):
+            muted_chats[chat_id] = True
+        if settings.get('quality'):
+            quality_mode[chat_id] = settings['quality']
+        if settings.get('assistant') is not None:
+            assistants.restore(chat_id, settings['assistant'])
+
+    for chat_id, items in saved.queues.items():
+        if not mine(chat_id):
+            continue
+        get_queue(chat_id).extend(filter(None, map(restore_track, items)))
+
+    resume = []
+    if RESUME_ON_START:
+        for chat_id, (data, elapsed) in saved.playing.items():
+            if not mine(chat_id):
+                continue
+            song_data = restore_track(data)
+            if song_data is None:
+                continue
+            # Lagu yang sudah (hampir) habis diputar ulang dari awal, bukan di-seek melewati akhir
+            if song_data.duration and elapsed >= song_data.duration - 1:
+                elapsed = 0
+            song_data.start_offset = elapsed
+            get_queue(chat_id).appendleft(song_data)
+            if song_data.group_id and song_data.group_id != chat_id:
+                active_cplay[song_data.group_id] = chat_id
+            resume.append(chat_id)
+
+    logger.info(
+        f"State dipulihkan: {len(channel_connections)} koneksi, {len(queues)} antrean, "
+        f"{len(resume)} lagu dilanjutkan"
+    )
+    for chat_id in resume:
+        try:
+            await play_next(chat_id)
+        except Exception as e:
+            logger.error(f"Resume failed in {chat_id}: {e}")
+
+
 def get_active_chat_id(group_id: int) -> int:
     """Get active chat ID (channel if cplay, group if normal play)"""
     if group_id in active_cplay:
@@ -206,74 +309,77 @@ def get_active_chat_id(group_id: int) -> int:
     return group_id
 
 
-@call_py.on_update(fl.stream_end())
-async def stream_end_handler(_: PyTgCalls, update: StreamEnded):
-    chat_id = update.chat_id
-    logger.info(f"Stream ended in chat: {chat_id}")
-    
-    if chat_id in progress_tasks:
-        progress_tasks[chat_id].cancel()
-        progress_tasks.pop(chat_id, None)
-    
-    start_times.pop(chat_id, None)
-    
-    playing_data = current_playing.pop(chat_id, None)
-    if playing_data:
-        file_path = playing_data.get("url")
-        if file_path and os.path.exists(file_path) and not str(file_path).startswith("http"):
-            try:
-                os.remove(file_path)
-            except Exception as e:
-                logger.error(f"Failed to delete file: {e}")
-    
-    if chat_id in now_playing_msgs:
-        try:
-            msg_data = now_playing_msgs[chat_id]
-            await bot.delete_messages(msg_data['group_id'], msg_data['message_id'])
-        except Exception:
-            pass
-        finally:
-            now_playing_msgs.pop(chat_id, None)
-    
-    await asyncio.sleep(1.5)
-    
-    if chat_id in queues and len(queues[chat_id]) > 0:
-        try:
-            await play_next(chat_id)
-        except Exception as e:
-            logger.error(f"Failed play_next: {e}")
-            try:
-                await call_py.leave_call(chat_id)
-            except Exception:
-                pass
-    else:
-        try:
-            await call_py.leave_call(chat_id)
-            
-            for group_id, channel_id in list(active_cplay.items()):
-                if channel_id == chat_id:
-                    active_cplay.pop(group_id, None)
-        except Exception as e:
-            logger.error(f"Error leave_call: {e}")
+async def advance(active_chat_id: int, trigger: str, token: Optional[int] = None) -> bool:
+    """Ganti ke lagu berikutnya di call yang sedang berjalan (play di call aktif
+    menukar stream tanpa keluar-masuk VC). `token` adalah stream_tokens saat event
+    terjadi; kalau stream sudah berganti (stream end datang bersamaan dengan /skip),
+    tidak melakukan apa-apa.
+    """
+    lock = transition_locks.setdefault(active_chat_id, asyncio.Lock())
+    async with lock:
+        if token is not None and stream_tokens.get(active_chat_id) != token:
+            return False
+        stream_ended_at[active_chat_id] = (time.monotonic(), trigger)
+        await play_next(active_chat_id, keep_previous=loop_track(active_chat_id, trigger))
+        return True
 
 
-async def search_youtube(query: str, limit: int = 10) -> List[Dict]:
+def loop_track(active_chat_id: int, trigger: str) -> bool:
+    """Kembalikan lagu yang selesai ke antrean sesuai /loop. Source, file media cache
+    dan foto now playing ikut dipakai ulang, jadi satu putaran tidak memanggil
+    yt-dlp atau merender thumbnail lagi (kecuali URL stream sudah kedaluwarsa).
+    Mengembalikan True kalau lagu itu masih dipakai (jangan dilepas).
+    """
+    song_data = current_playing.get(active_chat_id)
+    if song_data is None:
+        return False
+    mode = loop_mode.get(song_data.group_id or active_chat_id)
+    started = start_times.get(active_chat_id)
+    if not mode or not started or (datetime.now() - started).total_seconds() < LOOP_MIN_SECONDS:
+        return False
+    if mode == 'single' and trigger == 'end':
+        # /skip tetap pindah ke lagu berikutnya
+        get_queue(active_chat_id).appendleft(song_data)
+        return True
+    if mode == 'queue':
+        get_queue(active_chat_id).requeue(song_data)
+        return True
+    return False
+
+
+async def finish_call(active_chat_id: int):
+    """Antrean habis: keluar dari VC dan lepas assistant."""
+    assistants.mark_idle(active_chat_id)
     try:
-        search = VideosSearch(query, limit=limit)
-        results = search.result().get("result", [])
-        
-        videos = []
-        for video in results:
-            videos.append({
-                "title": video.get("title", "ᴛᴀɴᴘᴀ ᴊᴜᴅᴜʟ"),
-                "duration": video.get("duration", "ᴛɪᴅᴀᴋ ᴅɪᴋᴇᴛᴀʜᴜɪ"),
-                "thumbnail": video.get("thumbnails", [{}])[0].get("url", "") if video.get("thumbnails") else "",
-                "link": video.get("link", "")
-            })
-        return videos
+        await assistants.call(active_chat_id).leave_call(active_chat_id)
     except Exception as e:
-        logger.error(f"Error searching YouTube: {e}")
-        return []
+        logger.error(f"Error leave_call: {e}")
+    for group_id, channel_id in list(active_cplay.items()):
+        if channel_id == active_chat_id:
+            active_cplay.pop(group_id, None)
+
+
+@assistants.on_stream_end
+@trace_request("stream_end")
+async def stream_end_handler(_: PyTgCalls, update: StreamEnded):
+    chat_id = update.chat_id
+    logger.info(f"Stream ended in chat: {chat_id}")
+    token = stream_tokens.get(chat_id)
+    kind = getattr(update, "stream_type", None)
+    now = time.monotonic()
+    last = last_stream_end.get(chat_id)
+    if last is not None and last[0] != kind and now - last[1] < STREAM_END_DUP_WINDOW:
+        # Pasangan audio/video dari stream yang barusan berakhir; bisa datang
+        # setelah lagu berikutnya jalan sehingga tokennya sudah yang baru
+        last_stream_end.pop(chat_id, None)
+        return
+    last_stream_end[chat_id] = (kind, now)
+    
+    # Lagu berikutnya langsung diputar; pesan now playing lama dihapus play_next
+    # setelah audio baru jalan, jadi tidak menambah jeda
+    advanced = await advance(chat_id, "end", token)
+    if advanced and chat_id not in current_playing:
+        await finish_call(chat_id)
 
 
 def get_search_text(chat_id: int, query: str, page: int = 0) -> str:
@@ -326,36 +432,37 @@ def get_search_keyboard(chat_id: int, page: int = 0) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
-def get_now_playing_keyboard(current_seconds: float, total_seconds: float, active_chat_id: int) -> InlineKeyboardMarkup:
-    """Generate now playing control keyboard with progress bar."""
+def progress_bar(current_seconds: float, total_seconds: float) -> str:
+    """Bar tanpa jam; dipakai juga sebagai kunci perubahan progress bar."""
     bar_len = 10
     
     if total_seconds <= 0:
-        bar_text = "--:-- ━━━━━━━━━━━━ --:--"
+        return "━━━━━━━━━━━━"
+    
+    progress = min(current_seconds / total_seconds, 1.0)
+    filled = int(bar_len * progress)
+    
+    if filled == 0:
+        bar = "🔘" + "━" * (bar_len - 1)
+    elif filled == bar_len:
+        bar = "━" * (bar_len - 1) + "🔘"
     else:
-        progress = min(current_seconds / total_seconds, 1.0)
-        filled = int(bar_len * progress)
-        
-        if filled == 0:
-            bar = "🔘" + "━" * (bar_len - 1)
-        elif filled == bar_len:
-            bar = "━" * (bar_len - 1) + "🔘"
-        else:
-            bar = "━" * filled + "🔘" + "━" * (bar_len - filled - 1)
-        
-        def format_time(seconds: float) -> str:
-            if seconds < 0:
-                return "--:--"
-            m, s = divmod(int(seconds), 60)
-            h, m = divmod(m, 60)
-            if h > 0:
-                return f"{h}:{m:02d}:{s:02d}"
-            return f"{m:02d}:{s:02d}"
-        
-        current_time = format_time(current_seconds)
-        total_time = format_time(total_seconds)
-        bar_text = f"{current_time} {bar} {total_time}"
+        bar = "━" * filled + "🔘" + "━" * (bar_len - filled - 1)
+    return bar
+
+
+def progress_bar_text(current_seconds: float, total_seconds: float) -> str:
+    if total_seconds <= 0:
+        return f"--:-- {progress_bar(0, 0)} --:--"
+    bar = progress_bar(current_seconds, total_seconds)
+    
+    def format_time(seconds: float) -> str:
+        return "--:--" if seconds < 0 else format_duration(seconds)
     
+    return f"{format_time(current_seconds)} {bar} {format_time(total_seconds)}"
+
+
+def now_playing_markup(bar_text: str, active_chat_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup([
         [InlineKeyboardButton(text=bar_text, callback_data=f"progress_{active_chat_id}")],
         [
@@ -367,61 +474,37 @@ def get_now_playing_keyboard(current_seconds: float, total_seconds: float, activ
     ])
 
 
-async def update_progress_bar(group_id: int, message_id: int, active_chat_id: int):
-    """Task untuk update progress bar di keyboard."""
-    try:
-        interval = 8
-        
-        while True:
-            await asyncio.sleep(interval)
-            
-            if active_chat_id not in start_times or active_chat_id not in current_playing:
-                break
-            
-            song_data = current_playing[active_chat_id]
-            duration = song_data.get('duration', 0)
-            total_seconds = 0
-            
-            try:
-                if isinstance(duration, (int, float)):
-                    total_seconds = float(duration)
-                elif isinstance(duration, str):
-                    parts = duration.split(':')
-                    if len(parts) == 3:
-                        total_seconds = int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
-                    elif len(parts) == 2:
-                        total_seconds = int(parts[0]) * 60 + int(parts[1])
-                    elif len(parts) == 1:
-                        total_seconds = int(parts[0])
-            except Exception:
-                total_seconds = 0
-            
-            elapsed = (datetime.now() - start_times[active_chat_id]).total_seconds()
-            
-            if elapsed >= total_seconds:
-                break
-            
-            try:
-                await bot.edit_message_reply_markup(
-                    group_id,
-                    message_id,
-                    reply_markup=get_now_playing_keyboard(elapsed, total_seconds, active_chat_id)
-                )
-            except FloodWait as e:
-                await asyncio.sleep(e.value)
-            except MessageNotModified:
-                continue
-            except Exception as e:
-                if "MESSAGE_ID_INVALID" in str(e) or "message to edit not found" in str(e):
-                    break
-                
-    except asyncio.CancelledError:
-        pass
-    except Exception as e:
-        logger.error(f"Error in update_progress_bar: {e}")
+def get_now_playing_keyboard(current_seconds: float, total_seconds: float, active_chat_id: int) -> InlineKeyboardMarkup:
+    """Generate now playing control keyboard with progress bar."""
+    return now_playing_markup(progress_bar_text(current_seconds, total_seconds), active_chat_id)
+
 
+def render_progress(active_chat_id: int) -> Optional[Tuple[str, InlineKeyboardMarkup]]:
+    """Bar (kunci perubahan) + keyboard progress bar saat ini, atau None kalau lagu sudah selesai.
 
-async def play_next(active_chat_id: int):
+    Jam di tombol hanya ikut diperbarui saat posisi bar bergeser; edit yang hanya
+    mengubah jam dilewati.
+    """
+    if active_chat_id not in start_times or active_chat_id not in now_playing_msgs:
+        return None
+    total_seconds = now_playing_msgs[active_chat_id]['total_seconds']
+    elapsed = (datetime.now() - start_times[active_chat_id]).total_seconds()
+    if elapsed >= total_seconds:
+        return None
+    return progress_bar(elapsed, total_seconds), now_playing_markup(progress_bar_text(elapsed, total_seconds), active_chat_id)
+
+
+async def edit_progress(group_id: int, message_id: int, reply_markup: InlineKeyboardMarkup):
+    await limiter.call(
+        group_id, bot.edit_message_reply_markup, group_id, message_id,
+        reply_markup=reply_markup, priority=LOW, max_wait=PROGRESS_INTERVAL
+    )
+
+
+progress = ProgressScheduler(render_progress, edit_progress)
+
+
+async def play_next(active_chat_id: int, keep_previous: bool = False):
     try:
         if active_chat_id not in queues or not queues[active_chat_id]:
             
@@ -430,153 +513,358 @@ async def play_next(active_chat_id: int):
                     active_cplay.pop(group_id, None)
             
             if active_chat_id in current_playing:
-                del current_playing[active_chat_id]
+                await release_track(current_playing.pop(active_chat_id))
+            progress.cancel(active_chat_id)
             if active_chat_id in now_playing_msgs:
-                del now_playing_msgs[active_chat_id]
-            if active_chat_id in progress_tasks:
-                progress_tasks[active_chat_id].cancel()
-                del progress_tasks[active_chat_id]
+                msg_data = now_playing_msgs.pop(active_chat_id)
+                try:
+                    await limiter.call(msg_data['group_id'], bot.delete_messages, msg_data['group_id'], msg_data['message_id'])
+                except Exception:
+                    pass
             if active_chat_id in start_times:
                 del start_times[active_chat_id]
+            cancel_prefetch(active_chat_id)
+            play_requested.pop(active_chat_id, None)
+            stream_ended_at.pop(active_chat_id, None)
+            stream_tokens.pop(active_chat_id, None)
+            persist_chat(active_chat_id)
             
             return
         
-        song_data = queues[active_chat_id].pop(0)
+        song_data = queues[active_chat_id].popleft()
+        previous = current_playing.get(active_chat_id)
+        if previous is not None and previous is not song_data and not keep_previous:
+            # Jangan tunggu eviction media cache sebelum lagu baru jalan
+            asyncio.create_task(release_track(previous))
         current_playing[active_chat_id] = song_data
         
-        group_id = song_data.get('group_id', active_chat_id)
+        # Pakai hasil prefetch kalau lagu ini sudah/sedang disiapkan
+        pending = prefetch_tasks.pop(active_chat_id, None)
+        with span("resolve_source", prefetched=bool(pending and pending[0] is song_data)):
+            if pending and pending[0] is song_data:
+                await asyncio.wait([pending[1]])
+            elif pending:
+                pending[1].cancel()
+            await resolve_source(song_data)
         
+        group_id = song_data.group_id or active_chat_id
         
-        duration = song_data.get('duration', 0)
-        total_seconds = 0
-        
-        try:
-            if isinstance(duration, (int, float)):
-                total_seconds = float(duration)
-            elif isinstance(duration, str):
-                parts = duration.split(':')
-                if len(parts) == 3:
-                    total_seconds = int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
-                elif len(parts) == 2:
-                    total_seconds = int(parts[0]) * 60 + int(parts[1])
-                elif len(parts) == 1:
-                    total_seconds = int(parts[0])
-        except Exception:
-            total_seconds = 0
         
+        total_seconds = song_data.duration
         
         if group_id in muted_chats and muted_chats[group_id]:
             return await play_next(active_chat_id)
         
         
+        offset = song_data.start_offset
         try:
-            stream = MediaStream(
-                song_data['url'],
-                video_flags=MediaStream.Flags.IGNORE if song_data['stream_type'] == 'audio' else None
-            )
-            await call_py.play(active_chat_id, stream)
+            stream = make_stream(song_data, offset)
+            with span("call.play"):
+                await assistants.call(active_chat_id).play(active_chat_id, stream)
         except Exception as e:
             logger.warning(f"Stream failed: {e}")
+            stream_failures.inc(stage="stream")
             
-            if song_data['url'].startswith("http"):
+            if song_data.url.startswith("http"):
                 try:
+                    stream_fallbacks.inc()
                     await handle_stream_fallback(active_chat_id, song_data)
-                    stream = MediaStream(
-                        song_data['url'],
-                        video_flags=MediaStream.Flags.IGNORE if song_data['stream_type'] == 'audio' else None
-                    )
-                    await call_py.play(active_chat_id, stream)
+                    stream = make_stream(song_data, offset)
+                    with span("call.play", fallback=True):
+                        await assistants.call(active_chat_id).play(active_chat_id, stream)
                 except Exception as fallback_error:
-                    await bot.send_message(group_id, f"❌ ɢᴀɢᴀʟ ᴍᴇᴍᴜᴛᴀʀ: {str(fallback_error)[:100]}")
+                    stream_failures.inc(stage="fallback")
+                    await limiter.call(group_id, bot.send_message, group_id, f"❌ ɢᴀɢᴀʟ ᴍᴇᴍᴜᴛᴀʀ: {str(fallback_error)[:100]}")
                     return await play_next(active_chat_id)
             else:
-                await bot.send_message(group_id, f"❌ ɢᴀɢᴀʟ ᴍᴇᴍᴜᴛᴀʀ: {str(e)[:100]}")
+                await limiter.call(group_id, bot.send_message, group_id, f"❌ ɢᴀɢᴀʟ ᴍᴇᴍᴜᴛᴀʀ: {str(e)[:100]}")
                 return await play_next(active_chat_id)
         
-        start_times[active_chat_id] = datetime.now()
+        stream_tokens[active_chat_id] = next(_stream_seq)
+        assistants.mark_active(active_chat_id)
+        requested = play_requested.pop(active_chat_id, None)
+        if requested is not None:
+            play_latency.observe(time.monotonic() - requested)
+        start_times[active_chat_id] = datetime.now() - timedelta(seconds=offset)
+        song_data.start_offset = 0
+        persist_chat(active_chat_id)
+        
+        ended = stream_ended_at.pop(active_chat_id, None)
+        if ended is not None:
+            gap = time.monotonic() - ended[0]
+            track_gap.observe(gap, trigger=ended[1])
+            logger.info(f"Track gap in {active_chat_id} ({ended[1]}): {gap * 1000:.0f} ms")
+        
+        schedule_prefetch(active_chat_id)
         
         
         caption = (
             f"<b>🎵 sᴇᴅᴀɴɢ ᴅɪᴘᴜᴛᴀʀ</b>\n\n"
-            f"📌 <b>ᴊᴜᴅᴜʟ:</b> <a href='{song_data['url']}'>{song_data['title']}</a>\n"
-            f"👤 <b>ᴘᴇʀᴍɪɴᴛᴀᴀɴ:</b> {song_data['requester']}\n"
-            f"🎵 <b>ᴛɪᴘᴇ:</b> {song_data['stream_type'].upper()}"
+            f"📌 <b>ᴊᴜᴅᴜʟ:</b> <a href='{song_data.url}'>{song_data.title}</a>\n"
+            f"👤 <b>ᴘᴇʀᴍɪɴᴛᴀᴀɴ:</b> {song_data.requester}\n"
+            f"🎵 <b>ᴛɪᴘᴇ:</b> {song_data.stream_type.upper()}"
         )
         
         if active_chat_id in now_playing_msgs:
             try:
                 msg_data = now_playing_msgs[active_chat_id]
-                await bot.delete_messages(msg_data['group_id'], msg_data['message_id'])
+                await limiter.call(msg_data['group_id'], bot.delete_messages, msg_data['group_id'], msg_data['message_id'])
             except Exception:
                 pass
         
-        if active_chat_id in progress_tasks:
-            progress_tasks[active_chat_id].cancel()
+        progress.cancel(active_chat_id)
         
         status_msg = None
-        reply_id = song_data.get('reply_to_message_id')
+        reply_id = song_data.reply_to_message_id
         
-        thumb = await gen_thumb(
-            title=song_data['title'],
-            duration=str(song_data.get('duration', '0:00')),
-            requester=song_data['requester'],
-            thumbnail_url=song_data['thumbnail']
-            )
+        try:
+            # Lagu yang di-loop sudah punya foto di server Telegram
+            thumb = song_data.photo_id or await now_playing_thumb(song_data)
 
-        status_msg = await bot.send_photo(
-            group_id,
-            photo=thumb,
-            caption=caption,
-            reply_markup=get_now_playing_keyboard(0, total_seconds, active_chat_id),
-            reply_to_message_id=reply_id,
-            parse_mode=ParseMode.HTML
-        )
-        """except Exception:
-            status_msg = await bot.send_message(
-                group_id,
-                text=caption,
-                reply_markup=get_now_playing_keyboard(0, total_seconds, active_chat_id),
-                reply_to_message_id=reply_id,
-                parse_mode=ParseMode.HTML,
-                disable_web_page_preview=True
-            )"""
+            with span("send_photo"):
+                status_msg = await limiter.call(
+                    group_id, bot.send_photo,
+                    group_id,
+                    photo=thumb,
+                    caption=caption,
+                    reply_markup=get_now_playing_keyboard(0, total_seconds, active_chat_id),
+                    reply_to_message_id=reply_id,
+                    parse_mode=ParseMode.HTML
+                )
+        except Exception as e:
+            # Pool thumbnail penuh/gagal: tetap kirim status tanpa gambar
+            logger.warning(f"Thumbnail skipped: {e!r}")
+            with span("send_message"):
+                status_msg = await limiter.call(
+                    group_id, bot.send_message,
+                    group_id,
+                    text=caption,
+                    reply_markup=get_now_playing_keyboard(0, total_seconds, active_chat_id),
+                    reply_to_message_id=reply_id,
+                    parse_mode=ParseMode.HTML,
+                    disable_web_page_preview=True
+                )
         
+        if getattr(status_msg, 'photo', None):
+            song_data.photo_id = status_msg.photo.file_id
+
         now_playing_msgs[active_chat_id] = {
             'message_id': status_msg.id,
             'group_id': group_id,
             'total_seconds': total_seconds,
         }
 
-        progress_tasks[active_chat_id] = asyncio.create_task(
-            update_progress_bar(group_id, status_msg.id, active_chat_id)
-        )
+        progress.schedule(active_chat_id, group_id, status_msg.id, progress_bar(0, total_seconds))
 
     except Exception as e:
         logger.error(f"Fatal error in play_next: {e}")
 
 
-async def handle_stream_fallback(active_chat_id: int, song_data: Dict):
+def track_profile(song_data: Track) -> Profile:
+    """Profil kualitas efektif untuk lagu (setelan grup + penurunan otomatis)."""
+    return resolve_quality(quality_mode.get(song_data.group_id))
+
+
+def make_stream(song_data: Track, offset: float) -> MediaStream:
+    profile = track_profile(song_data)
+    return MediaStream(
+        song_data.source or song_data.url,
+        audio_path=song_data.audio_source,
+        audio_parameters=profile.audio,
+        video_parameters=profile.video,
+        video_flags=MediaStream.Flags.IGNORE if song_data.stream_type == 'audio' else None,
+        ffmpeg_parameters=f"-ss {offset:.0f}" if offset else None
+    )
+
+
+async def handle_stream_fallback(active_chat_id: int, song_data: Track):
     try:
-        url = song_data['url']
+        url = song_data.url
         if url.startswith("http"):
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'outtmpl': f'downloads/%(id)s.%(ext)s',
-                'quiet': True,
-                'no_warnings': True,
-                'socket_timeout': 30,
-                'retries': 10,
-            }
-            
-            with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                file_path = ydl.prepare_filename(info)
-                song_data['url'] = file_path
+            profile = track_profile(song_data)
+            vid = video_id(url)
+            key = f"yt-{vid}-audio-{profile.name}" if vid else f"url-{cache_key(url)}-audio-{profile.name}"
+            file_path = media_cache.lookup(key)
+            if not file_path:
+                ydl_opts = {
+                    'format': profile.ytdl_format,
+                    'outtmpl': os.path.join(MEDIA_DIR, f'{key}.%(ext)s'),
+                    'socket_timeout': 30,
+                    'retries': 10,
+                }
+                
+                _, file_path = await ytdl_download(url, ydl_opts)
+                file_path = await media_cache.add(key, file_path, acquire=True)
+                attach_media(song_data, key, file_path, acquired=True)
+            else:
+                attach_media(song_data, key, file_path)
+            song_data.stream_expires = None
     except Exception as e:
         logger.error(f"Failed fallback download: {e}")
         raise e
 
 
+def attach_media(song_data: Track, key: str, file_path: str, acquired: bool = False):
+    """Pasang file dari media cache ke lagu dan tahan selama lagu masih di antrean/diputar.
+
+    acquired=True: ref sudah diambil lewat media_cache.add(..., acquire=True).
+    """
+    if song_data.media_key != key:
+        if song_data.media_key:
+            asyncio.create_task(media_cache.release(song_data.media_key))
+        if not acquired:
+            media_cache.acquire(key)
+        song_data.media_key = key
+    elif acquired:
+        # Lagu sudah memegang ref untuk key ini; ref dari add tidak diperlukan
+        asyncio.create_task(media_cache.release(key))
+    song_data.source = file_path
+    song_data.audio_source = None
+
+
+async def release_track(song_data: Track):
+    """Lepas file media cache milik lagu yang sudah selesai/dibuang dari antrean."""
+    key, song_data.media_key = song_data.media_key, None
+    if key:
+        await media_cache.release(key)
+
+
+def source_expired(song_data: Track) -> bool:
+    expires = song_data.stream_expires
+    return bool(expires) and time.time() > expires - STREAM_EXPIRY_MARGIN
+
+
+async def resolve_source(song_data: Track):
+    """Isi song_data.source dengan URL stream langsung untuk link YouTube."""
+    if tgstream.is_stream_url(song_data.source) and not tgstream.downloading(song_data.media_key):
+        # Download progresif sudah selesai: putar dari file lokal
+        song_data.source = song_data.url
+        song_data.audio_source = None
+    url = song_data.url
+    if not url.startswith("http") or not is_youtube_url(url):
+        return
+    if song_data.source and not source_expired(song_data):
+        return
+    try:
+        info = await extract_info(url)
+        # Placeholder playlist belum tentu punya durasi
+        if not song_data.duration:
+            song_data.set_duration(info.get("duration"))
+        profile = track_profile(song_data)
+        song_data.source, song_data.audio_source = select_stream(
+            info, song_data.stream_type, profile.max_height, profile.max_abr
+        )
+        song_data.stream_expires = stream_expiry(info) if song_data.source else None
+    except Exception as e:
+        # MediaStream masih bisa memakai link halaman, jadi cukup dicatat
+        logger.warning(f"Resolve stream failed for {url}: {e!r}")
+        song_data.source = song_data.audio_source = None
+
+
+async def now_playing_thumb(song_data: Track) -> BytesIO:
+    return await gen_thumb(
+        title=song_data.title,
+        duration=song_data.duration_text,
+        requester=song_data.requester,
+        thumbnail_url=song_data.thumbnail
+        )
+
+
+async def prepare_track(active_chat_id: int, song_data: Track):
+    """Siapkan lagu berikutnya selagi lagu sekarang diputar: stream atau file lokal.
+
+    play_next menunggu task ini sebelum memutar, jadi thumbnail dirender terpisah
+    (warm_thumb) supaya antrean render tidak menambah jeda antar lagu.
+    """
+    try:
+        if PREFETCH_DOWNLOAD and song_data.url.startswith("http") and not os.path.exists(song_data.source or ""):
+            await handle_stream_fallback(active_chat_id, song_data)
+        else:
+            await resolve_source(song_data)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning(f"Prefetch failed in {active_chat_id}: {e!r}")
+    if not song_data.photo_id:
+        asyncio.create_task(warm_thumb(song_data))
+
+
+async def warm_thumb(song_data: Track):
+    try:
+        await now_playing_thumb(song_data)
+    except Exception as e:
+        logger.warning(f"Thumbnail prefetch failed: {e!r}")
+
+
+def schedule_prefetch(active_chat_id: int):
+    """Mulai prefetch untuk lagu di depan antrean kalau belum berjalan."""
+    if active_chat_id not in current_playing or not queues.get(active_chat_id):
+        return
+    song_data = queues[active_chat_id].peek()
+    pending = prefetch_tasks.get(active_chat_id)
+    if pending and pending[0] is song_data:
+        return
+    if pending:
+        pending[1].cancel()
+    prefetch_tasks[active_chat_id] = (
+        song_data,
+        asyncio.create_task(prepare_track(active_chat_id, song_data))
+    )
+    ahead = [t for t in queues[active_chat_id].head(PLAYLIST_LOOKAHEAD)[1:] if not t.source]
+    if ahead:
+        task = lookahead_tasks.pop(active_chat_id, None)
+        if task:
+            task.cancel()
+        lookahead_tasks[active_chat_id] = asyncio.create_task(resolve_ahead(ahead))
+
+
+async def resolve_ahead(tracks: List[Track]):
+    """Resolve lagu setelah lagu berikutnya satu per satu (placeholder playlist
+    baru diekstrak saat sudah dekat giliran)."""
+    for song_data in tracks:
+        await resolve_source(song_data)
+
+
+def cancel_prefetch(active_chat_id: int):
+    pending = prefetch_tasks.pop(active_chat_id, None)
+    if pending:
+        pending[1].cancel()
+    task = lookahead_tasks.pop(active_chat_id, None)
+    if task:
+        task.cancel()
+
+
+async def queue_playlist(loading_msg: Message, url: str, req: str, active_chat_id: int, group_id: int,
+                         reply_id: Optional[int], received: float):
+    """Masukkan playlist/mix sebagai placeholder (judul, durasi, thumbnail dari daftar
+    flat). Stream tiap lagu di-resolve saat masuk PLAYLIST_LOOKAHEAD dari posisi putar."""
+    queue = get_queue(active_chat_id)
+    room = min(PLAYLIST_LIMIT, queue.maxlen - len(queue)) if queue.maxlen else PLAYLIST_LIMIT
+    if room <= 0:
+        return await edit_text(loading_msg, f"❌ ᴀɴᴛʀᴇᴀɴ ᴘᴇɴᴜʜ ({QUEUE_LIMIT} ʟᴀɢᴜ)")
+    try:
+        title, entries = await extract_playlist(url, room)
+    except Exception as e:
+        return await edit_text(loading_msg, f"❌ ɢᴀɢᴀʟ: {e}")
+    if not entries:
+        return await edit_text(loading_msg, "❌ ᴘʟᴀʏʟɪsᴛ ᴋᴏsᴏɴɢ.")
+
+    added = queue.extend(
+        Track.from_result(entry, "audio", req, group_id, reply_id if i == 0 else None)
+        for i, entry in enumerate(entries)
+    )
+    persist_chat(active_chat_id)
+    text = f"✅ <b>ᴘʟᴀʏʟɪsᴛ ᴅɪᴛᴀᴍʙᴀʜᴋᴀɴ:</b> {title}\n└ {added} ʟᴀɢᴜ"
+
+    if active_chat_id in current_playing:
+        schedule_prefetch(active_chat_id)
+        await edit_text(loading_msg, text)
+    else:
+        await edit_text(loading_msg, text)
+        play_requested[active_chat_id] = received
+        await play_next(active_chat_id)
+
+
 @bot.on_message(filters.command("start") & filters.private)
 async def start_private(_, message: Message):
     nama = message.from_user.first_name
@@ -599,7 +887,8 @@ async def start_private(_, message: Message):
         ]
     ])
     
-    await message.reply(
+    await reply(
+        message,
         teks,
         reply_markup=kb,
         parse_mode=ParseMode.HTML
@@ -619,11 +908,13 @@ async def start_group(_, message: Message):
         ]
     ])
     
-    await message.reply(teks, reply_markup=kb, parse_mode=ParseMode.HTML)
+    await reply(message, teks, reply_markup=kb, parse_mode=ParseMode.HTML)
 
 
 @bot.on_message(filters.group & filters.command(["play", "cplay"]))
+@trace_request("play")
 async def play_command(client, message: Message):
+    received = time.monotonic()
     chat_id = message.chat.id
     req = message.from_user.first_name if message.from_user else "ᴀᴅᴍɪɴ"
     
@@ -636,7 +927,7 @@ async def play_command(client, message: Message):
             active_chat_id = linked_channel
             active_cplay[chat_id] = linked_channel
         else:
-            await message.reply_text(
+            await reply(message,
                 "❌ <b>ᴛɪᴅᴀᴋ ᴀᴅᴀ ᴄʜᴀɴɴᴇʟ ʏᴀɴɢ ᴛᴇʀʜᴜʙᴜɴɢ.</b>\n"
                 "ɢᴜɴᴀᴋᴀɴ /connect [ᴄʜᴀɴɴᴇʟ_ɪᴅ]",
                 parse_mode=ParseMode.HTML
@@ -648,9 +939,9 @@ async def play_command(client, message: Message):
     
     
     if not await auto_join_chat(active_chat_id):
-        await message.reply_text(
+        await reply(message,
             f"❌ <b>ᴜʙᴏᴛ ɢᴀɢᴀʟ ᴊᴏɪɴ.</b>\n"
-            f"ᴍᴏʜᴏɴ ᴛᴀᴍʙᴀʜᴋᴀɴ @{ubot.me.username}",
+            f"ᴍᴏʜᴏɴ ᴛᴀᴍʙᴀʜᴋᴀɴ @{assistants.get(active_chat_id).username}",
             parse_mode=ParseMode.HTML
         )
         return
@@ -658,60 +949,69 @@ async def play_command(client, message: Message):
     if message.reply_to_message:
         target = message.reply_to_message
         if target.audio or target.voice or target.video:
-            loading_msg = await message.reply("⏳ <b>ᴍᴇᴍᴘʀᴏsᴇs ᴍᴇᴅɪᴀ...</b>")
+            loading_msg = await reply(message, "⏳ <b>ᴍᴇᴍᴘʀᴏsᴇs ᴍᴇᴅɪᴀ...</b>")
             try:
-                file_path = await client.download_media(target)
-                if target.audio:
-                    title = target.audio.title or target.audio.file_name or "ᴀᴜᴅɪᴏ ᴛᴇʟᴇɢʀᴀᴍ"
-                    duration = target.audio.duration
-                elif target.video:
-                    title = target.video.file_name or "ᴠɪᴅᴇᴏ ᴛᴇʟᴇɢʀᴀᴍ"
-                    duration = target.video.duration
-                else:
-                    title = "ᴠᴏɪᴄᴇ ᴍᴇssᴀɢᴇ"
-                    duration = target.voice.duration if target.voice else 0
-                
-                duration = duration or 0
-                song_data = {
-                    "title": title,
-                    "url": file_path,
-                    "stream_type": "audio" if not target.video else "video",
-                    "requester": req,
-                    "duration": duration,
-                    "reply_to_message_id": message.id,
-                    "group_id": chat_id
-                }
-
-                if active_chat_id not in queues:
-                    queues[active_chat_id] = []
-                queues[active_chat_id].append(song_data)
+                media = target.audio or target.video or target.voice
+                key = f"tg-{media.file_unique_id}"
+                stream_url = None
+                acquired = False
+                # Masih di-download progresif oleh /play sebelumnya: ikut stream yang sama
+                file_path = None if tgstream.downloading(key) else media_cache.lookup(key)
+                if not file_path:
+                    ext = os.path.splitext(getattr(media, 'file_name', None) or "")[1]
+                    if not ext:
+                        ext = ".ogg" if target.voice else ".mp4" if target.video else ".mp3"
+                    if tgstream.downloading(key) or tgstream.should_stream(media):
+                        # Mulai putar setelah beberapa MB pertama, sisanya menyusul
+                        file_path, stream_url = await tgstream.start(client, target, media, key, media_cache.path_for(key, ext))
+                    else:
+                        file_path = await client.download_media(target, file_name=media_cache.path_for(key, ext))
+                        file_path = await media_cache.add(key, file_path, acquire=True)
+                        acquired = True
+                song_data = Track.from_telegram(target, file_path, req, chat_id, message.id)
+
+                attach_media(song_data, key, file_path, acquired=acquired)
+                try:
+                    get_queue(active_chat_id).append(song_data)
+                except QueueFull:
+                    await release_track(song_data)
+                    raise
+                if stream_url:
+                    song_data.source = stream_url
+                persist_chat(active_chat_id)
 
                 if active_chat_id in current_playing:
-                    await loading_msg.edit_text(f"✅ <b>ᴅɪᴛᴀᴍʙᴀʜᴋᴀɴ ᴋᴇ ᴀɴᴛʀɪᴀɴ:</b>\n└ {title}")
+                    schedule_prefetch(active_chat_id)
+                    await edit_text(loading_msg, f"✅ <b>ᴅɪᴛᴀᴍʙᴀʜᴋᴀɴ ᴋᴇ ᴀɴᴛʀɪᴀɴ:</b>\n└ {song_data.title}")
                 else:
-                    await loading_msg.edit_text(f"🎵 <b>ᴍᴇᴍᴜʟᴀɪ ᴘᴇᴍᴜᴛᴀʀᴀɴ...</b>")
+                    await edit_text(loading_msg, f"🎵 <b>ᴍᴇᴍᴜʟᴀɪ ᴘᴇᴍᴜᴛᴀʀᴀɴ...</b>")
+                    play_requested[active_chat_id] = received
                     await play_next(active_chat_id)
                 return
             except Exception as e:
-                await loading_msg.edit_text(f"❌ ɢᴀɢᴀʟ: {e}")
+                await edit_text(loading_msg, f"❌ ɢᴀɢᴀʟ: {e}")
                 return
     
     if len(message.command) < 2:
-        return await message.reply("❌ ᴍᴀsᴜᴋᴋᴀɴ ᴊᴜᴅᴜʟ ᴀᴛᴀᴜ ʀᴇᴘʟʏ ᴍᴇᴅɪᴀ!")
+        return await reply(message, "❌ ᴍᴀsᴜᴋᴋᴀɴ ᴊᴜᴅᴜʟ ᴀᴛᴀᴜ ʀᴇᴘʟʏ ᴍᴇᴅɪᴀ!")
     
-    loading_msg = await message.reply("⏳ <b>ᴍᴇᴍᴘʀᴏsᴇs ᴘᴇʀᴍɪɴᴛᴀᴀɴ...</b>")
+    loading_msg = await reply(message, "⏳ <b>ᴍᴇᴍᴘʀᴏsᴇs ᴘᴇʀᴍɪɴᴛᴀᴀɴ...</b>")
     query = " ".join(message.command[1:])
     
-    if "youtube.com" in query or "youtu.be" in query:
+    if playlist_id(query):
+        await queue_playlist(loading_msg, query, req, active_chat_id, chat_id, message.id, received)
+    elif "youtube.com" in query or "youtu.be" in query:
         try:
-            with YoutubeDL({'quiet': True, 'noplaylist': True}) as ydl:
-                info = ydl.extract_info(query, download=False)
+            info = await extract_info(query)
             search_cache[chat_id] = {
-                'direct': info.get("webpage_url", query),
-                'title': info.get("title", "ʏᴏᴜᴛᴜʙᴇ"),
+                # Bentuknya sama dengan hasil pencarian, untuk Track.from_result
+                'direct': {
+                    'link': info.get("webpage_url", query),
+                    'title': info.get("title", "ʏᴏᴜᴛᴜʙᴇ"),
+                    'duration': info.get("duration"),
+                    'thumbnail': info.get("thumbnail", ""),
+                },
                 'req': req,
-                'duration': info.get("duration_string", "00:00"),
-                'thumbnail': info.get("thumbnail", ""),
                 'active_chat_id': active_chat_id,
                 'group_id': chat_id
             }
@@ -719,13 +1019,13 @@ async def play_command(client, message: Message):
                 InlineKeyboardButton("🎵 ᴀᴜᴅɪᴏ", callback_data="type_audio_direct"),
                 InlineKeyboardButton("🎬 ᴠɪᴅᴇᴏ", callback_data="type_video_direct")
             ]])
-            await loading_msg.edit_text(f"✅ <b>ʟɪɴᴋ ᴛᴇʀᴅᴇᴛᴇᴋsɪ</b>\n└ <code>{search_cache[chat_id]['title']}</code>", reply_markup=kb)
+            await edit_text(loading_msg, f"✅ <b>ʟɪɴᴋ ᴛᴇʀᴅᴇᴛᴇᴋsɪ</b>\n└ <code>{search_cache[chat_id]['direct']['title']}</code>", reply_markup=kb)
         except Exception as e:
-            await loading_msg.edit_text(f"❌ ɢᴀɢᴀʟ: {e}")
+            await edit_text(loading_msg, f"❌ ɢᴀɢᴀʟ: {e}")
     else:
         results = await search_youtube(query)
         if not results:
-            return await loading_msg.edit_text("❌ ᴛɪᴅᴀᴋ ᴅɪᴛᴇᴍᴜᴋᴀɴ.")
+            return await edit_text(loading_msg, "❌ ᴛɪᴅᴀᴋ ᴅɪᴛᴇᴍᴜᴋᴀɴ.")
         search_cache[chat_id] = {
             'results': results, 
             'req': req, 
@@ -733,7 +1033,7 @@ async def play_command(client, message: Message):
             'active_chat_id': active_chat_id,
             'group_id': chat_id
         }
-        await loading_msg.edit_text(
+        await edit_text(loading_msg, 
             get_search_text(chat_id, query, 0), 
             reply_markup=get_search_keyboard(chat_id, 0), 
             disable_web_page_preview=True
@@ -744,10 +1044,10 @@ async def play_command(client, message: Message):
 async def connect_command(_, message: Message):
     
     if not await is_admin(message.chat.id, message.from_user.id):
-        return await message.reply_text("❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
+        return await reply(message, "❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
     
     if len(message.command) < 2:
-        return await message.reply_text(
+        return await reply(message,
             "❌ <b>ᴘᴇɴɢɢᴜɴᴀᴀɴ:</b> /connect [ᴄʜᴀɴɴᴇʟ_ɪᴅ]\n"
             "ᴄᴏɴᴛᴏʜ: /connect -1001234567890",
             parse_mode=ParseMode.HTML
@@ -756,117 +1056,109 @@ async def connect_command(_, message: Message):
     try:
         channel_id = int(message.command[1])
         channel_connections[message.chat.id] = channel_id
+        store.set_connection(message.chat.id, channel_id)
         
         try:
-            await bot.get_chat_member(channel_id, bot.me.id)
+            await limiter.call(channel_id, bot.get_chat_member, channel_id, bot.me.id, priority=HIGH, send=False)
         except UserNotParticipant:
-            return await message.reply_text(
+            return await reply(message,
                 "⚠️ <b>ʙᴏᴛ ʙᴇʟᴜᴍ ᴊᴏɪɴ ᴋᴇ ᴄʜᴀɴɴᴇʟ.</b>\n"
                 "ᴍᴏʜᴏɴ ᴛᴀᴍʙᴀʜᴋᴀɴ ʙᴏᴛ ᴋᴇ ᴄʜᴀɴɴᴇʟ.",
                 parse_mode=ParseMode.HTML
             )
         
-        await message.reply_text(
+        await reply(message,
             f"✅ <b>ɢʀᴏᴜᴘ ᴛᴇʟᴀʜ ᴛᴇʀʜᴜʙᴜɴɢ ᴋᴇ ᴄʜᴀɴɴᴇʟ:</b> {channel_id}\n"
             "ɢᴜɴᴀᴋᴀɴ /cplay ᴜɴᴛᴜᴋ ᴍᴇᴍᴜᴛᴀʀ ᴍᴜsɪᴋ ᴅɪ ᴄʜᴀɴɴᴇʟ.",
             parse_mode=ParseMode.HTML
         )
     except Exception as e:
-        await message.reply_text(f"❌ ɢᴀɢᴀʟ: {str(e)[:100]}")
+        await reply(message, f"❌ ɢᴀɢᴀʟ: {str(e)[:100]}")
 
 
 @bot.on_message(filters.group & filters.command("disconnect"))
 async def disconnect_command(_, message: Message):
     
     if not await is_admin(message.chat.id, message.from_user.id):
-        return await message.reply_text("❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
+        return await reply(message, "❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
     
     chat_id = message.chat.id
     if chat_id in channel_connections:
         channel_id = channel_connections.pop(chat_id)
+        store.set_connection(chat_id, None)
         active_cplay.pop(chat_id, None)
-        await message.reply_text(
+        await reply(message,
             f"✅ <b>ɢʀᴏᴜᴘ ᴛᴇʟᴀʜ ᴛᴇʀᴘᴜᴛᴜs ᴅᴀʀɪ ᴄʜᴀɴɴᴇʟ:</b> {channel_id}",
             parse_mode=ParseMode.HTML
         )
     else:
-        await message.reply_text(
+        await reply(message,
             "❌ <b>ɢʀᴏᴜᴘ ʙᴇʟᴜᴍ ᴛᴇʀʜᴜʙᴜɴɢ ᴋᴇ sᴇᴍʙᴀʀᴀɴɢ ᴄʜᴀɴɴᴇʟ.</b>",
             parse_mode=ParseMode.HTML
         )
 
 
 @bot.on_message(filters.group & filters.command("skip"))
+@trace_request("skip")
 async def skip_command(_, message: Message):
     chat_id = message.chat.id
     
     
     if not await is_admin(chat_id, message.from_user.id):
-        return await message.reply_text("❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
+        return await reply(message, "❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
     
     
     active_chat_id = get_active_chat_id(chat_id)
     
     if active_chat_id not in current_playing:
-        return await message.reply_text("❌ ᴛɪᴅᴀᴋ ᴀᴅᴀ ʟᴀɢᴜ ʏᴀɴɢ sᴇᴅᴀɴɢ ᴅɪᴘᴜᴛᴀʀ.")
-    
-    if active_chat_id in progress_tasks:
-        progress_tasks[active_chat_id].cancel()
-        del progress_tasks[active_chat_id]
-    
-    if active_chat_id in start_times:
-        del start_times[active_chat_id]
+        return await reply(message, "❌ ᴛɪᴅᴀᴋ ᴀᴅᴀ ʟᴀɢᴜ ʏᴀɴɢ sᴇᴅᴀɴɢ ᴅɪᴘᴜᴛᴀʀ.")
     
-    if active_chat_id in now_playing_msgs:
-        try:
-            msg_data = now_playing_msgs[active_chat_id]
-            await bot.delete_messages(msg_data['group_id'], msg_data['message_id'])
-            del now_playing_msgs[active_chat_id]
-        except:
-            pass
-    
-    await asyncio.sleep(1)
-    await play_next(active_chat_id)
-    await message.reply_text("⏭ <b>ᴅɪʟᴇᴡᴀᴛɪ ᴋᴇ ʟᴀɢᴜ ʙᴇʀɪᴋᴜᴛɴʏᴀ.</b>")
+    if await advance(active_chat_id, "skip", stream_tokens.get(active_chat_id)) and active_chat_id not in current_playing:
+        await finish_call(active_chat_id)
+    await reply(message, "⏭ <b>ᴅɪʟᴇᴡᴀᴛɪ ᴋᴇ ʟᴀɢᴜ ʙᴇʀɪᴋᴜᴛɴʏᴀ.</b>")
 
 
 @bot.on_message(filters.group & filters.command("stop"))
+@trace_request("stop")
 async def stop_command(_, message: Message):
     chat_id = message.chat.id
     
     
     if not await is_admin(chat_id, message.from_user.id):
-        return await message.reply_text("❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
+        return await reply(message, "❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
     
     
     active_chat_id = get_active_chat_id(chat_id)
     
-    if active_chat_id in progress_tasks:
-        progress_tasks[active_chat_id].cancel()
-        del progress_tasks[active_chat_id]
+    progress.cancel(active_chat_id)
     
     if active_chat_id in start_times:
         del start_times[active_chat_id]
     
+    cancel_prefetch(active_chat_id)
     if active_chat_id in queues:
-        queues[active_chat_id].clear()
+        for song_data in queues[active_chat_id].clear():
+            await release_track(song_data)
     if active_chat_id in current_playing:
-        del current_playing[active_chat_id]
+        await release_track(current_playing.pop(active_chat_id))
+    stream_tokens.pop(active_chat_id, None)
+    persist_chat(active_chat_id)
     
     if active_chat_id in now_playing_msgs:
         try:
             msg_data = now_playing_msgs[active_chat_id]
-            await bot.delete_messages(msg_data['group_id'], msg_data['message_id'])
+            await limiter.call(msg_data['group_id'], bot.delete_messages, msg_data['group_id'], msg_data['message_id'])
             del now_playing_msgs[active_chat_id]
         except:
             pass
     
+    assistants.mark_idle(active_chat_id)
     try:
-        await call_py.leave_call(active_chat_id)
+        await assistants.call(active_chat_id).leave_call(active_chat_id)
     except:
         pass
     
-    await message.reply_text("⏹ <b>ᴅɪʜᴇɴᴛɪᴋᴀɴ ᴅᴀɴ ᴀɴᴛʀɪᴀɴ ᴅɪᴋᴏsᴏɴɢᴋᴀɴ.</b>")
+    await reply(message, "⏹ <b>ᴅɪʜᴇɴᴛɪᴋᴀɴ ᴅᴀɴ ᴀɴᴛʀɪᴀɴ ᴅɪᴋᴏsᴏɴɢᴋᴀɴ.</b>")
 
 
 @bot.on_message(filters.group & filters.command("pause"))
@@ -875,16 +1167,16 @@ async def pause_command(_, message: Message):
     
     
     if not await is_admin(chat_id, message.from_user.id):
-        return await message.reply_text("❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
+        return await reply(message, "❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
     
     
     active_chat_id = get_active_chat_id(chat_id)
     
     try:
-        await call_py.pause(active_chat_id)
-        await message.reply_text("⏸ <b>ᴅɪᴊᴇᴅᴀ.</b>")
+        await assistants.call(active_chat_id).pause(active_chat_id)
+        await reply(message, "⏸ <b>ᴅɪᴊᴇᴅᴀ.</b>")
     except:
-        await message.reply_text("❌ ᴛɪᴅᴀᴋ ᴀᴅᴀ ᴘᴇᴍᴜᴛᴀʀᴀɴ ʏᴀɴɢ ᴀᴋᴛɪғ.")
+        await reply(message, "❌ ᴛɪᴅᴀᴋ ᴀᴅᴀ ᴘᴇᴍᴜᴛᴀʀᴀɴ ʏᴀɴɢ ᴀᴋᴛɪғ.")
 
 
 @bot.on_message(filters.group & filters.command("resume"))
@@ -893,16 +1185,16 @@ async def resume_command(_, message: Message):
     
     
     if not await is_admin(chat_id, message.from_user.id):
-        return await message.reply_text("❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
+        return await reply(message, "❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
     
     
     active_chat_id = get_active_chat_id(chat_id)
     
     try:
-        await call_py.resume(active_chat_id)
-        await message.reply_text("▶️ <b>ᴅɪʟᴀɴᴊᴜᴛᴋᴀɴ.</b>")
+        await assistants.call(active_chat_id).resume(active_chat_id)
+        await reply(message, "▶️ <b>ᴅɪʟᴀɴᴊᴜᴛᴋᴀɴ.</b>")
     except:
-        await message.reply_text("❌ ᴛɪᴅᴀᴋ ᴀᴅᴀ ᴘᴇᴍᴜᴛᴀʀᴀɴ ʏᴀɴɢ ᴅɪᴊᴇᴅᴀ.")
+        await reply(message, "❌ ᴛɪᴅᴀᴋ ᴀᴅᴀ ᴘᴇᴍᴜᴛᴀʀᴀɴ ʏᴀɴɢ ᴅɪᴊᴇᴅᴀ.")
 
 
 @bot.on_message(filters.group & filters.command("queue"))
@@ -913,40 +1205,29 @@ async def queue_command(_, message: Message):
     active_chat_id = get_active_chat_id(chat_id)
     
     if active_chat_id not in queues or not queues[active_chat_id]:
-        return await message.reply_text("📭 <b>ᴀɴᴛʀɪᴀɴ ᴋᴏsᴏɴɢ.</b>")
+        return await reply(message, "📭 <b>ᴀɴᴛʀɪᴀɴ ᴋᴏsᴏɴɢ.</b>")
     
     now_playing = ""
     if active_chat_id in current_playing:
-        now_playing = f"▶️ <b>sᴇᴅᴀɴɢ ᴅɪᴘᴜᴛᴀʀ:</b> {current_playing[active_chat_id]['title']}\n\n"
+        now_playing = f"▶️ <b>sᴇᴅᴀɴɢ ᴅɪᴘᴜᴛᴀʀ:</b> {current_playing[active_chat_id].title}\n\n"
     
     queue_text = now_playing + "📋 <b>ᴅᴀғᴛᴀʀ ᴀɴᴛʀɪᴀɴ:</b>\n"
-    for i, song in enumerate(queues[active_chat_id][:10], 1):
-        dur = song.get('duration', 0)
-        if isinstance(dur, (int, float)):
-            m, s = divmod(int(dur), 60)
-            h, m = divmod(m, 60)
-            if h > 0:
-                dur_str = f"{h}:{m:02d}:{s:02d}"
-            else:
-                dur_str = f"{m:02d}:{s:02d}"
-        else:
-            dur_str = str(dur)
-        
-        queue_text += f"{i}. {song['title']} ({song['stream_type']}) [{dur_str}]\n"
+    for i, song in enumerate(queues[active_chat_id].head(10), 1):
+        queue_text += f"{i}. {song.title} ({song.stream_type}) [{song.duration_text}]\n"
     
     if len(queues[active_chat_id]) > 10:
         queue_text += f"\n...ᴅᴀɴ {len(queues[active_chat_id]) - 10} ʟᴀɢᴜ ʟᴀɪɴɴʏᴀ"
     
-    await message.reply_text(queue_text)
+    await reply(message, queue_text)
 
 
 @bot.on_message(filters.group & filters.command("volume"))
 async def volume_command(_, message: Message):
     if not await is_admin(message.chat.id, message.from_user.id):
-        return await message.reply_text("❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
+        return await reply(message, "❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
     
     if len(message.command) < 2:
-        return await message.reply_text("ᴄᴏɴᴛᴏʜ: /volume 100")
+        return await reply(message, "ᴄᴏɴᴛᴏʜ: /volume 100")
     
     chat_id = message.chat.id
     active_chat_id = get_active_chat_id(chat_id)
@@ -954,54 +1235,56 @@ async def volume_command(_, message: Message):
     try:
         vol = int(message.command[1])
         if vol < 1 or vol > 200:
-            return await message.reply_text("⚠️ <b>ᴠᴏʟᴜᴍᴇ ʜᴀʀᴜs ᴀɴᴛᴀʀᴀ 1-200.</b>", parse_mode=ParseMode.HTML)
+            return await reply(message, "⚠️ <b>ᴠᴏʟᴜᴍᴇ ʜᴀʀᴜs ᴀɴᴛᴀʀᴀ 1-200.</b>", parse_mode=ParseMode.HTML)
         
-        await call_py.change_volume_call(active_chat_id, vol)
-        await message.reply_text(f"🔊 <b>ᴠᴏʟᴜᴍᴇ:</b> {vol}%")
+        await assistants.call(active_chat_id).change_volume_call(active_chat_id, vol)
+        await reply(message, f"🔊 <b>ᴠᴏʟᴜᴍᴇ:</b> {vol}%")
     except:
-        await message.reply_text("❌ ɢᴀɢᴀʟ ᴍᴇɴɢᴜʙᴀʜ ᴠᴏʟᴜᴍᴇ.")
+        await reply(message, "❌ ɢᴀɢᴀʟ ᴍᴇɴɢᴜʙᴀʜ ᴠᴏʟᴜᴍᴇ.")
 
 
 @bot.on_message(filters.group & filters.command("mute"))
 async def mute_command(_, message: Message):
     chat_id = message.chat.id
     if not await is_admin(chat_id, message.from_user.id):
-        return await message.reply_text("❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
+        return await reply(message, "❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
     
     if chat_id in muted_chats and muted_chats[chat_id]:
-        return await message.reply_text("🔇 <b>ᴍᴜsɪᴋ sᴜᴅᴀʜ ᴅɪᴍᴜᴛᴇ.</b>", parse_mode=ParseMode.HTML)
+        return await reply(message, "🔇 <b>ᴍᴜsɪᴋ sᴜᴅᴀʜ ᴅɪᴍᴜᴛᴇ.</b>", parse_mode=ParseMode.HTML)
     
     muted_chats[chat_id] = True
+    store.set_setting(chat_id, 'muted', True)
     
     
     active_chat_id = get_active_chat_id(chat_id)
     try:
-        await call_py.mute(active_chat_id)
+        await assistants.call(active_chat_id).mute(active_chat_id)
     except:
         pass
     
-    await message.reply_text("🔇 <b>ᴍᴜsɪᴋ ᴅɪᴍᴜᴛᴇ.</b>\nɢᴜɴᴀᴋᴀɴ /unmute ᴜɴᴛᴜᴋ ᴍᴇɴɢᴀᴋᴛɪғᴋᴀɴ ʟᴀɢɪ.", parse_mode=ParseMode.HTML)
+    await reply(message, "🔇 <b>ᴍᴜsɪᴋ ᴅɪᴍᴜᴛᴇ.</b>\nɢᴜɴᴀᴋᴀɴ /unmute ᴜɴᴛᴜᴋ ᴍᴇɴɢᴀᴋᴛɪғᴋᴀɴ ʟᴀɢɪ.", parse_mode=ParseMode.HTML)
 
 
 @bot.on_message(filters.group & filters.command("unmute"))
 async def unmute_command(_, message: Message):
     chat_id = message.chat.id
     if not await is_admin(chat_id, message.from_user.id):
-        return await message.reply_text("❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
+        return await reply(message, "❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
     
     if chat_id not in muted_chats or not muted_chats[chat_id]:
-        return await message.reply_text("🔊 <b>ᴍᴜsɪᴋ sᴜᴅᴀʜ ᴀᴋᴛɪғ.</b>", parse_mode=ParseMode.HTML)
+        return await reply(message, "🔊 <b>ᴍᴜsɪᴋ sᴜᴅᴀʜ ᴀᴋᴛɪғ.</b>", parse_mode=ParseMode.HTML)
     
     muted_chats[chat_id] = False
+    store.set_setting(chat_id, 'muted', None)
     
     
     active_chat_id = get_active_chat_id(chat_id)
     try:
-        await call_py.unmute(active_chat_id)
+        await assistants.call(active_chat_id).unmute(active_chat_id)
     except:
         pass
     
-    await message.reply_text("🔊 <b>ᴍᴜsɪᴋ ᴅɪᴀᴋᴛɪғᴋᴀɴ ʟᴀɢɪ.</b>", parse_mode=ParseMode.HTML)
+    await reply(message, "🔊 <b>ᴍᴜsɪᴋ ᴅɪᴀᴋᴛɪғᴋᴀɴ ʟᴀɢɪ.</b>", parse_mode=ParseMode.HTML)
 
 
 @bot.on_message(filters.group & filters.command("now"))
@@ -1010,7 +1293,7 @@ async def now_command(_, message: Message):
     active_chat_id = get_active_chat_id(chat_id)
     
     if active_chat_id not in current_playing:
-        return await message.reply_text("❌ ᴛɪᴅᴀᴋ ᴀᴅᴀ ʟᴀɢᴜ ʏᴀɴɢ sᴇᴅᴀɴɢ ᴅɪᴘᴜᴛᴀʀ.")
+        return await reply(message, "❌ ᴛɪᴅᴀᴋ ᴀᴅᴀ ʟᴀɢᴜ ʏᴀɴɢ sᴇᴅᴀɴɢ ᴅɪᴘᴜᴛᴀʀ.")
     
     s = current_playing[active_chat_id]
     
@@ -1028,29 +1311,72 @@ async def now_command(_, message: Message):
     status_text = f"""
 ▶️ <b>sᴇᴅᴀɴɢ ᴅɪᴘᴜᴛᴀʀ:</b>
 
-📌 <b>ᴊᴜᴅᴜʟ:</b> {s['title']}
-🎵 <b>ᴛɪᴘᴇ:</b> {s['stream_type']}
-👤 <b>ᴅɪᴍɪɴᴛᴀ ᴏʟᴇʜ:</b> {s['requester']}
+📌 <b>ᴊᴜᴅᴜʟ:</b> {s.title}
+🎵 <b>ᴛɪᴘᴇ:</b> {s.stream_type}
+👤 <b>ᴅɪᴍɪɴᴛᴀ ᴏʟᴇʜ:</b> {s.requester}
 ⏱ <b>ᴘʀᴏɢʀᴇss:</b> {format_time(elapsed)}
 🕐 <b>ᴡᴀᴋᴛᴜ:</b> {datetime.now().strftime('%H:%M:%S')}
 """
-    await message.reply_text(status_text)
+    await reply(message, status_text)
 
 
 @bot.on_message(filters.group & filters.command("loop"))
 async def loop_command(_, message: Message):
     if len(message.command) < 2:
-        return await message.reply_text("ɢᴜɴᴀᴋᴀɴ: /loop ɴᴏɴᴇ/sɪɴɢʟᴇ/ǫᴜᴇᴜᴇ")
+        return await reply(message, "ɢᴜɴᴀᴋᴀɴ: /loop ɴᴏɴᴇ/sɪɴɢʟᴇ/ǫᴜᴇᴜᴇ")
     
     mode = message.command[1].lower()
     if mode not in ['none', 'single', 'queue']:
-        return await message.reply_text("ᴍᴏᴅᴇ ᴛɪᴅᴀᴋ ᴠᴀʟɪᴅ. ɢᴜɴᴀᴋᴀɴ: ɴᴏɴᴇ, sɪɴɢʟᴇ, ᴀᴛᴀᴜ ǫᴜᴇᴜᴇ")
+        return await reply(message, "ᴍᴏᴅᴇ ᴛɪᴅᴀᴋ ᴠᴀʟɪᴅ. ɢᴜɴᴀᴋᴀɴ: ɴᴏɴᴇ, sɪɴɢʟᴇ, ᴀᴛᴀᴜ ǫᴜᴇᴜᴇ")
     
     loop_mode[message.chat.id] = mode
-    await message.reply_text(f"🔄 <b>ᴍᴏᴅᴇ ʟᴏᴏᴘ ᴅɪᴀᴛᴜʀ ᴋᴇ:</b> {mode}")
+    store.set_setting(message.chat.id, 'loop', mode if mode != 'none' else None)
+    await reply(message, f"🔄 <b>ᴍᴏᴅᴇ ʟᴏᴏᴘ ᴅɪᴀᴛᴜʀ ᴋᴇ:</b> {mode}")
+
+
+@bot.on_message(filters.group & filters.command("quality"))
+async def quality_command(_, message: Message):
+    chat_id = message.chat.id
+    if len(message.command) < 2:
+        current = quality_mode.get(chat_id)
+        effective = resolve_quality(current).name
+        note = f" (ᴅɪᴛᴜʀᴜɴᴋᴀɴ ᴋᴇ {effective} ᴋᴀʀᴇɴᴀ sᴇʀᴠᴇʀ sɪʙᴜᴋ)" if load_monitor.pressure else ""
+        return await reply(message, f"🎚 <b>ᴋᴜᴀʟɪᴛᴀs:</b> {current or 'default'}{note}\nɢᴜɴᴀᴋᴀɴ: /quality ʟᴏᴡ/ᴍᴇᴅɪᴜᴍ/ʜɪɢʜ/ᴅᴇꜰᴀᴜʟᴛ")
+    
+    if not await is_admin(chat_id, message.from_user.id):
+        return await reply(message, "❌ <b>ʜᴀɴʏᴀ ᴀᴅᴍɪɴ ɢʀᴜᴘ ʏᴀɴɢ ʙɪsᴀ ᴍᴇɴɢɢᴜɴᴀᴋᴀɴ ᴘᴇʀɪɴᴛᴀʜ ɪɴɪ.</b>", parse_mode=ParseMode.HTML)
+    
+    mode = message.command[1].lower()
+    if mode not in PROFILES and mode != 'default':
+        return await reply(message, "ᴍᴏᴅᴇ ᴛɪᴅᴀᴋ ᴠᴀʟɪᴅ. ɢᴜɴᴀᴋᴀɴ: ʟᴏᴡ, ᴍᴇᴅɪᴜᴍ, ʜɪɢʜ, ᴀᴛᴀᴜ ᴅᴇꜰᴀᴜʟᴛ")
+    
+    if mode == 'default':
+        quality_mode.pop(chat_id, None)
+    else:
+        quality_mode[chat_id] = mode
+    store.set_setting(chat_id, 'quality', mode if mode != 'default' else None)
+    # Berlaku mulai lagu berikutnya
+    await reply(message, f"🎚 <b>ᴋᴜᴀʟɪᴛᴀs ᴅɪᴀᴛᴜʀ ᴋᴇ:</b> {mode}")
+
+
+@bot.on_chat_member_updated(filters.group)
+async def chat_member_updated(_, update: ChatMemberUpdated):
+    """Jaga cache admin tetap akurat saat ada promote/demote/keluar."""
+    admins = admin_cache.get(update.chat.id)
+    if admins is None:
+        return
+    member = update.new_chat_member or update.old_chat_member
+    if member is None or member.user is None:
+        admin_cache.pop(update.chat.id)
+        return
+    if update.new_chat_member and update.new_chat_member.status in ADMIN_STATUSES:
+        admins.add(member.user.id)
+    else:
+        admins.discard(member.user.id)
 
 
 @bot.on_callback_query()
+@trace_request("callback")
 async def cb_handler(_, cb: CallbackQuery):
     chat_id = cb.message.chat.id
     data = cb.data
@@ -1060,7 +1386,7 @@ async def cb_handler(_, cb: CallbackQuery):
         query = search_cache[chat_id].get('query', '')
         
         try:
-            await cb.message.edit_text(
+            await edit_text(cb.message, 
                 get_search_text(chat_id, query, page),
                 reply_markup=get_search_keyboard(chat_id, page),
                 disable_web_page_preview=True
@@ -1079,7 +1405,7 @@ async def cb_handler(_, cb: CallbackQuery):
         ]])
         
         try:
-            await cb.message.edit_text(
+            await edit_text(cb.message, 
                 f"🎵 <b>ᴘɪʟɪʜᴀɴ:</b> {res['title'][:50]}\n\nᴘɪʟɪʜ ғᴏʀᴍᴀᴛ ᴘᴇᴍᴜᴛᴀʀᴀɴ:",
                 reply_markup=kb
             )
@@ -1087,52 +1413,43 @@ async def cb_handler(_, cb: CallbackQuery):
             logger.error(f"Gagal edit selection: {e}")
 
     elif data.startswith("type_"):
+        received = time.monotonic()
         m_type = data.split("_")[1]
         is_direct = "direct" in data
         
         if is_direct:
-            url = search_cache[chat_id]['direct']
-            title = search_cache[chat_id].get('title', 'ʏᴏᴜᴛᴜʙᴇ ʟɪɴᴋ')
-            thumb = search_cache[chat_id].get('thumbnail')
-            duration = search_cache[chat_id].get('duration', '00:00')
-            active_chat_id = search_cache[chat_id].get('active_chat_id', chat_id)
-            group_id = search_cache[chat_id].get('group_id', chat_id)
+            res = search_cache[chat_id]['direct']
         else:
             idx = search_cache[chat_id].get('selected_idx', 0)
             res = search_cache[chat_id]['results'][idx]
-            url = res['link']
-            title = res['title']
-            thumb = res.get('thumbnail')
-            duration = res.get('duration', '00:00')
-            active_chat_id = search_cache[chat_id].get('active_chat_id', chat_id)
-            group_id = search_cache[chat_id].get('group_id', chat_id)
-
-        song_data = {
-            "title": title,
-            "url": url,
-            "thumbnail": thumb,
-            "stream_type": m_type,
-            "requester": search_cache[chat_id]['req'],
-            "duration": duration,
-            "reply_to_message_id": cb.message.reply_to_message.id if cb.message.reply_to_message else None,
-            "group_id": group_id
-        }
+        active_chat_id = search_cache[chat_id].get('active_chat_id', chat_id)
+        group_id = search_cache[chat_id].get('group_id', chat_id)
+
+        song_data = Track.from_result(
+            res, m_type, search_cache[chat_id]['req'], group_id,
+            cb.message.reply_to_message.id if cb.message.reply_to_message else None
+        )
+        title = song_data.title
 
-        if active_chat_id not in queues:
-            queues[active_chat_id] = []
-        queues[active_chat_id].append(song_data)
+        try:
+            get_queue(active_chat_id).append(song_data)
+        except QueueFull:
+            return await cb.answer(f"❌ ᴀɴᴛʀᴇᴀɴ ᴘᴇɴᴜʜ ({QUEUE_LIMIT} ʟᴀɢᴜ)", show_alert=True)
+        persist_chat(active_chat_id)
         
         if active_chat_id in current_playing:
-            await cb.message.edit_text(f"✅ <b>ᴅɪᴛᴀᴍʙᴀʜᴋᴀɴ ᴋᴇ ᴀɴᴛʀᴇᴀɴ:</b> {title}")
+            schedule_prefetch(active_chat_id)
+            await edit_text(cb.message, f"✅ <b>ᴅɪᴛᴀᴍʙᴀʜᴋᴀɴ ᴋᴇ ᴀɴᴛʀᴇᴀɴ:</b> {title}")
             await cb.answer(f"✅ ᴅɪᴛᴀᴍʙᴀʜᴋᴀɴ: {title}")
         else:
-            await cb.message.edit_text(f"🎵 <b>ᴍᴇᴍᴜʟᴀɪ ᴘᴇᴍᴜᴛᴀʀᴀɴ:</b> {title}")
+            await edit_text(cb.message, f"🎵 <b>ᴍᴇᴍᴜʟᴀɪ ᴘᴇᴍᴜᴛᴀʀᴀɴ:</b> {title}")
             await cb.answer(f"🎵 ᴍᴇᴍᴜʟᴀɪ: {title}")
+            play_requested[active_chat_id] = received
             await play_next(active_chat_id)
 
     elif data == "close_search":
         try:
-            await cb.message.delete()
+            await limiter.call(cb.message.chat.id, cb.message.delete)
         except Exception as e:
             logger.error(f"Gagal hapus search message: {e}")
     elif data.startswith("progress_"):
@@ -1140,7 +1457,7 @@ async def cb_handler(_, cb: CallbackQuery):
     elif data.startswith("pause_"):
         try:
             active_chat_id = int(data.split("_")[1])
-            await call_py.pause(active_chat_id)
+            await assistants.call(active_chat_id).pause(active_chat_id)
             await cb.answer("⏸ ʟᴀɢᴜ ᴅɪᴊᴇᴅᴀ")
         except Exception as e:
             await cb.answer(f"❌ ᴇʀʀᴏʀ: {str(e)[:50]}", show_alert=True)
@@ -1148,7 +1465,7 @@ async def cb_handler(_, cb: CallbackQuery):
     elif data.startswith("resume_"):
         try:
             active_chat_id = int(data.split("_")[1])
-            await call_py.resume(active_chat_id)
+            await assistants.call(active_chat_id).resume(active_chat_id)
             await cb.answer("▶️ ʟᴀɢᴜ ᴅɪʟᴀɴᴊᴜᴛᴋᴀɴ")
         except Exception as e:
             await cb.answer(f"❌ ᴇʀʀᴏʀ: {str(e)[:50]}", show_alert=True)
@@ -1161,7 +1478,7 @@ async def cb_handler(_, cb: CallbackQuery):
             if active_chat_id in now_playing_msgs:
                 try:
                     msg_data = now_playing_msgs[active_chat_id]
-                    await bot.delete_messages(msg_data['group_id'], msg_data['message_id'])
+                    await limiter.call(msg_data['group_id'], bot.delete_messages, msg_data['group_id'], msg_data['message_id'])
                 except:
                     pass
                 del now_playing_msgs[active_chat_id]
@@ -1185,7 +1502,7 @@ async def cb_handler(_, cb: CallbackQuery):
             if active_chat_id in now_playing_msgs:
                 try:
                     msg_data = now_playing_msgs[active_chat_id]
-                    await bot.delete_messages(msg_data['group_id'], msg_data['message_id'])
+                    await limiter.call(msg_data['group_id'], bot.delete_messages, msg_data['group_id'], msg_data['message_id'])
                 except:
                     pass
                 del now_playing_msgs[active_chat_id]
@@ -1216,10 +1533,11 @@ async def cb_handler(_, cb: CallbackQuery):
             "• <code>/volume</code> - ᴀᴛᴜʀ ᴠᴏʟᴜᴍᴇ (1-200)\n"
             "• <code>/mute</code> - ᴍᴜᴛᴇ ᴍᴜsɪᴋ\n"
             "• <code>/unmute</code> - ᴜɴᴍᴜᴛᴇ ᴍᴜsɪᴋ\n"
-            "• <code>/loop</code> - ᴀᴛᴜʀ ᴍᴏᴅᴇ ʟᴏᴏᴘ (ɴᴏɴᴇ/sɪɴɢʟᴇ/ǫᴜᴇᴜᴇ)"
+            "• <code>/loop</code> - ᴀᴛᴜʀ ᴍᴏᴅᴇ ʟᴏᴏᴘ (ɴᴏɴᴇ/sɪɴɢʟᴇ/ǫᴜᴇᴜᴇ)\n"
+            "• <code>/quality</code> - ᴀᴛᴜʀ ᴋᴜᴀʟɪᴛᴀs sᴛʀᴇᴀᴍ (ʟᴏᴡ/ᴍᴇᴅɪᴜᴍ/ʜɪɢʜ)"
         )
         try:
-            await cb.message.edit_text(
+            await edit_text(cb.message, 
                 help_text,
                 reply_markup=InlineKeyboardMarkup([
                     [InlineKeyboardButton("❌ ᴛᴜᴛᴜᴘ", callback_data="close_search")]
@@ -1229,17 +1547,77 @@ async def cb_handler(_, cb: CallbackQuery):
             logger.error(f"Gagal edit help message: {e}")
 
 
+metrics.gauge(
+    "musicbot_active_calls", "Panggilan aktif per userbot", ["assistant"],
+    lambda: {(str(a['index']),): a['active_calls'] for a in assistants.stats()}
+)
+metrics.gauge("musicbot_queued_tracks", "Jumlah lagu di semua antrean", func=lambda: sum(map(len, queues.values())))
+metrics.gauge("musicbot_active_queues", "Chat dengan antrean tidak kosong", func=lambda: sum(1 for q in queues.values() if q))
+metrics.gauge(
+    "musicbot_cache_hit_ratio", "Rasio hit cache sejak start", ["cache"],
+    lambda: hit_ratio({
+        'media': media_cache, 'thumb': thumb_cache, 'ytdl_info': info_cache,
+        'search': search_results, 'admins': admin_cache
+    })
+)
+metrics.gauge(
+    "musicbot_telegram_queue_depth", "Request Bot API yang menunggu rate limiter", ["priority"],
+    lambda: {(name,): n for name, n in limiter.stats()['queue_depth'].items()}
+)
+metrics.gauge("musicbot_progress_bars", "Progress bar yang sedang diperbarui", func=lambda: len(progress))
+
+
+async def handle_routed(event: Dict):
+    """Event dari front-end (mode shard): ambil ulang pesannya lalu jalankan handler biasa."""
+    chat_id = event['chat_id']
+    if event['kind'] == 'member':
+        admin_cache.pop(chat_id)
+        return
+    message = await limiter.call(chat_id, bot.get_messages, chat_id, event['message_id'], priority=HIGH, send=False)
+    if message is None or message.empty:
+        return
+    if event['kind'] == 'callback':
+        user = event['user']
+        update = CallbackQuery(
+            client=bot,
+            id=event['id'],
+            from_user=User(client=bot, id=user['id'], first_name=user['first_name'], username=user['username']),
+            chat_instance=event['chat_instance'],
+            message=message,
+            data=event['data']
+        )
+    else:
+        update = message
+    await dispatch_update(bot, update)
+
+
 async def main():
+    shard_server = ShardServer(SHARD_ID, handle_routed) if SHARD_ID is not None else None
+    metrics_server = None
     try:
+        start_pool()
+        await start_http()
         await bot.start()
-        await ubot.start()
-        await call_py.start()
+        await assistants.start()
+        limiter.start()
+        progress.start()
+        watchdog.start()
+        load_monitor.start()
+        install_profiler_signal()
+        await restore_state()
+        if shard_server:
+            await shard_server.start()
+        if metrics.METRICS_PORT:
+            # Mode shard: tiap worker di port sendiri (METRICS_PORT + SHARD_ID)
+            metrics_server = await start_metrics_server(metrics.METRICS_PORT + (SHARD_ID or 0))
         
         logger.info("✅ Bot dan PyTgCalls sudah aktif")
         print("\n" + "="*50)
         print("🤖 Bot Music Berhasil Diaktifkan!")
         print(f"👤 Bot: @{bot.me.username}")
-        print(f"👤 Userbot: @{ubot.me.username}")
+        for info in assistants.stats():
+            if info['online']:
+                print(f"👤 Userbot {info['index']}: @{info['username']}")
         print("="*50 + "\n")
         
         await idle()
@@ -1249,19 +1627,39 @@ async def main():
         import traceback
         traceback.print_exc()
     finally:
+        if shard_server:
+            await shard_server.stop()
+        if metrics_server:
+            metrics_server.close()
         if bot.is_connected:
             await bot.stop()
-        if ubot.is_connected:
-            await ubot.stop()
+        await assistants.stop()
+        progress.stop()
+        profiler.stop()
+        watchdog.stop()
+        load_monitor.stop()
+        limiter.stop()
+        shutdown_pool()
+        await tgstream.close()
+        await close_http()
+        await store.close()
         
 
-if __name__ == "__main__":
+def run():
+    """Dipanggil dari run.py."""
     if not all([API_ID, API_HASH, BOT_TOKEN, SESSION_STRING]):
         print("❌ Error: Mohon isi semua credential!")
         exit(1)
     
-    if not os.path.exists("downloads"):
-        os.makedirs("downloads")
+    if SHARD_COUNT > 1 and SHARD_ID is None:
+        # Supervisor: worker per shard + front-end yang meneruskan update
+        if len(session_strings()) < SHARD_COUNT:
+            print(f"❌ Error: SHARD_COUNT={SHARD_COUNT} butuh minimal {SHARD_COUNT} SESSION_STRING!")
+            exit(1)
+        asyncio.run(run_supervisor(os.path.join(os.path.dirname(os.path.abspath(__file__)), "run.py"), BOT_TOKEN))
+        exit(0)
+    
+    media_cache.scan()
     
     loop = asyncio.get_event_loop()
     try:
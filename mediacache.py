@@ -0,0 +1,172 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MEDIA_DIR = os.getenv("MEDIA_DIR", "downloads")
+MEDIA_CACHE_MB = int(os.getenv("MEDIA_CACHE_MB", "2048"))
+
+# Sisa download yang terputus; dibersihkan saat scan
+_PARTIAL_SUFFIXES = (".part", ".ytdl", ".temp", ".tmp")
+
+
+class MediaEntry:
+    __slots__ = ("key", "path", "size", "last_used", "refs")
+
+    def __init__(self, key: str, path: str, size: int, last_used: float):
+        self.key = key
+        self.path = path
+        self.size = size
+        self.last_used = last_used
+        self.refs = 0
+
+
+class MediaCache:
+    """Index file media lokal (YouTube / Telegram) dengan refcount dan kuota LRU.
+
+    File yang masih dipakai (refs > 0) tidak pernah dihapus walau kuota terlampaui.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, MediaEntry] = {}
+        self._bytes = 0
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def path_for(self, key: str, ext: str) -> str:
+        """Path absolut tujuan download untuk key."""
+        return os.path.abspath(os.path.join(self.directory, f"{key}{ext}"))
+
+    def scan(self):
+        """Bangun ulang index dari file yang sudah ada di direktori."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._entries.clear()
+        self._bytes = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(_PARTIAL_SUFFIXES):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+                continue
+            key = os.path.splitext(entry.name)[0]
+            st = entry.stat()
+            self._entries[key] = MediaEntry(key, os.path.abspath(entry.path), st.st_size, st.st_mtime)
+            self._bytes += st.st_size
+        for path in self._pick_victims():
+            _unlink(path)
+        logger.info(f"Media cache: {len(self._entries)} file, {self._bytes / 1048576:.1f} MB")
+
+    def lookup(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None or not os.path.exists(entry.path):
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        entry.last_used = time.time()
+        self.hits += 1
+        return entry.path
+
+    async def add(self, key: str, path: str, acquire: bool = False) -> str:
+        """Daftarkan file yang baru di-download, lalu jalankan eviksi.
+
+        acquire=True mengambil ref sebelum eviksi, supaya file yang baru masuk
+        tidak langsung terhapus saat kuota penuh (pemanggil wajib release).
+        """
+        path = os.path.abspath(path)
+        size = await asyncio.to_thread(os.path.getsize, path)
+        old = self._entries.get(key)
+        if old is not None:
+            self._bytes -= old.size
+            old.path, old.size, old.last_used = path, size, time.time()
+        else:
+            self._entries[key] = MediaEntry(key, path, size, time.time())
+        self._bytes += size
+        if acquire:
+            self._entries[key].refs += 1
+        await self._evict()
+        return path
+
+    def reserve(self, key: str, path: str, size: int):
+        """Daftarkan file yang masih di-download (tgstream) dengan ukuran perkiraan,
+        supaya kuota sudah menghitungnya dan acquire/release berlaku sejak awal."""
+        path = os.path.abspath(path)
+        old = self._entries.get(key)
+        if old is not None:
+            self._bytes -= old.size
+            old.path, old.size, old.last_used = path, size, time.time()
+        else:
+            self._entries[key] = MediaEntry(key, path, size, time.time())
+        self._bytes += size
+
+    def discard(self, key: str):
+        """Buang entry tanpa menghapus file (download gagal, file sudah dibersihkan pemanggil)."""
+        self._drop(key)
+
+    def acquire(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.refs += 1
+            entry.last_used = time.time()
+
+    async def release(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry.refs = max(0, entry.refs - 1)
+        entry.last_used = time.time()
+        await self._evict()
+
+    def refs(self, key: str) -> int:
+        entry = self._entries.get(key)
+        return entry.refs if entry else 0
+
+    def _drop(self, key: str) -> Optional[MediaEntry]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+        return entry
+
+    def _pick_victims(self) -> List[str]:
+        if self._bytes <= self.max_bytes:
+            return []
+        victims = []
+        for entry in sorted(self._entries.values(), key=lambda e: e.last_used):
+            if self._bytes <= self.max_bytes:
+                break
+            if entry.refs > 0:
+                continue
+            self._drop(entry.key)
+            victims.append(entry.path)
+        return victims
+
+    async def _evict(self):
+        victims = self._pick_victims()
+        if victims:
+            # os.remove file besar bisa lama; jangan di event loop
+            await asyncio.to_thread(lambda: [_unlink(p) for p in victims])
+
+
+def _unlink(path: str):
+    try:
+        os.remove(path)
+    except OSError as e:
+        logger.error(f"Failed to delete file: {e}")
+
+
+media_cache = MediaCache(MEDIA_DIR, MEDIA_CACHE_MB * 1024 * 1024)
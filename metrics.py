@@ -0,0 +1,239 @@
+"""Metrik format teks Prometheus tanpa dependensi luar.
+
+Modul ini sengaja hanya memakai stdlib supaya bisa diimpor (dan dites) tanpa
+Pyrogram/PyTgCalls maupun credential Telegram.
+"""
+import os
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 0 = endpoint mati
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LabelValues = Tuple[str, ...]
+GaugeFunc = Callable[[], Union[float, Dict[LabelValues, float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        return iter(())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        for key, value in self._values.items():
+            yield "", _format_labels(self.labelnames, key), value
+
+
+class Gauge(Metric):
+    """Nilai sesaat. Dengan func, nilainya dihitung saat scrape (dict label -> nilai)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), func: Optional[GaugeFunc] = None):
+        super().__init__(name, help, labels)
+        self.func = func
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def samples(self):
+        values = self._values
+        if self.func is not None:
+            try:
+                result = self.func()
+            except Exception as e:
+                logger.warning(f"Gauge {self.name} gagal dihitung: {e!r}")
+                return
+            values = result if isinstance(result, dict) else {(): result}
+        for key, value in values.items():
+            yield "", _format_labels(self.labelnames, key), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [jumlah per bucket..., +Inf], total, count
+        self._data: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        data = self._data.get(key)
+        if data is None:
+            data = self._data[key] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+        counts, totals = data
+        counts[bisect_left(self.buckets, value)] += 1
+        totals[0] += value
+        totals[1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        data = self._data.get(self._key(labels))
+        return data[1][1] if data else 0
+
+    def samples(self):
+        for key, (counts, totals) in self._data.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                yield "_bucket", _format_labels(self.labelnames, key, f'le="{le}"'), cumulative
+            yield "_sum", _format_labels(self.labelnames, key), totals[0]
+            yield "_count", _format_labels(self.labelnames, key), totals[1]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labels))
+
+
+def gauge(name: str, help: str, labels: Sequence[str] = (), func: Optional[GaugeFunc] = None) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labels, func))
+
+
+def histogram(name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labels, buckets))
+
+
+# Metrik bersama; modul lain cukup import dan observe/inc
+play_latency = histogram("musicbot_play_to_audio_seconds", "Waktu dari /play sampai audio mulai diputar")
+thumb_render = histogram("musicbot_thumb_render_seconds", "Waktu render thumbnail now playing (cache miss)")
+search_latency = histogram("musicbot_search_seconds", "Latensi pencarian YouTube (cache miss)")
+ytdl_latency = histogram("musicbot_ytdl_seconds", "Waktu ekstraksi/download yt-dlp", ["op"], (0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+track_gap = histogram("musicbot_track_gap_seconds", "Jeda antara lagu selesai (atau /skip) dan lagu berikutnya mulai", ["trigger"], (0.05, 0.1, 0.25, 0.5, 1, 1.5, 2, 3, 5, 10))
+stream_failures = counter("musicbot_stream_failures_total", "Stream yang gagal diputar", ["stage"])
+stream_fallbacks = counter("musicbot_stream_fallbacks_total", "Fallback ke file lokal setelah stream gagal")
+flood_waits = counter("musicbot_flood_waits_total", "FloodWait yang diterima dari Telegram")
+
+
+def hit_ratio(caches: Dict[str, object]) -> Dict[LabelValues, float]:
+    """Rasio hit untuk objek cache yang punya atribut hits/misses."""
+    ratios = {}
+    for name, cache in caches.items():
+        total = cache.hits + cache.misses
+        ratios[(name,)] = cache.hits / total if total else 0.0
+    return ratios
+
+
+# ---------- endpoint HTTP ----------
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Header request tidak dipakai, cukup dibaca habis
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            if line in (b"\r\n", b"\n", b""):
+                break
+        parts = request.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+            body = REGISTRY.render().encode()
+            status = "200 OK"
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = b"not found\n"
+            status = "404 Not Found"
+            content_type = "text/plain"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[asyncio.AbstractServer]:
+    if not port:
+        return None
+    server = await asyncio.start_server(_handle, host, port)
+    logger.info(f"Metrics di http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,248 @@
+import os
+import random
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Union
+
+# Batas lagu per antrean chat
+QUEUE_LIMIT = int(os.getenv("QUEUE_LIMIT", "500"))
+
+
+def parse_duration(value: Union[int, float, str, None]) -> int:
+    """Durasi dalam detik dari angka atau teks "SS" / "MM:SS" / "H:MM:SS". Tidak dikenal = 0."""
+    if isinstance(value, (int, float)):
+        return max(0, int(value))
+    if not value:
+        return 0
+    seconds = 0
+    try:
+        for part in str(value).strip().split(":"):
+            seconds = seconds * 60 + int(part)
+    except ValueError:
+        return 0
+    return max(0, seconds)
+
+
+def format_duration(seconds: float) -> str:
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    if h > 0:
+        return f"{h}:{m:02d}:{s:02d}"
+    return f"{m:02d}:{s:02d}"
+
+
+class Track:
+    """Satu lagu di antrean atau yang sedang diputar.
+
+    Buat lewat from_result / from_telegram supaya bentuknya sama dari mana pun
+    asalnya. `duration` selalu detik (int); teksnya di-cache di `duration_text`.
+    """
+
+    __slots__ = (
+        "title", "url", "stream_type", "requester", "duration", "thumbnail",
+        "reply_to_message_id", "group_id",
+        # Diisi saat diputar/prefetch; audio_source = audio terpisah untuk video DASH
+        "source", "audio_source", "stream_expires", "media_key",
+        # Posisi mulai (detik), dipakai saat melanjutkan lagu setelah restart
+        "start_offset",
+        # file_id foto now playing yang sudah terkirim; diputar ulang (loop) tanpa render/upload
+        "photo_id",
+        # Turunan duration, tidak disimpan
+        "duration_text",
+    )
+    # Field yang disimpan ke database; nilai None/0 tidak ditulis
+    _PERSIST = __slots__[:-1]
+
+    def __init__(
+        self,
+        title: str,
+        url: str,
+        stream_type: str,
+        requester: str,
+        duration: Union[int, float, str] = 0,
+        thumbnail: Optional[str] = None,
+        reply_to_message_id: Optional[int] = None,
+        group_id: Optional[int] = None,
+    ):
+        self.title = title
+        self.url = url
+        self.stream_type = stream_type
+        self.requester = requester
+        self.thumbnail = thumbnail
+        self.reply_to_message_id = reply_to_message_id
+        self.group_id = group_id
+        self.source: Optional[str] = None
+        self.audio_source: Optional[str] = None
+        self.stream_expires: Optional[float] = None
+        self.media_key: Optional[str] = None
+        self.start_offset: float = 0
+        self.photo_id: Optional[str] = None
+        self.set_duration(duration)
+
+    def set_duration(self, value: Union[int, float, str, None]):
+        self.duration = parse_duration(value)
+        self.duration_text = format_duration(self.duration)
+
+    def __repr__(self) -> str:
+        return f"Track({self.title!r}, {self.stream_type}, {self.url!r})"
+
+    @classmethod
+    def from_result(
+        cls,
+        result: Dict[str, Any],
+        stream_type: str,
+        requester: str,
+        group_id: Optional[int] = None,
+        reply_to_message_id: Optional[int] = None,
+    ) -> "Track":
+        """Dari hasil pencarian, entri playlist atau metadata link: link, title, duration, thumbnail."""
+        return cls(
+            title=result.get("title") or result["link"],
+            url=result["link"],
+            stream_type=stream_type,
+            requester=requester,
+            duration=result.get("duration"),
+            thumbnail=result.get("thumbnail") or None,
+            reply_to_message_id=reply_to_message_id,
+            group_id=group_id,
+        )
+
+    @classmethod
+    def from_telegram(
+        cls,
+        message,
+        path: str,
+        requester: str,
+        group_id: Optional[int] = None,
+        reply_to_message_id: Optional[int] = None,
+    ) -> "Track":
+        """Dari pesan audio/video/voice Telegram yang sudah (atau sedang) di-download ke path."""
+        if message.audio:
+            title = message.audio.title or message.audio.file_name or "ᴀᴜᴅɪᴏ ᴛᴇʟᴇɢʀᴀᴍ"
+            media = message.audio
+        elif message.video:
+            title = message.video.file_name or "ᴠɪᴅᴇᴏ ᴛᴇʟᴇɢʀᴀᴍ"
+            media = message.video
+        else:
+            title = "ᴠᴏɪᴄᴇ ᴍᴇssᴀɢᴇ"
+            media = message.voice
+        return cls(
+            title=title,
+            url=path,
+            stream_type="video" if message.video else "audio",
+            requester=requester,
+            duration=getattr(media, "duration", 0),
+            reply_to_message_id=reply_to_message_id,
+            group_id=group_id,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {}
+        for name in self._PERSIST:
+            value = getattr(self, name)
+            if value is not None and value != 0:
+                data[name] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Track":
+        track = cls.__new__(cls)
+        for name in cls._PERSIST:
+            setattr(track, name, data.get(name))
+        track.start_offset = track.start_offset or 0
+        # Baris lama bisa menyimpan durasi sebagai "MM:SS"
+        track.set_duration(track.duration)
+        return track
+
+
+class QueueFull(Exception):
+    pass
+
+
+class TrackQueue:
+    """Antrean lagu per chat di atas deque.
+
+    append/popleft O(1). remove_at/insert/move tetap O(n), kira-kira setara list
+    (bench/bench_queue.py); tidak ada keuntungan kecepatan di sana.
+    """
+
+    __slots__ = ("_items", "maxlen")
+
+    def __init__(self, tracks: Iterable[Track] = (), maxlen: int = QUEUE_LIMIT):
+        self.maxlen = maxlen
+        self._items: Deque[Track] = deque()
+        self.extend(tracks)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def __iter__(self) -> Iterator[Track]:
+        return iter(self._items)
+
+    def __getitem__(self, index: int) -> Track:
+        return self._items[index]
+
+    def append(self, track: Track):
+        if self.maxlen and len(self._items) >= self.maxlen:
+            raise QueueFull(f"antrean penuh ({self.maxlen} lagu)")
+        self._items.append(track)
+
+    def appendleft(self, track: Track):
+        """Taruh di depan antrean. Tidak dibatasi maxlen (dipakai untuk mengembalikan lagu)."""
+        self._items.appendleft(track)
+
+    def requeue(self, track: Track):
+        """Taruh di belakang antrean tanpa batas maxlen (loop queue: lagu sudah pernah masuk)."""
+        self._items.append(track)
+
+    def extend(self, tracks: Iterable[Track]) -> int:
+        """Tambah sebanyak yang muat. Mengembalikan jumlah lagu yang masuk."""
+        added = 0
+        for track in tracks:
+            if self.maxlen and len(self._items) >= self.maxlen:
+                break
+            self._items.append(track)
+            added += 1
+        return added
+
+    def popleft(self) -> Track:
+        return self._items.popleft()
+
+    def peek(self) -> Optional[Track]:
+        return self._items[0] if self._items else None
+
+    def head(self, count: int) -> List[Track]:
+        return list(islice(self._items, count))
+
+    def remove_at(self, index: int) -> Track:
+        n = len(self._items)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("queue index out of range")
+        track = self._items[index]
+        del self._items[index]
+        return track
+
+    def insert(self, index: int, track: Track):
+        if self.maxlen and len(self._items) >= self.maxlen:
+            raise QueueFull(f"antrean penuh ({self.maxlen} lagu)")
+        self._items.insert(index, track)
+
+    def move(self, src: int, dst: int):
+        track = self.remove_at(src)
+        self._items.insert(dst, track)
+
+    def shuffle(self):
+        items = list(self._items)
+        random.shuffle(items)
+        self._items = deque(items)
+
+    def clear(self) -> List[Track]:
+        """Kosongkan antrean dan kembalikan isinya."""
+        items = list(self._items)
+        self._items.clear()
+        return items
@@ -0,0 +1,194 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from pyrogram.errors import FloodWait, MessageNotModified
+from ratelimit import RateLimited
+
+logger = logging.getLogger(__name__)
+
+# Jeda normal antar-update progress bar per chat
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "8"))
+# Budget edit global (semua chat) per detik
+PROGRESS_EDITS_PER_SEC = float(os.getenv("PROGRESS_EDITS_PER_SEC", "10"))
+# Jarak minimum dua edit di chat yang sama
+PROGRESS_CHAT_MIN_INTERVAL = float(os.getenv("PROGRESS_CHAT_MIN_INTERVAL", "5"))
+
+# render(active_chat_id) -> (kunci, reply_markup) atau None kalau sudah selesai.
+# Kunci = bagian tampilan yang menentukan perlu edit atau tidak (mis. posisi bar tanpa jam)
+RenderFunc = Callable[[int], Optional[Tuple[str, object]]]
+EditFunc = Callable[[int, int, object], Awaitable]
+
+
+class _Entry:
+    __slots__ = ("chat_id", "group_id", "message_id", "gen", "last_key", "last_edit")
+
+    def __init__(self, chat_id: int, group_id: int, message_id: int, gen: int, last_key: Optional[str]):
+        self.chat_id = chat_id
+        self.group_id = group_id
+        self.message_id = message_id
+        self.gen = gen
+        self.last_key = last_key
+        self.last_edit = time.monotonic()
+
+
+class ProgressScheduler:
+    """Satu task untuk semua progress bar: heap berisi (waktu jatuh tempo, chat).
+
+    Update yang jatuh tempo bersamaan dikirim sebagai satu batch, dibatasi budget
+    global dan jarak minimum per chat. Edit dilewati kalau kunci dari render tidak
+    berubah. Tiap edit jalan sebagai task sendiri supaya edit yang lambat di satu
+    chat tidak menahan giliran chat lain.
+    """
+
+    def __init__(
+        self,
+        render: RenderFunc,
+        edit: EditFunc,
+        interval: float = PROGRESS_INTERVAL,
+        edits_per_sec: float = PROGRESS_EDITS_PER_SEC,
+        chat_min_interval: float = PROGRESS_CHAT_MIN_INTERVAL
+    ):
+        self.render = render
+        self.edit = edit
+        self.interval = interval
+        self.edits_per_sec = edits_per_sec
+        self.chat_min_interval = chat_min_interval
+        self.edits = 0
+        self.skipped = 0
+        self._entries: Dict[int, _Entry] = {}
+        self._heap: List[Tuple[float, int, int]] = []
+        self._gen = 0
+        self._tokens = edits_per_sec
+        self._refill_at = time.monotonic()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._sending: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in self._sending:
+            task.cancel()
+
+    def schedule(self, chat_id: int, group_id: int, message_id: int, last_key: Optional[str] = None):
+        """Mulai (atau ganti) progress bar untuk pesan now playing sebuah chat."""
+        self._gen += 1
+        self._entries[chat_id] = _Entry(chat_id, group_id, message_id, self._gen, last_key)
+        self._push(time.monotonic() + self.interval, chat_id, self._gen)
+
+    def cancel(self, chat_id: int):
+        # Entry di heap dibuang saat diambil karena gen tidak cocok lagi
+        self._entries.pop(chat_id, None)
+
+    def _push(self, due: float, chat_id: int, gen: int):
+        first = not self._heap or due < self._heap[0][0]
+        heapq.heappush(self._heap, (due, chat_id, gen))
+        if first:
+            self._wakeup.set()
+
+    def _take_token(self, now: float) -> bool:
+        self._tokens = min(self.edits_per_sec, self._tokens + (now - self._refill_at) * self.edits_per_sec)
+        self._refill_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def _run(self):
+        while True:
+            try:
+                if not self._heap:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                self._dispatch(self._collect_due())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in progress scheduler: {e!r}")
+
+    def _collect_due(self) -> List[Tuple[_Entry, str, object]]:
+        now = time.monotonic()
+        batch = []
+        while self._heap and self._heap[0][0] <= now:
+            _, chat_id, gen = heapq.heappop(self._heap)
+            entry = self._entries.get(chat_id)
+            if entry is None or entry.gen != gen:
+                continue
+
+            since = now - entry.last_edit
+            if since < self.chat_min_interval:
+                self._push(entry.last_edit + self.chat_min_interval, chat_id, gen)
+                continue
+
+            rendered = self.render(chat_id)
+            if rendered is None:
+                self._entries.pop(chat_id, None)
+                continue
+            key, markup = rendered
+            if key == entry.last_key:
+                self.skipped += 1
+                self._push(now + self.interval, chat_id, gen)
+                continue
+
+            if not self._take_token(now):
+                # Budget global habis: sisa antrean digeser ke slot token berikutnya
+                self._push(now + 1 / self.edits_per_sec, chat_id, gen)
+                break
+
+            batch.append((entry, key, markup))
+        return batch
+
+    def _dispatch(self, batch: List[Tuple[_Entry, str, object]]):
+        for entry, key, markup in batch:
+            task = asyncio.create_task(self._send(entry, key, markup))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, entry: _Entry, key: str, markup: object):
+        # Entry tidak ada di heap selama edit berjalan; didorong lagi setelah selesai
+        try:
+            await self.edit(entry.group_id, entry.message_id, markup)
+            result = None
+        except Exception as e:
+            result = e
+        if self._entries.get(entry.chat_id) is not entry:
+            return
+        now = time.monotonic()
+        delay = self.interval
+        if isinstance(result, FloodWait):
+            delay = max(delay, float(result.value))
+        elif isinstance(result, RateLimited):
+            # Chat sedang ramai / kena FloodWait: lewati giliran ini saja
+            self.skipped += 1
+        elif isinstance(result, MessageNotModified):
+            entry.last_key = key
+        elif result is not None:
+            if "MESSAGE_ID_INVALID" in str(result) or "message to edit not found" in str(result):
+                self._entries.pop(entry.chat_id, None)
+                return
+            logger.warning(f"Progress edit failed in {entry.chat_id}: {result!r}")
+        else:
+            entry.last_key = key
+            entry.last_edit = now
+            self.edits += 1
+        self._push(now + delay, entry.chat_id, entry.gen)
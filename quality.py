@@ -0,0 +1,148 @@
+"""Profil kualitas stream (low/medium/high) dan penurunan otomatis saat host sibuk.
+
+Profil menentukan format yt-dlp untuk download fallback, batas bitrate/resolusi
+saat memilih URL stream langsung, dan parameter audio/video MediaStream (yang
+menentukan beban transcoding ffmpeg). LoadMonitor mengukur load CPU dan trafik
+jaringan host; kalau melewati ambang, semua chat turun satu atau dua tingkat
+sampai beban turun lagi.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+from pytgcalls.types import AudioQuality, VideoQuality
+
+from metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+QUALITY_DEFAULT = os.getenv("QUALITY_DEFAULT", "high")
+# 0 = tidak pernah menurunkan kualitas otomatis
+QUALITY_AUTO = os.getenv("QUALITY_AUTO", "1") == "1"
+# Load average 1 menit per core yang dianggap penuh
+QUALITY_CPU_HIGH = float(os.getenv("QUALITY_CPU_HIGH", "0.85"))
+# Kapasitas jaringan host (Mbit/s, rx+tx); 0 = jaringan tidak dipantau
+QUALITY_NET_MBPS = float(os.getenv("QUALITY_NET_MBPS", "0"))
+QUALITY_NET_HIGH = float(os.getenv("QUALITY_NET_HIGH", "0.8"))
+QUALITY_SAMPLE_SECONDS = float(os.getenv("QUALITY_SAMPLE_SECONDS", "15"))
+
+# Turun tingkat baru dipulihkan kalau beban di bawah porsi ambang ini
+_RECOVER_RATIO = 0.8
+
+
+class Profile:
+    __slots__ = ("name", "max_abr", "max_height", "ytdl_format", "audio", "video")
+
+    def __init__(self, name: str, max_abr: Optional[float], max_height: int, ytdl_format: str,
+                 audio: AudioQuality, video: VideoQuality):
+        self.name = name
+        self.max_abr = max_abr
+        self.max_height = max_height
+        self.ytdl_format = ytdl_format
+        self.audio = audio
+        self.video = video
+
+
+# Urut dari paling ringan
+PROFILES: Dict[str, Profile] = {
+    "low": Profile("low", 64, 360, "bestaudio[abr<=64]/worstaudio/worst", AudioQuality.LOW, VideoQuality.SD_360p),
+    "medium": Profile("medium", 128, 480, "bestaudio[abr<=128]/bestaudio/best", AudioQuality.MEDIUM, VideoQuality.SD_480p),
+    "high": Profile("high", None, 720, "bestaudio/best", AudioQuality.HIGH, VideoQuality.HD_720p),
+}
+_ORDER = list(PROFILES)
+
+if QUALITY_DEFAULT not in PROFILES:
+    logger.warning(f"QUALITY_DEFAULT={QUALITY_DEFAULT!r} tidak dikenal, pakai high")
+    QUALITY_DEFAULT = "high"
+
+
+def _cpu_load() -> float:
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (OSError, AttributeError):
+        return 0.0
+
+
+def _net_bytes() -> Optional[int]:
+    try:
+        with open("/proc/net/dev") as f:
+            lines = f.readlines()[2:]
+    except OSError:
+        return None
+    total = 0
+    for line in lines:
+        name, _, data = line.partition(":")
+        if name.strip() == "lo":
+            continue
+        fields = data.split()
+        total += int(fields[0]) + int(fields[8])
+    return total
+
+
+class LoadMonitor:
+    """Sampel beban host berkala; `pressure` = berapa tingkat kualitas diturunkan (0-2)."""
+
+    def __init__(self, interval: float = QUALITY_SAMPLE_SECONDS):
+        self.interval = interval
+        self.pressure = 0
+        self.cpu = 0.0
+        self.net_mbps = 0.0
+        self._last_net: Optional[Tuple[float, int]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if QUALITY_AUTO and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _sample_net(self) -> float:
+        now, total = time.monotonic(), _net_bytes()
+        if total is None:
+            return 0.0
+        last, self._last_net = self._last_net, (now, total)
+        if last is None or now <= last[0]:
+            return self.net_mbps
+        return (total - last[1]) * 8 / 1e6 / (now - last[0])
+
+    def update(self):
+        self.cpu = _cpu_load()
+        self.net_mbps = self._sample_net()
+        ratio = self.cpu / QUALITY_CPU_HIGH
+        if QUALITY_NET_MBPS:
+            ratio = max(ratio, self.net_mbps / (QUALITY_NET_MBPS * QUALITY_NET_HIGH))
+        level = 2 if ratio >= 1.25 else 1 if ratio >= 1 else 0
+        # Histeresis: jangan naik-turun tiap sampel di sekitar ambang
+        if level < self.pressure and ratio > _RECOVER_RATIO:
+            level = self.pressure
+        if level != self.pressure:
+            logger.warning(
+                f"Kualitas stream {'turun' if level > self.pressure else 'pulih'} {level} tingkat "
+                f"(cpu {self.cpu:.2f}/core, net {self.net_mbps:.0f} Mbit/s)"
+            )
+            self.pressure = level
+
+    async def _run(self):
+        while True:
+            try:
+                self.update()
+            except Exception as e:
+                logger.error(f"Error in load monitor: {e!r}")
+            await asyncio.sleep(self.interval)
+
+
+load_monitor = LoadMonitor()
+
+
+def resolve(name: Optional[str]) -> Profile:
+    """Profil efektif untuk setelan chat (None = default deployment), setelah penurunan otomatis."""
+    index = _ORDER.index(name if name in PROFILES else QUALITY_DEFAULT)
+    return PROFILES[_ORDER[max(0, index - load_monitor.pressure)]]
+
+
+gauge("musicbot_quality_pressure", "Jumlah tingkat kualitas stream yang sedang diturunkan karena beban host",
+      func=lambda: load_monitor.pressure)
@@ -0,0 +1,293 @@
+import os
+import time
+import bisect
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from pyrogram.errors import FloodWait
+from metrics import flood_waits
+
+logger = logging.getLogger(__name__)
+
+# Budget request bot ke Telegram per detik (semua chat)
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))
+# Batas Telegram untuk grup: ~20 pesan/edit per menit per chat
+TG_CHAT_PER_MIN = float(os.getenv("TG_CHAT_PER_MIN", "20"))
+TG_CHAT_BURST = float(os.getenv("TG_CHAT_BURST", "5"))
+TG_PRIVATE_RATE = float(os.getenv("TG_PRIVATE_RATE", "1"))
+# Porsi budget global yang tidak boleh dipakai request LOW (progress bar)
+TG_LOW_RESERVE = float(os.getenv("TG_LOW_RESERVE", "0.25"))
+# Retry setelah FloodWait, hanya untuk request non-LOW yang waktu tunggunya wajar
+TG_FLOOD_RETRIES = int(os.getenv("TG_FLOOD_RETRIES", "2"))
+TG_MAX_FLOOD_WAIT = float(os.getenv("TG_MAX_FLOOD_WAIT", "60"))
+
+# Prioritas: angka kecil dilayani lebih dulu
+HIGH = 0    # balasan perintah / callback
+NORMAL = 1  # pesan now playing, hapus pesan
+LOW = 2     # edit progress bar
+PRIORITY_NAMES = {HIGH: "high", NORMAL: "normal", LOW: "low"}
+
+# Bucket chat yang penuh dan tidak diblokir dibuang setelah idle selama ini
+_IDLE_BUCKET_TTL = 300
+
+
+class RateLimited(Exception):
+    """Request ditolak karena perkiraan antreannya melebihi max_wait."""
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "stamp", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        if now > self.stamp:
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def ready_at(self, now: float, need: float = 1.0) -> float:
+        """Waktu paling cepat `need` token tersedia."""
+        self._refill(now)
+        at = now if self.tokens >= need else now + (need - self.tokens) / self.rate
+        return max(at, self.blocked_until)
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, until: float):
+        # Setelah FloodWait mulai lagi dari nol supaya tidak langsung burst
+        self.blocked_until = max(self.blocked_until, until)
+        self.tokens = 0
+        self.stamp = until
+
+    def idle(self, now: float) -> bool:
+        return now >= self.blocked_until and now - self.stamp > _IDLE_BUCKET_TTL
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "chat_id", "future", "enqueued")
+
+    def __init__(self, priority: int, seq: int, chat_id: Optional[int], future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.future = future
+        self.enqueued = time.monotonic()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class RateLimiter:
+    """Penjadwal request keluar ke Telegram (satu instance untuk bot, satu per akun assistant).
+
+    Tiap request butuh satu token dari bucket global dan bucket chat-nya. Antrean
+    diurutkan per prioritas; request LOW tidak boleh menghabiskan cadangan budget
+    global. FloodWait memblokir seluruh bucket chat (atau global kalau tanpa chat).
+    """
+
+    def __init__(
+        self,
+        global_rate: float = TG_GLOBAL_RATE,
+        chat_per_min: float = TG_CHAT_PER_MIN,
+        chat_burst: float = TG_CHAT_BURST,
+        private_rate: float = TG_PRIVATE_RATE,
+        low_reserve: float = TG_LOW_RESERVE
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_per_min / 60
+        self.chat_burst = chat_burst
+        self.private_rate = private_rate
+        self.low_need = 1 + global_rate * low_reserve
+        self._chats: Dict[int, TokenBucket] = {}
+        self._waiters: List[_Waiter] = []
+        self._seq = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_prune = time.monotonic()
+        # Metrik per prioritas
+        self.granted = {p: 0 for p in PRIORITY_NAMES}
+        self.wait_total = {p: 0.0 for p in PRIORITY_NAMES}
+        self.wait_max = {p: 0.0 for p in PRIORITY_NAMES}
+        self.rejected = 0
+        self.flood_waits = 0
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for waiter in self._waiters:
+            if not waiter.future.done():
+                waiter.future.cancel()
+        self._waiters.clear()
+
+    def _chat_bucket(self, chat_id: Optional[int]) -> Optional[TokenBucket]:
+        if chat_id is None:
+            return None
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            else:
+                bucket = TokenBucket(self.private_rate, self.private_rate)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _ready_at(self, chat_id: Optional[int], priority: int, now: float) -> float:
+        need = self.low_need if priority == LOW else 1.0
+        at = self.global_bucket.ready_at(now, need)
+        bucket = self._chat_bucket(chat_id)
+        if bucket is not None:
+            at = max(at, bucket.ready_at(now))
+        return at
+
+    def _grant(self, chat_id: Optional[int], priority: int, now: float, enqueued: float):
+        self.global_bucket.take(now)
+        bucket = self._chat_bucket(chat_id)
+        if bucket is not None:
+            bucket.take(now)
+        waited = now - enqueued
+        self.granted[priority] += 1
+        self.wait_total[priority] += waited
+        if waited > self.wait_max[priority]:
+            self.wait_max[priority] = waited
+
+    async def acquire(
+        self, chat_id: Optional[int], priority: int = NORMAL, max_wait: Optional[float] = None, send: bool = True
+    ):
+        """Tunggu giliran kirim. Dengan max_wait, tolak (RateLimited) kalau jelas tidak sempat.
+        send=False untuk request baca (get_chat, get_messages, ...): hanya memakai bucket global,
+        budget pesan per chat tidak berkurang.
+        """
+        if not send:
+            chat_id = None
+        self.start()
+        now = time.monotonic()
+        ready = self._ready_at(chat_id, priority, now)
+        if ready <= now and not self._waiters:
+            self._grant(chat_id, priority, now, now)
+            return
+        if max_wait is not None and ready - now > max_wait:
+            self.rejected += 1
+            raise RateLimited(f"chat {chat_id}: tunggu {ready - now:.1f}s")
+
+        self._seq += 1
+        waiter = _Waiter(priority, self._seq, chat_id, asyncio.get_running_loop().create_future())
+        bisect.insort(self._waiters, waiter)
+        self._wakeup.set()
+        await waiter.future
+
+    async def call(
+        self,
+        chat_id: Optional[int],
+        func: Callable[..., Awaitable],
+        *args,
+        priority: int = NORMAL,
+        max_wait: Optional[float] = None,
+        send: bool = True,
+        **kwargs
+    ) -> Any:
+        """Jalankan func(*args, **kwargs) lewat limiter, dengan retry FloodWait."""
+        attempt = 0
+        while True:
+            await self.acquire(chat_id, priority, max_wait, send)
+            try:
+                return await func(*args, **kwargs)
+            except FloodWait as e:
+                attempt += 1
+                if send:
+                    self.penalize(chat_id, float(e.value))
+                else:
+                    # FloodWait request baca tidak memblokir pesan ke chat itu; tunggu sendiri
+                    self.flood_waits += 1
+                    flood_waits.inc()
+                    logger.warning(f"FloodWait {e.value}s for read in chat {chat_id}")
+                if priority == LOW or attempt > TG_FLOOD_RETRIES or e.value > TG_MAX_FLOOD_WAIT:
+                    raise
+                if not send:
+                    await asyncio.sleep(e.value)
+
+    def penalize(self, chat_id: Optional[int], seconds: float):
+        """Blokir bucket yang kena FloodWait; request lain di chat itu ikut menunggu."""
+        self.flood_waits += 1
+        flood_waits.inc()
+        until = time.monotonic() + seconds
+        bucket = self._chat_bucket(chat_id)
+        (bucket or self.global_bucket).block(until)
+        logger.warning(f"FloodWait {seconds:.0f}s for {'chat ' + str(chat_id) if bucket else 'global bucket'}")
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _dispatch(self, now: float) -> Optional[float]:
+        """Layani waiter yang sudah boleh jalan. Mengembalikan waktu bangun berikutnya."""
+        next_at = None
+        remaining = []
+        for waiter in self._waiters:
+            if waiter.future.done():
+                continue
+            ready = self._ready_at(waiter.chat_id, waiter.priority, now)
+            if ready <= now:
+                self._grant(waiter.chat_id, waiter.priority, now, waiter.enqueued)
+                waiter.future.set_result(None)
+                continue
+            remaining.append(waiter)
+            if next_at is None or ready < next_at:
+                next_at = ready
+        self._waiters = remaining
+        return next_at
+
+    def _prune(self, now: float):
+        if now - self._last_prune < _IDLE_BUCKET_TTL:
+            return
+        self._last_prune = now
+        for chat_id in [c for c, b in self._chats.items() if b.idle(now)]:
+            del self._chats[chat_id]
+
+    async def _run(self):
+        while True:
+            try:
+                now = time.monotonic()
+                next_at = self._dispatch(now)
+                self._prune(now)
+                self._wakeup.clear()
+                timeout = None if next_at is None else max(0.0, next_at - time.monotonic())
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in rate limiter: {e!r}")
+                await asyncio.sleep(1)
+
+    def stats(self) -> Dict[str, Any]:
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for waiter in self._waiters:
+            if not waiter.future.done():
+                depth[PRIORITY_NAMES[waiter.priority]] += 1
+        return {
+            "queue_depth": depth,
+            "granted": {PRIORITY_NAMES[p]: n for p, n in self.granted.items()},
+            "wait_avg": {
+                PRIORITY_NAMES[p]: (self.wait_total[p] / n if n else 0.0) for p, n in self.granted.items()
+            },
+            "wait_max": {PRIORITY_NAMES[p]: w for p, w in self.wait_max.items()},
+            "rejected": self.rejected,
+            "flood_waits": self.flood_waits,
+            "chats": len(self._chats),
+        }
+
+
+limiter = RateLimiter()
@@ -0,0 +1,10 @@
+"""Entry point bot: python3 run.py
+
+Sengaja tipis. Worker spawn (pool thumbnail THUMB_POOL=process) menjalankan ulang
+skrip utama sebagai __mp_main__; kalau skrip utamanya main.py, tiap worker ikut
+membuat client Pyrogram, AssistantPool/PyTgCalls, store SQLite dan executor-nya.
+"""
+
+if __name__ == "__main__":
+    import main
+    main.run()
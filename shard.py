@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import bisect
+import signal
+import asyncio
+import hashlib
+import logging
+import tempfile
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from pyrogram import Client, filters
+from pyrogram.errors import ContinuePropagation, StopPropagation
+from pyrogram.handlers import CallbackQueryHandler, MessageHandler
+from pyrogram.types import CallbackQuery, ChatMemberUpdated, Message
+
+logger = logging.getLogger(__name__)
+
+# Jumlah proses worker; 1 = mode biasa (satu proses, tanpa supervisor)
+SHARD_COUNT = max(1, int(os.getenv("SHARD_COUNT", "1")))
+# Diisi supervisor untuk proses worker
+SHARD_ID: Optional[int] = int(os.environ["SHARD_ID"]) if os.getenv("SHARD_ID") else None
+SHARD_SOCKET_DIR = os.getenv("SHARD_SOCKET_DIR", os.path.join(tempfile.gettempdir(), "musicbot-shards"))
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "256"))
+# Jeda sebelum worker yang mati dijalankan ulang (dilipatgandakan sampai 60 detik)
+SHARD_RESTART_DELAY = float(os.getenv("SHARD_RESTART_DELAY", "2"))
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.sha1(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hashing: tiap shard punya beberapa titik virtual di ring."""
+
+    def __init__(self, nodes: int, vnodes: int = SHARD_VNODES):
+        self.nodes = nodes
+        points = sorted((_hash(f"shard-{node}:{v}"), node) for node in range(nodes) for v in range(vnodes))
+        self._keys = [h for h, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def owner(self, chat_id: int) -> int:
+        if self.nodes == 1:
+            return 0
+        index = bisect.bisect(self._keys, _hash(str(chat_id))) % len(self._keys)
+        return self._nodes[index]
+
+
+ring = HashRing(SHARD_COUNT)
+
+
+def owns(chat_id: int) -> bool:
+    """True kalau chat ini dilayani proses sekarang (selalu True di mode biasa)."""
+    return SHARD_ID is None or ring.owner(chat_id) == SHARD_ID
+
+
+def shard_sessions(sessions: List[str]) -> List[str]:
+    """Bagi SESSION_STRING secara bergiliran ke tiap shard."""
+    if SHARD_ID is None:
+        return sessions
+    return sessions[SHARD_ID::SHARD_COUNT]
+
+
+def socket_path(shard_id: int) -> str:
+    return os.path.join(SHARD_SOCKET_DIR, f"shard-{shard_id}.sock")
+
+
+async def dispatch_update(client: Client, update):
+    """Jalankan handler yang terdaftar di client untuk update hasil routing,
+    dengan urutan group dan aturan propagasi yang sama seperti dispatcher Pyrogram.
+    """
+    handler_type = CallbackQueryHandler if isinstance(update, CallbackQuery) else MessageHandler
+    try:
+        for group in sorted(client.dispatcher.groups):
+            for handler in client.dispatcher.groups[group]:
+                if not isinstance(handler, handler_type):
+                    continue
+                try:
+                    if not await handler.check(client, update):
+                        continue
+                except Exception as e:
+                    logger.error(f"Filter error: {e!r}")
+                    continue
+                try:
+                    await handler.callback(client, update)
+                except StopPropagation:
+                    raise
+                except ContinuePropagation:
+                    continue
+                except Exception as e:
+                    logger.error(f"Handler error: {e!r}")
+                break
+    except StopPropagation:
+        pass
+
+
+# ---------- worker ----------
+
+class ShardServer:
+    """Server unix socket di worker; tiap baris JSON adalah satu event dari front-end."""
+
+    def __init__(self, shard_id: int, handler: Callable[[Dict], Awaitable]):
+        self.path = socket_path(shard_id)
+        self.handler = handler
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self):
+        os.makedirs(SHARD_SOCKET_DIR, exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+        logger.info(f"Shard {SHARD_ID} mendengarkan di {self.path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in self._tasks:
+            task.cancel()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Event shard tidak valid: {line[:100]!r}")
+                    continue
+                task = asyncio.create_task(self._handle(event))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            writer.close()
+
+    async def _handle(self, event: Dict):
+        try:
+            await self.handler(event)
+        except Exception as e:
+            logger.error(f"Error handling routed {event.get('kind')}: {e!r}")
+
+
+# ---------- supervisor / front-end ----------
+
+class ShardRouter:
+    """Koneksi front-end ke tiap worker; event dikirim ke shard pemilik chat."""
+
+    def __init__(self, count: int):
+        self.count = count
+        self._writers: Dict[int, asyncio.StreamWriter] = {}
+        self._locks = [asyncio.Lock() for _ in range(count)]
+        self.sent = [0] * count
+        self.dropped = [0] * count
+
+    async def _writer(self, shard_id: int) -> asyncio.StreamWriter:
+        writer = self._writers.get(shard_id)
+        if writer is not None and not writer.is_closing():
+            return writer
+        _, writer = await asyncio.open_unix_connection(socket_path(shard_id))
+        self._writers[shard_id] = writer
+        return writer
+
+    async def send(self, chat_id: int, event: Dict):
+        shard_id = ring.owner(chat_id)
+        line = json.dumps(event).encode() + b"\n"
+        async with self._locks[shard_id]:
+            # Worker bisa sedang restart: coba beberapa kali sebelum event dibuang
+            for attempt in range(3):
+                try:
+                    writer = await self._writer(shard_id)
+                    writer.write(line)
+                    await writer.drain()
+                    self.sent[shard_id] += 1
+                    return
+                except (OSError, ConnectionError):
+                    self._writers.pop(shard_id, None)
+                    await asyncio.sleep(0.5 * (attempt + 1))
+        self.dropped[shard_id] += 1
+        logger.warning(f"Shard {shard_id} tidak bisa dihubungi, {event['kind']} di {chat_id} dibuang")
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+def register_frontend(bot: Client, router: ShardRouter):
+    """Handler front-end: hanya meneruskan (chat_id, message_id) ke shard pemilik."""
+
+    @bot.on_message(filters.regex(r"^/"))
+    async def route_message(_, message: Message):
+        await router.send(message.chat.id, {
+            "kind": "message",
+            "chat_id": message.chat.id,
+            "message_id": message.id,
+        })
+
+    @bot.on_callback_query()
+    async def route_callback(_, cb: CallbackQuery):
+        if cb.message is None:
+            return await cb.answer()
+        user = cb.from_user
+        await router.send(cb.message.chat.id, {
+            "kind": "callback",
+            "id": cb.id,
+            "chat_id": cb.message.chat.id,
+            "message_id": cb.message.id,
+            "chat_instance": cb.chat_instance,
+            "data": cb.data if isinstance(cb.data, str) else cb.data.decode(),
+            "user": {"id": user.id, "first_name": user.first_name, "username": user.username},
+        })
+
+    @bot.on_chat_member_updated()
+    async def route_member(_, update: ChatMemberUpdated):
+        await router.send(update.chat.id, {"kind": "member", "chat_id": update.chat.id})
+
+
+async def _run_worker(shard_id: int, script: str, env: Dict[str, str], stopping: asyncio.Event):
+    delay = SHARD_RESTART_DELAY
+    while not stopping.is_set():
+        proc = await asyncio.create_subprocess_exec(sys.executable, script, env=env)
+        logger.info(f"Shard {shard_id} jalan (pid {proc.pid})")
+        wait = asyncio.ensure_future(proc.wait())
+        stop = asyncio.ensure_future(stopping.wait())
+        await asyncio.wait([wait, stop], return_when=asyncio.FIRST_COMPLETED)
+        if stopping.is_set():
+            stop.cancel()
+            if proc.returncode is None:
+                proc.terminate()
+                try:
+                    await asyncio.wait_for(wait, timeout=15)
+                except asyncio.TimeoutError:
+                    proc.kill()
+            return
+        stop.cancel()
+        logger.error(f"Shard {shard_id} berhenti (kode {proc.returncode}), restart dalam {delay:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 60)
+
+
+def worker_env(shard_id: int) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["SHARD_ID"] = str(shard_id)
+    env["SHARD_COUNT"] = str(SHARD_COUNT)
+    env["SHARD_SOCKET_DIR"] = SHARD_SOCKET_DIR
+    # Eviksi media cache per proses tidak boleh menghapus file milik shard lain
+    env["MEDIA_DIR"] = os.path.join(os.getenv("MEDIA_DIR", "downloads"), f"shard-{shard_id}")
+    # Budget global Bot API dibagi rata
+    env["TG_GLOBAL_RATE"] = str(float(os.getenv("TG_GLOBAL_RATE", "30")) / SHARD_COUNT)
+    return env
+
+
+async def run_supervisor(script: str, bot_token: str):
+    """Jalankan SHARD_COUNT worker (script yang sama dengan SHARD_ID) dan bot front-end
+    yang menerima update lalu meneruskannya ke worker pemilik chat.
+    """
+    # Client terpisah: handler perintah di main.py tidak boleh ikut jalan di front-end
+    bot = Client(name="music_bot_front", bot_token=bot_token, in_memory=True, workers=8)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:
+            pass
+
+    workers = [
+        asyncio.create_task(_run_worker(i, script, worker_env(i), stopping))
+        for i in range(SHARD_COUNT)
+    ]
+    router = ShardRouter(SHARD_COUNT)
+    register_frontend(bot, router)
+    try:
+        await bot.start()
+        logger.info(f"Front-end @{bot.me.username} aktif dengan {SHARD_COUNT} shard")
+        await stopping.wait()
+    finally:
+        stopping.set()
+        router.close()
+        if bot.is_connected:
+            await bot.stop()
+        await asyncio.gather(*workers, return_exceptions=True)
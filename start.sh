@@ -25,4 +25,4 @@ echo "✅ File .env berhasil dibuat/diperbarui."
 echo "🚀 Menjalankan bot..."
 echo "--------------------------------------"
 
-python3 main.py
+python3 run.py
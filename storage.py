@@ -0,0 +1,226 @@
+import os
+import json
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_DB = os.getenv("STATE_DB", "state.db")
+# Jeda write-behind: perubahan dikumpulkan lalu di-commit sekali per interval
+STATE_FLUSH_INTERVAL = float(os.getenv("STATE_FLUSH_INTERVAL", "2"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS connections (
+    group_id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    chat_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (chat_id, name)
+);
+CREATE TABLE IF NOT EXISTS queues (
+    chat_id INTEGER PRIMARY KEY,
+    tracks TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS playing (
+    chat_id INTEGER PRIMARY KEY,
+    track TEXT NOT NULL,
+    position REAL NOT NULL
+);
+"""
+
+
+class SavedState:
+    """Isi state yang dimuat saat startup."""
+
+    def __init__(self):
+        self.connections: Dict[int, int] = {}
+        self.settings: Dict[int, Dict[str, Any]] = {}
+        self.queues: Dict[int, List[Dict]] = {}
+        # chat_id -> (track, posisi putar terakhir dalam detik)
+        self.playing: Dict[int, Tuple[Dict, float]] = {}
+
+
+class StateStore:
+    """Antarmuka penyimpanan state. Semua setter hanya menandai perubahan (write-behind)."""
+
+    # chat_id -> posisi putar (detik) saat ini; dibaca tiap flush
+    positions: Optional[Callable[[], Dict[int, float]]] = None
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def load(self) -> SavedState:
+        return SavedState()
+
+    def set_connection(self, group_id: int, channel_id: Optional[int]):
+        pass
+
+    def set_setting(self, chat_id: int, name: str, value: Any):
+        pass
+
+    def save_queue(self, chat_id: int, tracks):
+        pass
+
+    def save_playing(self, chat_id: int, track, position: float = 0):
+        pass
+
+
+class SQLiteStore(StateStore):
+    """SQLite (WAL) dengan commit berkala. Semua akses DB lewat satu thread."""
+
+    def __init__(self, path: str, flush_interval: float = STATE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state")
+        # (tabel, key) -> nilai terakhir; perubahan berulang pada key yang sama digabung
+        self._pending: Dict[Tuple[str, Hashable], Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _open(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(_SCHEMA)
+        self._db = db
+
+    async def start(self):
+        if self._db is None:
+            await self._call(self._open)
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._db is not None:
+            await self.flush()
+            await self._call(self._db.close)
+            self._db = None
+
+    def _load(self) -> SavedState:
+        state = SavedState()
+        for group_id, channel_id in self._db.execute("SELECT group_id, channel_id FROM connections"):
+            state.connections[group_id] = channel_id
+        for chat_id, name, value in self._db.execute("SELECT chat_id, name, value FROM settings"):
+            state.settings.setdefault(chat_id, {})[name] = json.loads(value)
+        for chat_id, tracks in self._db.execute("SELECT chat_id, tracks FROM queues"):
+            state.queues[chat_id] = json.loads(tracks)
+        for chat_id, track, position in self._db.execute("SELECT chat_id, track, position FROM playing"):
+            state.playing[chat_id] = (json.loads(track), max(0.0, position))
+        return state
+
+    async def load(self) -> SavedState:
+        await self.start()
+        return await self._call(self._load)
+
+    def set_connection(self, group_id: int, channel_id: Optional[int]):
+        self._pending[("connections", group_id)] = channel_id
+
+    def set_setting(self, chat_id: int, name: str, value: Any):
+        self._pending[("settings", (chat_id, name))] = value
+
+    def save_queue(self, chat_id: int, tracks):
+        # Simpan referensinya saja; diserialisasi saat flush
+        self._pending[("queues", chat_id)] = tracks
+
+    def save_playing(self, chat_id: int, track, position: float = 0):
+        self._pending[("playing", chat_id)] = (track, position) if track is not None else None
+
+    def _serialize(self, pending: Dict[Tuple[str, Hashable], Any]) -> List[Tuple[str, tuple]]:
+        ops = []
+        for (table, key), value in pending.items():
+            if table == "connections":
+                if value is None:
+                    ops.append(("DELETE FROM connections WHERE group_id = ?", (key,)))
+                else:
+                    ops.append(("INSERT OR REPLACE INTO connections VALUES (?, ?)", (key, value)))
+            elif table == "settings":
+                if value is None:
+                    ops.append(("DELETE FROM settings WHERE chat_id = ? AND name = ?", key))
+                else:
+                    ops.append(("INSERT OR REPLACE INTO settings VALUES (?, ?, ?)", (*key, json.dumps(value))))
+            elif table == "queues":
+                tracks = [t.to_dict() for t in value] if value else []
+                if tracks:
+                    ops.append(("INSERT OR REPLACE INTO queues VALUES (?, ?)", (key, json.dumps(tracks))))
+                else:
+                    ops.append(("DELETE FROM queues WHERE chat_id = ?", (key,)))
+            elif table == "playing":
+                if value is None:
+                    ops.append(("DELETE FROM playing WHERE chat_id = ?", (key,)))
+                else:
+                    track, position = value
+                    ops.append((
+                        "INSERT OR REPLACE INTO playing VALUES (?, ?, ?)",
+                        (key, json.dumps(track.to_dict()), position)
+                    ))
+        return ops
+
+    def _position_ops(self) -> List[Tuple[str, tuple]]:
+        """Posisi lagu yang sedang diputar; waktu bot mati tidak ikut terhitung saat restore."""
+        if self.positions is None:
+            return []
+        try:
+            positions = self.positions()
+        except Exception as e:
+            logger.error(f"Reading play positions failed: {e!r}")
+            return []
+        return [
+            ("UPDATE playing SET position = ? WHERE chat_id = ?", (position, chat_id))
+            for chat_id, position in positions.items()
+        ]
+
+    def _commit(self, ops: List[Tuple[str, tuple]]):
+        self._db.execute("BEGIN")
+        try:
+            for sql, params in ops:
+                self._db.execute(sql, params)
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    async def flush(self):
+        if self._db is None:
+            return
+        pending, self._pending = self._pending, {}
+        # Serialisasi di event loop supaya snapshot antrean konsisten
+        ops = self._serialize(pending) + self._position_ops()
+        if not ops:
+            return
+        try:
+            await self._call(self._commit, ops)
+        except Exception as e:
+            logger.error(f"State flush failed: {e!r}")
+            for key, value in pending.items():
+                self._pending.setdefault(key, value)
+
+    async def _flush_loop(self):
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        except asyncio.CancelledError:
+            pass
+
+
+def create_store() -> StateStore:
+    """Backend dipilih dari STATE_DB; kosong = tidak menyimpan apa pun."""
+    if not STATE_DB:
+        return StateStore()
+    return SQLiteStore(STATE_DB)
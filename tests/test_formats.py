@@ -0,0 +1,73 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formats import select_stream, stream_expiry
+
+
+def fmt(name, vcodec="none", acodec="none", height=None, abr=None, tbr=None):
+    return {"url": f"https://rr.googlevideo.com/{name}?expire=1000", "vcodec": vcodec, "acodec": acodec,
+            "height": height, "abr": abr, "tbr": tbr}
+
+
+# Bentuk format YouTube: satu progresif 360p, sisanya video-only / audio-only (DASH)
+INFO = {"formats": [
+    fmt("a48", acodec="opus", abr=48),
+    fmt("a128", acodec="mp4a", abr=128),
+    fmt("a160", acodec="opus", abr=160),
+    fmt("m360", vcodec="avc1", acodec="mp4a", height=360, tbr=600),
+    fmt("v480", vcodec="vp9", height=480, tbr=900),
+    fmt("v720", vcodec="avc1", height=720, tbr=1500),
+    fmt("v720av1", vcodec="av01", height=720, tbr=1200),
+    fmt("v1080", vcodec="vp9", height=1080, tbr=3000),
+]}
+
+
+def names(result):
+    return tuple(url.split("/")[-1].split("?")[0] if url else None for url in result)
+
+
+def test_audio_best():
+    assert names(select_stream(INFO, "audio")) == ("a160", None)
+
+
+def test_audio_capped_by_profile():
+    assert names(select_stream(INFO, "audio", max_abr=128)) == ("a128", None)
+    assert names(select_stream(INFO, "audio", max_abr=64)) == ("a48", None)
+
+
+def test_audio_all_above_cap_takes_smallest():
+    info = {"formats": [fmt("a128", acodec="mp4a", abr=128), fmt("a160", acodec="opus", abr=160)]}
+    assert names(select_stream(info, "audio", max_abr=64)) == ("a128", None)
+
+
+def test_video_pairs_dash_video_with_audio():
+    assert names(select_stream(INFO, "video", max_height=720)) == ("v720", "a160")
+
+
+def test_video_profile_downgrade():
+    # Profil medium/low: resolusi dan bitrate audio ikut turun
+    assert names(select_stream(INFO, "video", max_height=480, max_abr=128)) == ("v480", "a128")
+    assert names(select_stream(INFO, "video", max_height=360, max_abr=64)) == ("m360", None)
+
+
+def test_video_prefers_muxed_at_same_height():
+    info = {"formats": INFO["formats"] + [fmt("m720", vcodec="avc1", acodec="mp4a", height=720, tbr=1000)]}
+    assert names(select_stream(info, "video", max_height=720)) == ("m720", None)
+
+
+def test_video_without_audio_only_uses_muxed():
+    info = {"formats": [f for f in INFO["formats"] if f["vcodec"] != "none"]}
+    assert names(select_stream(info, "video", max_height=720)) == ("m360", None)
+
+
+def test_video_nothing_fits():
+    info = {"formats": [fmt("v1080", vcodec="vp9", height=1080)]}
+    assert select_stream(info, "video", max_height=720) == (None, None)
+
+
+def test_stream_expiry_earliest():
+    info = {"url": "https://x/?expire=500", "formats": INFO["formats"]}
+    assert stream_expiry(info) == 500
+    assert stream_expiry({"formats": []}) is None
@@ -0,0 +1,59 @@
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mediacache import MediaCache
+
+
+def write(directory, name: str, size: int) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return path
+
+
+def test_add_over_quota_keeps_acquired_file(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=100)
+    path = write(tmp_path, "big.mp3", 500)
+    result = asyncio.run(cache.add("big", path, acquire=True))
+    assert os.path.exists(result)
+    assert cache.refs("big") == 1
+    assert cache.lookup("big") == result
+
+
+def test_add_without_acquire_over_quota_is_evicted(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=100)
+    path = write(tmp_path, "big.mp3", 500)
+    asyncio.run(cache.add("big", path))
+    assert not os.path.exists(path)
+    assert cache.lookup("big") is None
+
+
+def test_add_when_others_are_referenced(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=100)
+
+    async def run():
+        await cache.add("a", write(tmp_path, "a.mp3", 80), acquire=True)
+        return await cache.add("b", write(tmp_path, "b.mp3", 80), acquire=True)
+
+    b = asyncio.run(run())
+    # Keduanya dipakai: kuota boleh terlampaui, tidak ada yang dihapus
+    assert os.path.exists(b) and os.path.exists(cache.lookup("a"))
+    assert cache.size == 160
+
+
+def test_release_evicts_oldest_unreferenced(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=100)
+
+    async def run():
+        a = await cache.add("a", write(tmp_path, "a.mp3", 80), acquire=True)
+        b = await cache.add("b", write(tmp_path, "b.mp3", 80), acquire=True)
+        await cache.release("b")
+        return a, b
+
+    a, b = asyncio.run(run())
+    assert os.path.exists(a)
+    assert not os.path.exists(b)
+    assert cache.size == 80
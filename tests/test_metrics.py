@@ -0,0 +1,88 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+def render(*metrics) -> list:
+    registry = Registry()
+    for metric in metrics:
+        registry.register(metric)
+    text = registry.render()
+    assert text.endswith("\n")
+    return text.splitlines()
+
+
+def test_counter_with_label_escaping():
+    c = Counter("test_total", "Jumlah tes", ["stage"])
+    c.inc(stage='a"b\\c\nd')
+    c.inc(2, stage="ok")
+    assert render(c) == [
+        "# HELP test_total Jumlah tes",
+        "# TYPE test_total counter",
+        'test_total{stage="a\\"b\\\\c\\nd"} 1',
+        'test_total{stage="ok"} 2',
+    ]
+
+
+def test_counter_without_labels():
+    c = Counter("plain_total", "Tanpa label")
+    c.inc(0.5)
+    assert render(c)[2:] == ["plain_total 0.5"]
+
+
+def test_histogram_buckets_sum_count():
+    h = Histogram("lat_seconds", "Latensi", ["op"], buckets=(0.1, 1))
+    h.observe(0.1, op="info")   # tepat di batas: masuk le="0.1"
+    h.observe(0.5, op="info")
+    h.observe(3, op="info")     # di atas bucket terakhir: hanya +Inf
+    assert render(h) == [
+        "# HELP lat_seconds Latensi",
+        "# TYPE lat_seconds histogram",
+        'lat_seconds_bucket{op="info",le="0.1"} 1',
+        'lat_seconds_bucket{op="info",le="1"} 2',
+        'lat_seconds_bucket{op="info",le="+Inf"} 3',
+        'lat_seconds_sum{op="info"} 3.6',
+        'lat_seconds_count{op="info"} 3',
+    ]
+
+
+def test_histogram_without_labels():
+    h = Histogram("gap_seconds", "Jeda", buckets=(1,))
+    h.observe(2)
+    assert render(h)[2:] == [
+        'gap_seconds_bucket{le="1"} 0',
+        'gap_seconds_bucket{le="+Inf"} 1',
+        "gap_seconds_sum 2.0",
+        "gap_seconds_count 1",
+    ]
+
+
+def test_gauge_func_scalar_and_labelled():
+    queued = Gauge("queued", "Lagu di antrean", func=lambda: 7)
+    ratio = Gauge("hit_ratio", "Rasio hit", ["cache"], func=lambda: {("search",): 0.25, ("info",): 1.0})
+    assert render(queued, ratio) == [
+        "# HELP queued Lagu di antrean",
+        "# TYPE queued gauge",
+        "queued 7",
+        "# HELP hit_ratio Rasio hit",
+        "# TYPE hit_ratio gauge",
+        'hit_ratio{cache="search"} 0.25',
+        'hit_ratio{cache="info"} 1.0',
+    ]
+
+
+def test_gauge_func_error_skips_samples():
+    def broken():
+        raise RuntimeError("boom")
+
+    g = Gauge("broken", "Selalu gagal", func=broken)
+    assert render(g) == ["# HELP broken Selalu gagal", "# TYPE broken gauge"]
+
+
+def test_gauge_set():
+    g = Gauge("pressure", "Tekanan", ["host"])
+    g.set(2, host="a")
+    assert render(g)[2:] == ['pressure{host="a"} 2']
@@ -0,0 +1,144 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playqueue import QueueFull, Track, TrackQueue
+
+
+def make_track(i: int) -> Track:
+    return Track(f"Lagu {i}", f"https://www.youtube.com/watch?v={i:011d}", "audio", "user", duration=180)
+
+
+def titles(queue: TrackQueue):
+    return [t.title for t in queue]
+
+
+def make_queue(count: int, maxlen: int = 0) -> TrackQueue:
+    return TrackQueue((make_track(i) for i in range(count)), maxlen=maxlen)
+
+
+def test_remove_at():
+    queue = make_queue(5)
+    assert queue.remove_at(0).title == "Lagu 0"
+    assert queue.remove_at(2).title == "Lagu 3"
+    assert titles(queue) == ["Lagu 1", "Lagu 2", "Lagu 4"]
+
+
+def test_remove_at_negative_index():
+    queue = make_queue(5)
+    assert queue.remove_at(-1).title == "Lagu 4"
+    assert queue.remove_at(-4).title == "Lagu 0"
+    assert titles(queue) == ["Lagu 1", "Lagu 2", "Lagu 3"]
+
+
+@pytest.mark.parametrize("index", [5, 100, -6])
+def test_remove_at_out_of_range(index):
+    queue = make_queue(5)
+    with pytest.raises(IndexError):
+        queue.remove_at(index)
+    assert len(queue) == 5
+
+
+def test_remove_at_empty():
+    with pytest.raises(IndexError):
+        TrackQueue().remove_at(0)
+
+
+def test_move():
+    queue = make_queue(5)
+    queue.move(0, 3)
+    assert titles(queue) == ["Lagu 1", "Lagu 2", "Lagu 3", "Lagu 0", "Lagu 4"]
+    queue.move(4, 0)
+    assert titles(queue) == ["Lagu 4", "Lagu 1", "Lagu 2", "Lagu 3", "Lagu 0"]
+
+
+def test_append_full():
+    queue = make_queue(3, maxlen=3)
+    with pytest.raises(QueueFull):
+        queue.append(make_track(9))
+    assert len(queue) == 3
+
+
+def test_insert_full():
+    queue = make_queue(3, maxlen=3)
+    with pytest.raises(QueueFull):
+        queue.insert(0, make_track(9))
+    assert titles(queue) == ["Lagu 0", "Lagu 1", "Lagu 2"]
+
+
+def test_extend_stops_at_maxlen():
+    queue = make_queue(2, maxlen=4)
+    added = queue.extend(make_track(i) for i in range(10, 20))
+    assert added == 2
+    assert titles(queue) == ["Lagu 0", "Lagu 1", "Lagu 10", "Lagu 11"]
+
+
+def test_requeue_and_appendleft_ignore_maxlen():
+    queue = make_queue(2, maxlen=2)
+    queue.requeue(make_track(8))
+    queue.appendleft(make_track(9))
+    assert titles(queue) == ["Lagu 9", "Lagu 0", "Lagu 1", "Lagu 8"]
+
+
+def test_maxlen_zero_is_unlimited():
+    queue = make_queue(3)
+    queue.append(make_track(3))
+    queue.insert(0, make_track(4))
+    assert len(queue) == 5
+
+
+def test_clear_returns_items():
+    queue = make_queue(3)
+    items = queue.clear()
+    assert [t.title for t in items] == ["Lagu 0", "Lagu 1", "Lagu 2"]
+    assert not queue
+
+
+def test_shuffle_keeps_tracks():
+    queue = make_queue(50)
+    before = sorted(titles(queue))
+    queue.shuffle()
+    assert len(queue) == 50
+    assert sorted(titles(queue)) == before
+
+
+def test_shuffle_keeps_duplicates():
+    track = make_track(1)
+    queue = TrackQueue([track, track, make_track(2)], maxlen=0)
+    queue.shuffle()
+    assert sorted(t.title for t in queue) == ["Lagu 1", "Lagu 1", "Lagu 2"]
+
+
+def test_track_round_trip():
+    track = Track("Lagu", "https://youtu.be/x", "video", "user", duration="1:02:03",
+                  thumbnail="https://i.ytimg.com/x.jpg", reply_to_message_id=5, group_id=-100)
+    track.media_key = "yt-x"
+    track.start_offset = 42.5
+    track.photo_id = "AgAD"
+    data = track.to_dict()
+    # Turunan dan field kosong tidak ikut disimpan
+    assert "duration_text" not in data
+    assert "source" not in data
+    restored = Track.from_dict(data)
+    for name in Track._PERSIST:
+        assert getattr(restored, name) == getattr(track, name), name
+    assert restored.duration == 3723
+    assert restored.duration_text == "1:02:03"
+
+
+def test_track_from_dict_defaults():
+    restored = Track.from_dict({"title": "Lagu", "url": "/tmp/a.mp3", "stream_type": "audio", "requester": "user"})
+    assert restored.start_offset == 0
+    assert restored.duration == 0
+    assert restored.duration_text == "00:00"
+    assert restored.source is None and restored.photo_id is None
+
+
+def test_track_from_dict_legacy_duration():
+    restored = Track.from_dict({"title": "Lagu", "url": "u", "stream_type": "audio", "requester": "user",
+                                "duration": "3:30"})
+    assert restored.duration == 210
+    assert restored.duration_text == "03:30"
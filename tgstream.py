@@ -0,0 +1,250 @@
+"""Putar media Telegram sambil di-download (progresif).
+
+File ditulis ke MEDIA_DIR sebagai `<key>.part` chunk demi chunk lewat
+`client.stream_media`. ffmpeg (lewat MediaStream) membaca URL HTTP lokal yang
+menyajikan file itu dan menunggu kalau belum sampai. Begitu TG_STREAM_PREBUFFER_MB
+pertama ada di disk, lagu sudah bisa diputar. Setelah selesai, file di-rename dan
+didaftarkan ke media cache seperti download biasa.
+
+Range request jauh di depan posisi download (mis. moov atom di akhir MP4) dilayani
+langsung dari Telegram mulai dari chunk yang diminta.
+"""
+import os
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from mediacache import media_cache
+
+logger = logging.getLogger(__name__)
+
+# 0 = selalu download penuh dulu
+TG_STREAM = os.getenv("TG_STREAM", "1") == "1"
+# File lebih kecil dari ini tetap di-download penuh (cukup cepat)
+TG_STREAM_MIN_MB = float(os.getenv("TG_STREAM_MIN_MB", "8"))
+# Data yang harus sudah ada sebelum mulai diputar
+TG_STREAM_PREBUFFER_MB = float(os.getenv("TG_STREAM_PREBUFFER_MB", "2"))
+TG_STREAM_HOST = os.getenv("TG_STREAM_HOST", "127.0.0.1")
+TG_STREAM_PORT = int(os.getenv("TG_STREAM_PORT", "0"))
+
+# Ukuran chunk stream_media Pyrogram (offset dihitung dalam chunk)
+CHUNK_SIZE = 1024 * 1024
+_READ_SIZE = 256 * 1024
+# Range request sejauh ini di depan download dilayani langsung dari Telegram
+_SEEK_AHEAD = 4 * CHUNK_SIZE
+_PREFIX = "/tg/"
+
+_downloads: Dict[str, "Download"] = {}
+_server: Optional[asyncio.AbstractServer] = None
+_port = 0
+
+
+class Download:
+    def __init__(self, client, message, key: str, path: str, size: int):
+        self.client = client
+        self.message = message
+        self.key = key
+        self.path = path
+        # File di disk saat ini: .part selama download, path akhir setelah selesai
+        self.file = path + ".part"
+        self.size = size
+        self.written = 0
+        self.error: Optional[BaseException] = None
+        self.done = asyncio.Event()
+        self._progress = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def _notify(self):
+        self._progress.set()
+        self._progress = asyncio.Event()
+
+    async def wait_for(self, offset: int):
+        """Tunggu sampai byte ke-offset sudah ditulis (atau download berhenti)."""
+        while self.written < offset and not self.done.is_set():
+            await self._progress.wait()
+
+    async def run(self):
+        f = await asyncio.to_thread(open, self.file, "wb")
+        try:
+            async for chunk in self.client.stream_media(self.message):
+                await asyncio.to_thread(f.write, chunk)
+                await asyncio.to_thread(f.flush)
+                self.written += len(chunk)
+                self._notify()
+            await asyncio.to_thread(f.close)
+            # Pembaca yang sudah membuka .part tetap jalan setelah rename
+            await asyncio.to_thread(os.replace, self.file, self.path)
+            self.file = self.path
+            self.size = self.written
+            await media_cache.add(self.key, self.path)
+            logger.info(f"Telegram media {self.key} selesai: {self.written / 1048576:.1f} MB")
+        except BaseException as e:
+            self.error = e
+            f.close()
+            media_cache.discard(self.key)
+            try:
+                os.remove(self.file)
+            except OSError:
+                pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            logger.error(f"Download Telegram {self.key} gagal: {e!r}")
+        finally:
+            self.done.set()
+            self._notify()
+            _downloads.pop(self.key, None)
+            # Ref milik download sendiri; lagu di antrean memegang ref masing-masing
+            await media_cache.release(self.key)
+
+
+def should_stream(media) -> bool:
+    size = getattr(media, "file_size", 0) or 0
+    return TG_STREAM and size >= TG_STREAM_MIN_MB * 1048576
+
+
+def downloading(key: Optional[str]) -> bool:
+    return bool(key) and key in _downloads
+
+
+def is_stream_url(source: Optional[str]) -> bool:
+    return bool(source) and source.startswith(f"http://{TG_STREAM_HOST}:{_port}{_PREFIX}")
+
+
+def stream_url(key: str) -> str:
+    return f"http://{TG_STREAM_HOST}:{_port}{_PREFIX}{quote(key)}"
+
+
+async def start(client, message, media, key: str, path: str) -> Tuple[str, str]:
+    """Mulai (atau ikut) download progresif. Kembali setelah prebuffer terisi:
+    (path file akhir, URL stream lokal)."""
+    await _ensure_server()
+    download = _downloads.get(key)
+    if download is None:
+        download = Download(client, message, key, path, media.file_size or 0)
+        media_cache.reserve(key, download.file, download.size)
+        media_cache.acquire(key)
+        _downloads[key] = download
+        download.task = asyncio.create_task(download.run())
+    prebuffer = int(TG_STREAM_PREBUFFER_MB * 1048576)
+    if download.size:
+        prebuffer = min(prebuffer, download.size)
+    await download.wait_for(prebuffer)
+    if download.error is not None:
+        raise download.error
+    return download.path, stream_url(key)
+
+
+async def close():
+    global _server
+    for download in list(_downloads.values()):
+        if download.task:
+            download.task.cancel()
+    if _server is not None:
+        _server.close()
+        _server = None
+
+
+# ---------- server HTTP lokal ----------
+
+async def _ensure_server():
+    global _server, _port
+    if _server is None:
+        _server = await asyncio.start_server(_handle, TG_STREAM_HOST, TG_STREAM_PORT)
+        _port = _server.sockets[0].getsockname()[1]
+        logger.info(f"Stream Telegram lokal di http://{TG_STREAM_HOST}:{_port}{_PREFIX}")
+
+
+def _parse_range(value: Optional[str]) -> Tuple[int, Optional[int]]:
+    if not value or not value.startswith("bytes="):
+        return 0, None
+    start, _, end = value[6:].split(",")[0].partition("-")
+    try:
+        return int(start or 0), int(end) if end else None
+    except ValueError:
+        return 0, None
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request = await asyncio.wait_for(reader.readline(), timeout=10)
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=10)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        parts = request.decode("latin-1").split()
+        key = unquote(parts[1][len(_PREFIX):]) if len(parts) >= 2 and parts[1].startswith(_PREFIX) else ""
+        download = _downloads.get(key)
+        path = download.file if download else (media_cache.lookup(key) if key else None)
+        if not path:
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            return
+        size = download.size if download else await asyncio.to_thread(os.path.getsize, path)
+        start, end = _parse_range(headers.get("range"))
+        if size and (end is None or end >= size):
+            end = size - 1
+        if size and start >= size:
+            writer.write(f"HTTP/1.1 416 Range Not Satisfiable\r\nContent-Range: bytes */{size}\r\nConnection: close\r\n\r\n".encode())
+            await writer.drain()
+            return
+        head = "HTTP/1.1 206 Partial Content" if "range" in headers else "HTTP/1.1 200 OK"
+        lines = [head, "Accept-Ranges: bytes", "Content-Type: application/octet-stream", "Connection: close"]
+        if size:
+            lines.append(f"Content-Length: {end - start + 1}")
+            if "range" in headers:
+                lines.append(f"Content-Range: bytes {start}-{end}/{size}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        if parts[0] != "HEAD":
+            stop = end + 1 if size else None
+            if download and start > download.written + _SEEK_AHEAD and not download.done.is_set():
+                await _send_remote(writer, download, start, stop)
+            else:
+                await _send_local(writer, download, path, start, stop)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+        pass
+    except Exception as e:
+        logger.warning(f"Stream Telegram: {e!r}")
+    finally:
+        writer.close()
+
+
+async def _send_local(writer: asyncio.StreamWriter, download: Optional[Download], path: str, start: int, stop: Optional[int]):
+    """Kirim dari file di disk; kalau masih di-download, tunggu data berikutnya."""
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        pos = start
+        while stop is None or pos < stop:
+            if download is not None and not download.done.is_set() and download.written <= pos:
+                await download.wait_for(pos + 1)
+            want = _READ_SIZE if stop is None else min(_READ_SIZE, stop - pos)
+            data = await asyncio.to_thread(f.read, want)
+            if not data:
+                if download is None or download.done.is_set():
+                    break
+                continue
+            writer.write(data)
+            await writer.drain()
+            pos += len(data)
+    finally:
+        f.close()
+
+
+async def _send_remote(writer: asyncio.StreamWriter, download: Download, start: int, stop: Optional[int]):
+    """Range jauh di depan download: ambil langsung dari Telegram tanpa disimpan."""
+    pos = start - start % CHUNK_SIZE
+    async for chunk in download.client.stream_media(download.message, offset=start // CHUNK_SIZE):
+        data = chunk[max(0, start - pos):]
+        if stop is not None:
+            data = data[:max(0, stop - max(pos, start))]
+        pos += len(chunk)
+        if data:
+            writer.write(data)
+            await writer.drain()
+        if stop is not None and pos >= stop:
+            break
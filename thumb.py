@@ -0,0 +1,284 @@
+import os
+import asyncio
+import logging
+import textwrap
+import multiprocessing
+from io import BytesIO
+from typing import Dict, Optional, Tuple, Union
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps
+from unidecode import unidecode
+from cache import DiskCache, LRUCache, cache_key
+from httpclient import fetch_bytes
+from metrics import thumb_render
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# "process" = ProcessPoolExecutor (lepas dari GIL), "thread" = ThreadPoolExecutor
+THUMB_POOL = os.getenv("THUMB_POOL", "process").lower()
+THUMB_WORKERS = int(os.getenv("THUMB_WORKERS", "2"))
+# Jumlah render yang boleh menunggu di belakang worker sebelum pemanggil ditahan
+THUMB_QUEUE_SIZE = int(os.getenv("THUMB_QUEUE_SIZE", "8"))
+# Batas waktu menunggu slot kosong; lewat dari ini gen_thumb melempar TimeoutError
+THUMB_WAIT_TIMEOUT = float(os.getenv("THUMB_WAIT_TIMEOUT", "20"))
+THUMB_SIZE = (1280, 720)
+THUMB_FONT = "Title.ttf"
+ART_SIZE = 400
+# Posisi kolom teks: art_x (100) + ART_SIZE + 70
+TEXT_X = 570
+
+# Cache JPEG jadi (memori + disk), key: (thumbnail_url, title, duration, requester)
+THUMB_CACHE_DIR = os.path.join(os.getenv("CACHE_DIR", "cache"), "thumbs")
+THUMB_CACHE_MEM_MB = int(os.getenv("THUMB_CACHE_MEM_MB", "32"))
+THUMB_CACHE_DISK_MB = int(os.getenv("THUMB_CACHE_DISK_MB", "256"))
+# Cache background blur 1280x720 per thumbnail_url (~2.7 MB per item)
+THUMB_BG_CACHE_SIZE = int(os.getenv("THUMB_BG_CACHE_SIZE", "16"))
+
+_executor: Optional[Executor] = None
+_slots: Optional[asyncio.Semaphore] = None
+_disk: Optional[DiskCache] = None
+_inflight: Dict[str, asyncio.Future] = {}
+_fonts: Optional[Dict[str, ImageFont.ImageFont]] = None
+_template: Optional[Tuple[Image.Image, Tuple[int, int, int, int]]] = None
+_art_mask: Optional[Image.Image] = None
+
+thumb_cache: LRUCache[bytes] = LRUCache(max_bytes=THUMB_CACHE_MEM_MB * 1024 * 1024)
+# Image di thread pool, raw RGB di process pool (lihat render_base)
+bg_cache: LRUCache[Union[Image.Image, bytes]] = LRUCache(max_items=THUMB_BG_CACHE_SIZE)
+
+
+def _disk_cache() -> DiskCache:
+    global _disk
+    if _disk is None:
+        _disk = DiskCache(THUMB_CACHE_DIR, THUMB_CACHE_DISK_MB * 1024 * 1024, suffix=".jpg")
+    return _disk
+
+
+def render_base(image_data: Optional[bytes], as_bytes: bool = False) -> Union[Image.Image, bytes]:
+    """Background blur + album art bulat. Hanya bergantung pada gambar sumber.
+
+    as_bytes=True mengembalikan raw RGB 1280x720 supaya murah dikirim ke/dari
+    worker proses; di thread pool Image diteruskan langsung tanpa serialisasi.
+    """
+    load_assets()
+    width, height = THUMB_SIZE
+
+    background_raw = None
+    if image_data:
+        try:
+            background_raw = Image.open(BytesIO(image_data))
+            background_raw.load()
+        except Exception:
+            background_raw = None
+
+    if not background_raw:
+        background_raw = Image.new('RGB', (width, height), color=(30, 30, 30))
+
+    bg = background_raw.resize((width, height), Image.LANCZOS)
+    bg = bg.filter(ImageFilter.GaussianBlur(radius=10))
+
+    overlay = Image.new('RGBA', (width, height), (0, 0, 0, 160))
+    bg = bg.convert('RGBA')
+    bg = Image.alpha_composite(bg, overlay)
+    draw = ImageDraw.Draw(bg)
+
+    art_size = ART_SIZE
+    album_art = ImageOps.fit(background_raw, (art_size, art_size), centering=(0.5, 0.5))
+
+    art_x, art_y = 100, (height - art_size) // 2
+
+    bg.paste(album_art, (art_x, art_y), _art_mask)
+    draw.ellipse((art_x, art_y, art_x + art_size, art_y + art_size), outline="white", width=10)
+
+    bg = bg.convert('RGB')
+    return bg.tobytes() if as_bytes else bg
+
+
+def load_assets():
+    """Muat font dan template statis sekali per proses (juga dipakai sebagai initializer worker)."""
+    global _fonts, _template, _art_mask
+    if _fonts is not None:
+        return
+
+    def load_font(size):
+        try:
+            return ImageFont.truetype(THUMB_FONT, size)
+        except Exception:
+            return ImageFont.load_default()
+
+    _fonts = {
+        'title': load_font(75),
+        'sub': load_font(35),
+        'time': load_font(30),
+    }
+    _template = _render_template(_fonts['time'])
+
+    _art_mask = Image.new('L', (ART_SIZE, ART_SIZE), 0)
+    ImageDraw.Draw(_art_mask).ellipse((0, 0, ART_SIZE, ART_SIZE), fill=255)
+
+
+def _render_template(font_time) -> Tuple[Image.Image, Tuple[int, int, int, int]]:
+    """Layer RGBA berisi bagian yang sama di setiap thumbnail: bar, label 00:00 dan tombol kontrol."""
+    layer = Image.new('RGBA', THUMB_SIZE, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    text_x = TEXT_X
+
+    bar_y = 470
+    bar_width = 500
+    # Di render lama alpha 60 hilang saat convert ke RGB, jadi track tampil putih solid
+    draw.line((text_x, bar_y, text_x + bar_width, bar_y), fill="white", width=8)
+    draw.line((text_x, bar_y, text_x + 300, bar_y), fill="#FF0000", width=8)
+    draw.ellipse((text_x + 300 - 10, bar_y - 10, text_x + 300 + 10, bar_y + 10), fill="#FF0000")
+
+    draw.text((text_x, bar_y + 25), "00:00", fill="white", font=font_time)
+
+    ctrl_y = 560
+    draw.polygon([(text_x + 110, ctrl_y + 20), (text_x + 140, ctrl_y + 5), (text_x + 140, ctrl_y + 35)], fill="white")
+    draw.rectangle([text_x + 100, ctrl_y + 5, text_x + 106, ctrl_y + 35], fill="white")
+
+    draw.ellipse((text_x + 190, ctrl_y - 10, text_x + 250, ctrl_y + 50), fill="white")
+    draw.polygon([(text_x + 215, ctrl_y + 5), (text_x + 215, ctrl_y + 35), (text_x + 235, ctrl_y + 20)], fill="black")
+
+    draw.polygon([(text_x + 300, ctrl_y + 5), (text_x + 300, ctrl_y + 35), (text_x + 330, ctrl_y + 20)], fill="white")
+    draw.rectangle([text_x + 333, ctrl_y + 5, text_x + 339, ctrl_y + 35], fill="white")
+
+    # Simpan potongan bbox saja supaya paste tidak menyentuh seluruh 1280x720
+    bbox = layer.getbbox()
+    return layer.crop(bbox), bbox
+
+
+def render_text(base: Union[Image.Image, bytes], title: str, duration: str, requester: str,
+                copy: bool = True) -> bytes:
+    """Tempel template di atas base, gambar teks dinamis, lalu encode JPEG.
+
+    base dari cache dipakai bersama, jadi disalin dulu kecuali copy=False.
+    """
+    load_assets()
+    requester = unidecode(requester)
+    if isinstance(base, bytes):
+        bg = Image.frombytes('RGB', THUMB_SIZE, base)
+    else:
+        bg = base.copy() if copy else base
+
+    template, bbox = _template
+    bg.paste(template, bbox[:2], template)
+
+    draw = ImageDraw.Draw(bg)
+    text_x = TEXT_X
+    current_y = 180
+
+    lines = textwrap.wrap(title, width=18)
+    for line in lines[:2]:
+        draw.text((text_x, current_y), line, fill="white", font=_fonts['title'])
+        current_y += 85
+
+    draw.text((text_x, current_y + 10), f"Requested by {requester}", fill=(200, 200, 200), font=_fonts['sub'])
+
+    bar_y = 470
+    bar_width = 500
+    draw.text((text_x + bar_width - 70, bar_y + 25), duration, fill="white", font=_fonts['time'])
+
+    img_byte_arr = BytesIO()
+    bg.save(img_byte_arr, format='JPEG', quality=95)
+    return img_byte_arr.getvalue()
+
+
+def render_thumb(title: str, duration: str, requester: str, image_data: Optional[bytes]) -> bytes:
+    """Render penuh tanpa cache."""
+    return render_text(render_base(image_data), title, duration, requester, copy=False)
+
+
+def start_pool():
+    """Buat worker pool untuk render thumbnail."""
+    global _executor, _slots
+    if _executor is not None:
+        return
+
+    if THUMB_POOL == "thread":
+        load_assets()
+        _executor = ThreadPoolExecutor(max_workers=THUMB_WORKERS, thread_name_prefix="thumb")
+    else:
+        # spawn menjalankan ulang skrip utama di tiap worker; aman karena entry point-nya
+        # run.py yang tipis, bukan main.py beserta client-nya
+        _executor = ProcessPoolExecutor(
+            max_workers=THUMB_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=load_assets
+        )
+    _slots = asyncio.Semaphore(THUMB_WORKERS + THUMB_QUEUE_SIZE)
+    _disk_cache()
+    logger.info(f"Thumbnail pool: {THUMB_POOL} x{THUMB_WORKERS}, antrean {THUMB_QUEUE_SIZE}")
+
+
+def shutdown_pool():
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+    _slots = None
+
+
+async def _run(func, *args):
+    if _executor is None:
+        start_pool()
+
+    # Semaphore = antrean terbatas; kalau penuh, pemanggil menunggu (backpressure).
+    # Simpan referensi lokal: shutdown_pool() bisa jalan selagi render masih ditunggu
+    slots = _slots
+    await asyncio.wait_for(slots.acquire(), timeout=THUMB_WAIT_TIMEOUT)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, func, *args)
+    finally:
+        slots.release()
+
+
+async def _get_base(thumbnail_url: str) -> Tuple[Union[Image.Image, bytes], bool]:
+    """Ambil background dari cache atau render. Flag kedua False kalau download gagal."""
+    base = bg_cache.get(thumbnail_url or "")
+    if base is not None:
+        return base, True
+    image_data = await fetch_bytes(thumbnail_url) if thumbnail_url else None
+    # Bytes hanya perlu untuk melewati batas proses
+    base = await _run(render_base, image_data, THUMB_POOL != "thread")
+    # Download gagal jangan di-cache, supaya percobaan berikutnya mengambil ulang
+    ok = bool(image_data) or not thumbnail_url
+    if ok:
+        bg_cache.put(thumbnail_url or "", base)
+    return base, ok
+
+
+async def _render(key: str, title: str, duration: str, requester: str, thumbnail_url: str) -> bytes:
+    data = await asyncio.to_thread(_disk_cache().get, key)
+    if data is None:
+        with thumb_render.time():
+            base, ok = await _get_base(thumbnail_url)
+            data = await _run(render_text, base, title, duration, requester)
+        if not ok:
+            return data
+        await asyncio.to_thread(_disk_cache().put, key, data)
+    thumb_cache.put(key, data)
+    return data
+
+
+@traced("gen_thumb")
+async def gen_thumb(
+    title: str,
+    duration: str,
+    requester: str,
+    thumbnail_url: str,
+    **kwargs
+) -> BytesIO:
+    key = cache_key(thumbnail_url, title, duration, requester)
+    data = thumb_cache.get(key)
+    if data is None:
+        # Render yang sama sedang berjalan (lagu sama di banyak grup): tunggu hasilnya
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(_render(key, title, duration, requester, thumbnail_url))
+            _inflight[key] = task
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+        data = await asyncio.shield(task)
+
+    return BytesIO(data)
@@ -0,0 +1,233 @@
+"""Tracing per request (span) dan sampling profiler opsional.
+
+Pemakaian:
+    @trace_request("play")          # di handler: satu trace per panggilan
+    @traced("youtube.extract")      # di fungsi async: satu span per panggilan
+    with span("call.play"): ...     # blok di dalam fungsi
+
+Span di luar trace aktif tidak mencatat apa-apa, jadi aman dipasang di fungsi
+yang juga dipanggil dari background task.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import logging
+import threading
+import functools
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Trace yang lebih lama dari ini ditulis ke TRACE_FILE
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))
+# Kosong (default) = tidak menulis file, hanya log
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+# Lewat dari ini file diputar ke TRACE_FILE.1 (satu cadangan)
+TRACE_FILE_MB = float(os.getenv("TRACE_FILE_MB", "20"))
+# Sampling profiler lewat SIGUSR1 (kirim sekali untuk mulai, sekali lagi untuk berhenti)
+PROFILE_SIGNAL = os.getenv("PROFILE_SIGNAL", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".")
+
+
+class Trace:
+    __slots__ = ("id", "name", "attrs", "started", "wall", "spans", "done")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.id = os.urandom(6).hex()
+        self.name = name
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.wall = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self.done = False
+
+    def to_dict(self, duration: float) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "ts": self.wall,
+            "duration_ms": round(duration * 1000, 2),
+            "attrs": self.attrs,
+            "spans": self.spans,
+        }
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_depth: ContextVar[int] = ContextVar("trace_depth", default=0)
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace.id if trace else None
+
+
+def _write(line: str):
+    try:
+        if TRACE_FILE_MB and os.path.exists(TRACE_FILE) and os.path.getsize(TRACE_FILE) >= TRACE_FILE_MB * 1048576:
+            os.replace(TRACE_FILE, TRACE_FILE + ".1")
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        logger.error(f"Gagal menulis trace: {e}")
+
+
+def _finish(trace: Trace, duration: float, error: Optional[BaseException]):
+    trace.done = True
+    if error is not None:
+        trace.attrs["error"] = repr(error)[:200]
+    if duration * 1000 < TRACE_SLOW_MS:
+        return
+    stages = ", ".join(f"{s['name']}={s['duration_ms']:.0f}ms" for s in trace.spans if s["depth"] == 0)
+    logger.warning(f"Slow {trace.name} [{trace.id}] {duration * 1000:.0f} ms: {stages}")
+    if TRACE_FILE:
+        line = json.dumps(trace.to_dict(duration), ensure_ascii=False, default=str)
+        try:
+            asyncio.get_running_loop().run_in_executor(None, _write, line)
+        except RuntimeError:
+            _write(line)
+
+
+@contextmanager
+def start_trace(name: str, **attrs):
+    """Mulai trace baru untuk satu request. Trace bersarang memakai trace luar."""
+    if _trace.get() is not None:
+        yield _trace.get()
+        return
+    trace = Trace(name, attrs)
+    token = _trace.set(trace)
+    error = None
+    try:
+        yield trace
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _trace.reset(token)
+        _finish(trace, time.perf_counter() - trace.started, error)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    trace = _trace.get()
+    if trace is None or trace.done:
+        yield
+        return
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    start = time.perf_counter()
+    record: Dict[str, Any] = {"name": name, "depth": depth, "start_ms": round((start - trace.started) * 1000, 2)}
+    if attrs:
+        record["attrs"] = attrs
+    try:
+        yield
+    except BaseException as e:
+        record["error"] = repr(e)[:200]
+        raise
+    finally:
+        _depth.reset(token)
+        record["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        trace.spans.append(record)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator fungsi async: satu span per panggilan."""
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(label):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_request(name: str):
+    """Decorator handler Pyrogram/PyTgCalls: satu trace per update."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(client, update, *args, **kwargs):
+            chat = getattr(update, "chat", None) or getattr(getattr(update, "message", None), "chat", None)
+            attrs = {"chat": chat.id if chat else getattr(update, "chat_id", None)}
+            with start_trace(name, **attrs):
+                return await func(client, update, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---------- sampling profiler ----------
+
+class SamplingProfiler:
+    """Sampel stack thread event loop secara berkala; hasilnya format "folded"
+    (satu baris per stack unik + jumlah sampel) untuk flamegraph.pl / speedscope.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000, max_seconds: float = PROFILE_MAX_SECONDS):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target: Optional[int] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def toggle(self):
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self, thread_id: Optional[int] = None):
+        if self.running:
+            return
+        self._target = thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Profiler mulai (interval {self.interval * 1000:.0f} ms)")
+
+    def stop(self):
+        self._stop.set()
+
+    def _sample(self):
+        stacks: Counter = Counter()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            stacks[";".join(reversed(parts))] += 1
+        path = os.path.join(PROFILE_DIR, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            logger.info(f"Profiler selesai: {sum(stacks.values())} sampel -> {path}")
+        except OSError as e:
+            logger.error(f"Gagal menulis profil: {e}")
+
+
+profiler = SamplingProfiler()
+
+
+def install_profiler_signal():
+    """SIGUSR1 menyalakan/mematikan profiler (hanya kalau PROFILE_SIGNAL=1)."""
+    if not PROFILE_SIGNAL or not hasattr(signal, "SIGUSR1"):
+        return
+    asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, profiler.toggle)
+    logger.info(f"Profiler siap: kirim SIGUSR1 ke pid {os.getpid()}")
@@ -0,0 +1,267 @@
+import os
+import re
+import time
+import asyncio
+import logging
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from yt_dlp import YoutubeDL
+from youtubesearchpython import VideosSearch
+from cache import TTLCache
+from formats import select_stream, stream_expiry  # noqa: F401 (dipakai main)
+from metrics import search_latency, ytdl_latency
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "4"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "15"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "1800"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+
+# VideosSearch sinkron; dijalankan di thread sendiri supaya tidak menahan event loop
+_search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+search_results: TTLCache[List[Dict]] = TTLCache(SEARCH_CACHE_TTL, SEARCH_CACHE_SIZE)
+_search_inflight: Dict[Tuple[str, int], asyncio.Future] = {}
+_search_slots: Optional[asyncio.Semaphore] = None
+
+YTDL_WORKERS = int(os.getenv("YTDL_WORKERS", "4"))
+# Ekstraksi/download yang boleh berjalan bersamaan
+YTDL_CONCURRENCY = int(os.getenv("YTDL_CONCURRENCY", "3"))
+YTDL_TIMEOUT = float(os.getenv("YTDL_TIMEOUT", "60"))
+YTDL_DOWNLOAD_TIMEOUT = float(os.getenv("YTDL_DOWNLOAD_TIMEOUT", "600"))
+INFO_CACHE_TTL = float(os.getenv("INFO_CACHE_TTL", "10800"))
+INFO_CACHE_SIZE = int(os.getenv("INFO_CACHE_SIZE", "1024"))
+# URL stream dianggap kedaluwarsa sekian detik sebelum "expire" dari YouTube
+STREAM_EXPIRY_MARGIN = 300
+# Ekstraksi playlist "flat" hanya membaca daftar; boleh lebih lama dari satu video
+PLAYLIST_TIMEOUT = float(os.getenv("PLAYLIST_TIMEOUT", "90"))
+
+YTDL_OPTS = {'quiet': True, 'no_warnings': True, 'noplaylist': True}
+
+_ytdl_executor = ThreadPoolExecutor(max_workers=YTDL_WORKERS, thread_name_prefix="ytdl")
+_ytdl_slots: Optional[asyncio.Semaphore] = None
+info_cache: TTLCache[Dict] = TTLCache(INFO_CACHE_TTL, INFO_CACHE_SIZE)
+_info_inflight: Dict[str, asyncio.Future] = {}
+
+_YT_ID_RE = re.compile(
+    r"(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/|v/)|youtu\.be/)([A-Za-z0-9_-]{11})"
+)
+# Playlist biasa (PL..., OL...) dan mix (RD...), termasuk link share youtu.be/<id>?list=
+_LIST_RE = re.compile(
+    r"(?:youtube\.com/(?:playlist|watch)|youtu\.be/[A-Za-z0-9_-]{11})\?(?:.*&)?list=([A-Za-z0-9_-]+)"
+)
+# Placeholder yt-dlp untuk video yang tidak bisa diputar (judul asli boleh diawali "[")
+_UNAVAILABLE_TITLES = {"[Private video]", "[Deleted video]", "[Unavailable video]"}
+# Link v= tanpa index=: entri tambahan yang dibaca untuk mencari posisi video itu
+_PLAYLIST_SEEK = 200
+
+
+def normalize_query(query: str) -> str:
+    """Samakan query yang hanya beda huruf besar/spasi/bentuk unicode."""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def _search_sync(query: str, limit: int) -> List[Dict]:
+    results = VideosSearch(query, limit=limit).result().get("result", [])
+
+    videos = []
+    for video in results:
+        videos.append({
+            "title": video.get("title", "ᴛᴀɴᴘᴀ ᴊᴜᴅᴜʟ"),
+            "duration": video.get("duration", "ᴛɪᴅᴀᴋ ᴅɪᴋᴇᴛᴀʜᴜɪ"),
+            "thumbnail": video.get("thumbnails", [{}])[0].get("url", "") if video.get("thumbnails") else "",
+            "link": video.get("link", "")
+        })
+    return videos
+
+
+async def _search(key: Tuple[str, int], query: str, limit: int) -> List[Dict]:
+    global _search_slots
+    if _search_slots is None:
+        _search_slots = asyncio.Semaphore(SEARCH_WORKERS)
+    with search_latency.time():
+        # Timeout juga mencakup menunggu slot; thread yang ditinggal tetap memegang slotnya
+        videos = await asyncio.wait_for(
+            _run_in_thread(_search_executor, _search_slots, _search_sync, query, limit),
+            timeout=SEARCH_TIMEOUT
+        )
+    if videos:
+        search_results.put(key, videos)
+    return videos
+
+
+@traced("youtube.search")
+async def search_youtube(query: str, limit: int = 10) -> List[Dict]:
+    key = (normalize_query(query), limit)
+    videos = search_results.get(key)
+    if videos is not None:
+        return list(videos)
+
+    try:
+        # Query sama yang sedang dicari (mis. lagu trending): ikut menunggu hasil yang sama
+        task = _search_inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(_search(key, query, limit))
+            _search_inflight[key] = task
+            task.add_done_callback(lambda _: _search_inflight.pop(key, None))
+        return list(await asyncio.shield(task))
+    except Exception as e:
+        logger.error(f"Error searching YouTube: {e!r}")
+        return []
+
+
+def is_youtube_url(url: str) -> bool:
+    return "youtube.com" in url or "youtu.be" in url
+
+
+def video_id(url: str) -> Optional[str]:
+    """ID video YouTube dari berbagai bentuk link, atau None."""
+    match = _YT_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+def playlist_id(url: str) -> Optional[str]:
+    """ID playlist/mix dari link YouTube (parameter list=), atau None."""
+    match = _LIST_RE.search(url)
+    return match.group(1) if match else None
+
+
+def _release_when_done(slots: asyncio.Semaphore):
+    def done(future: asyncio.Future):
+        slots.release()
+        # Hasil/exception dari job yang sudah tidak ditunggu dibuang tanpa warning
+        if not future.cancelled():
+            future.exception()
+    return done
+
+
+async def _run_in_thread(executor, slots: asyncio.Semaphore, func, *args, timeout: Optional[float] = None):
+    """Jalankan func di executor dengan slot yang baru dilepas saat thread benar-benar selesai.
+
+    Thread tidak bisa dihentikan; timeout (atau cancel) hanya berhenti menunggu.
+    Job yang ditinggal tetap memegang slotnya, jadi batas concurrency tetap
+    menghitung pekerjaan yang sebenarnya masih jalan.
+    """
+    await slots.acquire()
+    try:
+        future = asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(_release_when_done(slots))
+    return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+
+
+async def _run_ytdl(func, *args, timeout: float):
+    global _ytdl_slots
+    if _ytdl_slots is None:
+        _ytdl_slots = asyncio.Semaphore(YTDL_CONCURRENCY)
+    return await _run_in_thread(_ytdl_executor, _ytdl_slots, func, *args, timeout=timeout)
+
+
+def _extract_sync(url: str, opts: Dict, download: bool) -> Tuple[Dict, Optional[str]]:
+    with YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=download)
+        file_path = ydl.prepare_filename(info) if download else None
+    return info, file_path
+
+
+def _info_key(url: str) -> str:
+    vid = video_id(url)
+    return f"yt:{vid}" if vid else url
+
+
+def _cache_info(key: str, info: Dict):
+    ttl = INFO_CACHE_TTL
+    expires = stream_expiry(info)
+    if expires:
+        ttl = min(ttl, expires - time.time() - STREAM_EXPIRY_MARGIN)
+    if ttl > 0:
+        info_cache.put(key, info, ttl=ttl)
+
+
+async def _extract(key: str, url: str) -> Dict:
+    with ytdl_latency.time(op="info"):
+        info, _ = await _run_ytdl(_extract_sync, url, YTDL_OPTS, False, timeout=YTDL_TIMEOUT)
+    _cache_info(key, info)
+    return info
+
+
+@traced("youtube.extract_info")
+async def extract_info(url: str) -> Dict:
+    """Metadata + format (termasuk URL stream) sebuah video, di-cache per ID video.
+
+    Dict hasil dipakai bersama; jangan diubah oleh pemanggil.
+    """
+    key = _info_key(url)
+    info = info_cache.get(key)
+    if info is not None:
+        return info
+
+    task = _info_inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_extract(key, url))
+        _info_inflight[key] = task
+        task.add_done_callback(lambda _: _info_inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+@traced("youtube.extract_playlist")
+async def extract_playlist(url: str, limit: int) -> Tuple[str, List[Dict]]:
+    """Daftar isi playlist/mix tanpa mengekstrak tiap video (extract_flat).
+
+    Link yang menunjuk satu video di dalam playlist (v= atau youtu.be/<id>, plus
+    index=) diantre mulai dari video itu, bukan dari awal playlist.
+
+    Mengembalikan (judul playlist, entri) dengan entri berbentuk seperti hasil
+    search_youtube: link, title, duration (detik atau None), thumbnail.
+    """
+    start_id = video_id(url)
+    index = parse_qs(urlsplit(url).query).get("index", [""])[0]
+    start = max(1, int(index)) if index.isdigit() else 1
+    end = start + limit - 1
+    if start_id and not index.isdigit():
+        end += _PLAYLIST_SEEK
+    opts = {
+        **YTDL_OPTS, 'noplaylist': False, 'extract_flat': 'in_playlist',
+        'playliststart': start, 'playlistend': end,
+    }
+    with ytdl_latency.time(op="playlist"):
+        info, _ = await _run_ytdl(_extract_sync, url, opts, False, timeout=PLAYLIST_TIMEOUT)
+    items = info.get("entries") or []
+    if start_id:
+        # index= bisa meleset (playlist berubah); buang yang sebelum video yang dipilih
+        ids = [entry.get("id") for entry in items]
+        if start_id in ids:
+            items = items[ids.index(start_id):]
+    entries = []
+    for entry in items:
+        vid = entry.get("id")
+        if not vid or entry.get("title") in _UNAVAILABLE_TITLES:
+            continue
+        if entry.get("availability") in ("private", "needs_auth", "subscriber_only", "premium_only"):
+            continue
+        entries.append({
+            "link": f"https://www.youtube.com/watch?v={vid}",
+            "title": entry.get("title") or vid,
+            "duration": int(entry["duration"]) if entry.get("duration") else None,
+            # URL thumbnail bisa diturunkan dari ID; tidak perlu ekstraksi
+            "thumbnail": f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg",
+        })
+        if len(entries) >= limit:
+            break
+    return info.get("title") or "ᴘʟᴀʏʟɪsᴛ", entries
+
+
+@traced("youtube.download")
+async def download(url: str, opts: Dict) -> Tuple[Dict, str]:
+    """Download lewat yt-dlp di worker pool. Mengembalikan (info, path file)."""
+    with ytdl_latency.time(op="download"):
+        info, file_path = await _run_ytdl(
+            _extract_sync, url, {**YTDL_OPTS, **opts}, True, timeout=YTDL_DOWNLOAD_TIMEOUT
+        )
+    _cache_info(_info_key(url), info)
+    return info, file_path